@@ -4,27 +4,12 @@ Analyse an encounter from the log file and plots the casts from
 By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
 from datetime import timedelta
-import matplotlib.pyplot as plt
-import json
 
 from src import readers
+from src.raid import load_raid
 from src.utils import get_player_name, get_time_stamp, shorten_spell_name, anonymize_name
 import spell_data as sd
 
-try:
-    with open("raid.json") as fp:
-        RAID = json.load(fp)
-except FileNotFoundError:
-    print(
-        "Could not find raid setup file `raid.json`. Please create a file similar to `raid_example.json` with a list of"
-        " your healers and tanks."
-    )
-    exit(400)
-
-
-HEALERS = RAID["healers"]
-TANKS = RAID["tanks"]
-
 
 def get_deaths(log_lines):
     """Gets deaths in log."""
@@ -48,6 +33,9 @@ def get_deaths(log_lines):
 
 
 def plot_casts(casts_dict, encounter, mark=None, anonymize=True, deaths=None):
+    import matplotlib.pyplot as plt
+
+    tanks = load_raid()["tanks"]
     casts = list(casts_dict.values())
     labels = list(casts_dict.keys())
     most_casts = max((len(c) for c in casts))
@@ -91,7 +79,7 @@ def plot_casts(casts_dict, encounter, mark=None, anonymize=True, deaths=None):
 
                 target = c[4]
 
-                if target in TANKS:
+                if target in tanks:
                     color = "#99ccff" if even else "#b3d9ff"
                 #     color = "#ff9999" if even else "#ffb3b3"
                 elif target == "[Interrupted]":
@@ -173,15 +161,21 @@ def plot_casts(casts_dict, encounter, mark=None, anonymize=True, deaths=None):
     print(f"Saved casts figure to `{fig_path}`")
 
 
-def analyse_activity(casts_dict, encounter):
-    """Analyses casting activity for each healer."""
+def analyse_activity(casts_dict, encounter, healers=None):
+    """
+    Analyses casting activity for each healer.
+
+    :param healers: names of the healers to show, defaults to the healers of the raid setup
+    """
+    if healers is None:
+        healers = load_raid()["healers"]
 
     combat_time = encounter.duration
     print(f"Activity for {encounter.name}, {combat_time:.1f}s")
 
     print(f"  {'Healer':<12s}  {'setup'}  {'activ'}  {'act %'}  {'inact'}  {'regen'}")
 
-    for healer in HEALERS:
+    for healer in healers:
         end = encounter.start_t
 
         if healer not in casts_dict:
@@ -226,18 +220,19 @@ def analyse_activity(casts_dict, encounter):
         )
 
 
-def analyse_casts(source, encounter=None, all=False, **kwargs):
-    processor = readers.get_processor(source)
+def analyse_casts(source, encounter=None, all=False, mark=None, anonymize=True, **kwargs):
+    processor = readers.get_processor(source, **kwargs)
 
     encounter = processor.select_encounter(encounter=encounter)
     processor.process(encounter=encounter)
 
     casts, _ = processor.get_casts(encounter=encounter)
+    healers = load_raid()["healers"]
 
     casts_dict = dict()
     for c in casts:
         s = c[0]
-        if not all and s not in HEALERS:
+        if not all and s not in healers:
             continue
 
         if s not in casts_dict:
@@ -249,13 +244,13 @@ def analyse_casts(source, encounter=None, all=False, **kwargs):
 
     if encounter:
         # only plot casts for an encounter
-        plot_casts(casts_dict, encounter, deaths=deaths, **kwargs)
+        plot_casts(casts_dict, encounter, mark=mark, anonymize=anonymize, deaths=deaths)
 
-    analyse_activity(casts_dict, encounter)
+    analyse_activity(casts_dict, encounter, healers)
 
 
 def main(argv=None):
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     parser = OverhealParser(
         description="Analyses a boss encounter, or whole combat log, and characterise the amount of heal sniping going "
@@ -272,7 +267,14 @@ def main(argv=None):
 
     args = parser.parse_args(argv)
 
-    analyse_casts(args.source, encounter=args.encounter, mark=args.mark, anonymize=args.anonymize, all=args.all)
+    analyse_casts(
+        args.source,
+        encounter=args.encounter,
+        mark=args.mark,
+        anonymize=args.anonymize,
+        all=args.all,
+        **reader_options(args),
+    )
 
 
 if __name__ == "__main__":
@@ -5,11 +5,17 @@ By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
 import json
 
-from src.readers import read_from_raw as raw
-from src import get_player_name, get_time_stamp
+from src.readers import get_processor
+from src.readers.scanner import scan_lines
+from src.readers.decoder import EventDecoder
+from src.utils import get_time_stamp
 
 import spell_data as sd
 
+SPELL_EVENTS = ("SPELL_CAST_SUCCESS", "SPELL_HEAL", "SPELL_PERIODIC_HEAL", "SPELL_ABSORBED")
+
+DECODER = EventDecoder(("source", "caster", "spell_id", "amount", "gross_amount", "overheal", "critical"))
+
 
 def get_casts(character_name, log_lines):
     """Get spell casts and time stamps for specified character in lines."""
@@ -19,57 +25,33 @@ def get_casts(character_name, log_lines):
     spell_periodics = []
     spell_absorbs = []
 
-    for line in log_lines:
-        line_parts = line.split(",")
-        length = len(line_parts)
+    def cast(record):
+        spell_casts.append((get_time_stamp(record.timestamp), record.spell_id))
 
-        if "SPELL_CAST_SUCCESS" in line_parts[0]:
-            source = get_player_name(line_parts[2])
+    def heal(record):
+        spell_heals.append((record.spell_id, record.gross_amount, record.overheal, record.critical, True))
 
-            if character_name != source:
-                continue
+    def periodic(record):
+        spell_periodics.append((record.spell_id, record.gross_amount, record.overheal, False, False))
 
-            spell_time = get_time_stamp(line_parts[0])
-            spell_id = line_parts[9]
-            spell_casts.append((spell_time, spell_id))
+    def absorb(record):
+        spell_absorbs.append((record.spell_id, record.amount, 0, False, False))
 
-        elif "SPELL_HEAL" in line_parts[0]:
-            source = get_player_name(line_parts[2])
+    handlers = {
+        "SPELL_CAST_SUCCESS": cast,
+        "SPELL_HEAL": heal,
+        "SPELL_PERIODIC_HEAL": periodic,
+        "SPELL_ABSORBED": absorb,
+    }
 
-            if character_name != source:
-                continue
+    for record in DECODER.decode_all(log_lines, handlers):
+        # absorbs are cast by the caster, not the source of the absorbed damage
+        source = record.caster if record.event_type == "SPELL_ABSORBED" else record.source
 
-            spell_id = line_parts[9]
-            heal_amount = int(line_parts[29])  # total heal
-            overheal_amount = int(line_parts[30])  # total heal
-            is_crit = "1" in line_parts[-1]
-            spell_heals.append((spell_id, heal_amount, overheal_amount, is_crit, True))
-
-        elif "SPELL_PERIODIC_HEAL" in line_parts[0]:
-            source = get_player_name(line_parts[2])
-
-            if character_name != source:
-                continue
-
-            spell_id = line_parts[9]
-            heal_amount = int(line_parts[29])  # total heal
-            overheal_amount = int(line_parts[30])  # total heal
-            spell_periodics.append((spell_id, heal_amount, overheal_amount, False, False))
-
-        elif "SPELL_ABSORBED" in line_parts[0]:
-            if length == 18:
-                source = line_parts[10]
-            else:
-                source = line_parts[13]
-
-            source = get_player_name(source)
-
-            if character_name != source:
-                continue
+        if character_name != source:
+            continue
 
-            spell_id = line_parts[13 if length == 18 else 16]
-            abs_amount = int(line_parts[16 if length == 18 else 19])  # absorb amount
-            spell_absorbs.append((spell_id, abs_amount, 0, False, False))
+        handlers[record.event_type](record)
 
     return spell_casts, spell_heals, spell_periodics, spell_absorbs
 
@@ -204,9 +186,11 @@ def analyse_spell(
     if spell_power is None:
         spell_power = 0
 
-    log = raw.get_lines(source)
-    # todo: fix
-    encounter, encounter_lines, encounter_start, encounter_end = encounter_picker(log, encounter)
+    processor = get_processor(source, character_name=character_name)
+    encounter = processor.select_encounter(encounter=encounter)
+    encounter_lines = scan_lines(source, SPELL_EVENTS, encounter.start, encounter.end)
+    encounter_start = encounter.start_t
+    encounter_end = encounter.end_t
 
     print()
     print(f"Analysis for {encounter}:")
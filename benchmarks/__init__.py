@@ -0,0 +1,7 @@
+"""
+Benchmarks for the log readers and analysis code.
+
+Run from the repository root, e.g. `python3 -m benchmarks.streaming_memory`.
+
+By: Filip Gökstorp (Saintis-Dreadmist), 2020
+"""
@@ -0,0 +1,61 @@
+"""
+Benchmark of filtering WCL event requests on the server, against a local stub server.
+
+Compares the requests and bytes needed to fetch a single healer's events from a raid report, fetching all events of
+the whole report and filtering them locally, with sending the character and boss fight filters along with the requests.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import time
+import contextlib
+
+from tests.wcl_stub import StubWCL, CODE
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Count requests and bytes fetching a healer's events from a stub WCL.")
+    parser.add_argument("--fights", type=int, default=8, help="Number of boss fights in the report.")
+    parser.add_argument("--healers", type=int, default=8, help="Number of healers in the raid.")
+    parser.add_argument("--trash", type=int, default=400, help="Number of events in the trash before each boss.")
+
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("WCL_API_KEY", "stub")
+    from src.readers.read_from_api import APIProcessor
+    from src.readers.api_client import APIClient
+
+    results = []
+
+    with StubWCL(n_fights=args.fights, n_healers=args.healers, trash_events=args.trash) as stub:
+        for label, kwargs in (
+            ("all events, filtered locally", dict(boss_only=False)),
+            ("filtered by WCL", dict(boss_only=True)),
+        ):
+            client = APIClient(api_key="stub")
+            processor = APIProcessor(CODE, "Saintis", api_root=stub.api_root, client=client, **kwargs)
+
+            with contextlib.redirect_stdout(None):
+                processor.get_fights()
+                if not processor.boss_only:
+                    # fetch as before, without any filters
+                    processor.get_filters = lambda spell_id=None: {}
+
+                requests, n_bytes = stub.requests, stub.bytes
+                t0 = time.perf_counter()
+                processor.process(damage_taken=True)
+                dt = time.perf_counter() - t0
+
+            results.append((label, stub.requests - requests, stub.bytes - n_bytes, len(processor.heals), dt))
+
+    print(f"  {args.fights} boss fights, {args.healers} healers, {args.trash} trash events before each boss")
+    print()
+    print(f"  {'':<30s}  {'requests':>8s}  {'kB':>8s}  {'heals':>6s}  {'time':>8s}")
+    for label, requests, n_bytes, n_heals, dt in results:
+        print(f"  {label:<30s}  {requests:8d}  {n_bytes / 1024:8.1f}  {n_heals:6d}  {dt:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
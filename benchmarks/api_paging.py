@@ -0,0 +1,67 @@
+"""
+Benchmark of fetching events from the WCL API, against a local stub server with simulated network latency.
+
+Compares fetching the healing and damage-taken streams one page at a time, one stream after the other, with fetching
+fights and streams concurrently, and with reading them back from the response cache.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import time
+import tempfile
+import contextlib
+
+from tests.wcl_stub import StubWCL, CODE
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time fetching events from a stub WCL server.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of latency per request.")
+    parser.add_argument("--fights", type=int, default=8, help="Number of fights in the report.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once.")
+
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("WCL_API_KEY", "stub")
+    from src.readers.read_from_api import APIProcessor
+    from src.readers.api_client import APIClient
+    from src.readers.response_cache import ResponseCache
+
+    with StubWCL(latency=args.latency, n_fights=args.fights) as stub:
+        with contextlib.redirect_stdout(None):
+            client = APIClient(api_key="stub")
+            processor = APIProcessor(CODE, api_root=stub.api_root, max_concurrency=1, client=client)
+            processor.get_fights()
+
+            t0 = time.perf_counter()
+            processor.get_heals()
+            processor.get_damage()
+            sequential = time.perf_counter() - t0
+
+            processor.max_concurrency = args.concurrency
+
+            t0 = time.perf_counter()
+            processor.get_heals_and_damage()
+            concurrent = time.perf_counter() - t0
+
+            with tempfile.TemporaryDirectory() as cache_dir:
+                processor.client = APIClient(api_key="stub", cache=ResponseCache(cache_dir))
+                processor.get_heals_and_damage()
+
+                t0 = time.perf_counter()
+                processor.get_heals_and_damage()
+                cached = time.perf_counter() - t0
+
+    print(f"  {args.fights} fights, {args.latency * 1000:.0f} ms latency")
+    print(f"  {stub.requests} requests over {stub.connections} connections")
+    print(f"  {client.stats}")
+    print()
+    print(f"  {'one request at a time':<24s}  {sequential:6.2f} s")
+    print(f"  {'concurrent, ' + str(args.concurrency) + ' in flight':<24s}  {concurrent:6.2f} s")
+    print(f"  {'from response cache':<24s}  {cached:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
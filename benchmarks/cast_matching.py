@@ -0,0 +1,37 @@
+"""
+Time taken matching casts with heals, as `analyse_casts.py` does, in a long log of a whole raid.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import time
+
+from src.readers.read_from_raw import RawProcessor
+
+from .synthetic_log import make_raid_log
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time getting casts and matching heals in a synthetic raid log.")
+    parser.add_argument("log_file", nargs="?", default="synthetic_raid_log.txt", help="Path to the synthetic log.")
+    parser.add_argument("--players", type=int, default=40, help="Number of players in the raid.")
+    parser.add_argument("--hours", type=float, default=3.0, help="Length of the log in hours.")
+
+    args = parser.parse_args(argv)
+
+    n_lines = make_raid_log(args.log_file, players=args.players, hours=args.hours)
+
+    processor = RawProcessor(args.log_file, use_index=False)
+
+    t0 = time.perf_counter()
+    casts, heals = processor.get_casts()
+    dt = time.perf_counter() - t0
+
+    print(f"  {args.players} players, {args.hours:.1f} hours, {n_lines} lines")
+    print(f"  {len(casts)} casts, {len(heals)} heals matched with casts")
+    print(f"  {dt:.2f} s, {n_lines / dt / 1000:.0f} k lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of the throughput, in lines per second, of decoding raw log lines.
+
+Compares splitting and indexing lines by hand, as the processing used to do, with tokenising and decoding them with the
+table driven decoder, on the heal, damage and death lines of a synthetic log. The decoder skips lines with creature
+targets before converting any fields, as the processing does. Also times the whole uncached parse of the log.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import time
+
+from src.readers.read_from_raw import RawProcessor, PROCESS_EVENTS, DAMAGE_EVENTS, DECODER
+from src.readers.decoder import split_line
+from src.readers.scanner import scan_lines
+from src.utils import get_player_name
+
+from .synthetic_log import make_synthetic_log
+
+
+def split_only(lines):
+    for line in lines:
+        line.split(",")
+
+
+def split_and_index(lines):
+    """Field extraction by splitting and indexing, as the heal and damage processing used to do it."""
+    for line in lines:
+        line_parts = line.split(",")
+        get_player_name(line_parts[2])
+        get_player_name(line_parts[6])
+
+        if "HEAL" in line_parts[0]:
+            (int(line_parts[14]), int(line_parts[29]), int(line_parts[30]), "1" in line_parts[32])
+        elif "DAMAGE" in line_parts[0]:
+            (int(line_parts[-24]), int(line_parts[-10]), int(line_parts[-9]), int(line_parts[-8]))
+
+
+def tokenise(lines):
+    for line in lines:
+        split_line(line)
+
+
+def decode(lines):
+    decode_line = DECODER.decode
+    for line in lines:
+        decode_line(line)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time decoding raw log lines.")
+    parser.add_argument("log_file", nargs="?", default="synthetic_log.txt", help="Path to the synthetic log.")
+    parser.add_argument("--size", type=int, default=64, help="Size of the synthetic log in MB.")
+
+    args = parser.parse_args(argv)
+
+    make_synthetic_log(args.log_file, args.size)
+    lines = list(scan_lines(args.log_file, PROCESS_EVENTS + DAMAGE_EVENTS))
+
+    print(f"  {len(lines)} heal, damage and death lines")
+    print()
+
+    for label, func in (
+        ("split only", split_only),
+        ("split and index", split_and_index),
+        ("tokenise", tokenise),
+        ("decode", decode),
+    ):
+        t0 = time.perf_counter()
+        func(lines)
+        dt = time.perf_counter() - t0
+
+        print(f"  {label:<20s}  {len(lines) / dt / 1e6:5.2f} M lines/s")
+
+    processor = RawProcessor(args.log_file, include_damage=True)
+    t0 = time.perf_counter()
+    processor.process()
+    dt = time.perf_counter() - t0
+
+    print(f"  {'full parse':<20s}  {len(lines) / dt / 1e6:5.2f} M lines/s")
+
+
+if __name__ == "__main__":
+    main()
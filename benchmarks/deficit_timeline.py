@@ -0,0 +1,91 @@
+"""
+Memory and lookup time of the raid deficit timeline of a long raid, against keeping a dict of all deficits per event.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import time
+import random
+import bisect
+import tracemalloc
+from datetime import timedelta
+
+from src.readers.event_types import DamageTakenEvent
+from src.damage.damage_taken import raid_damage_taken
+
+
+def make_events(players=40, hours=3.0, rate=20.0, seed=0):
+    """Damage taken and heals of a raid, `rate` events a second on average, with a death now and then."""
+    rng = random.Random(seed)
+    ids = [(f"Player-4755-{i:08X}", f"Raider{i}") for i in range(players)]
+
+    events = []
+    t = 0.0
+    end = hours * 3600
+    while t < end:
+        t += rng.expovariate(rate)
+        target_id, target = rng.choice(ids)
+        source = rng.choice(ids)[1]
+        amount = rng.randint(100, 2000)
+
+        if rng.random() < 0.5:
+            # damage taken, with an overkill now and then
+            overkill = -rng.randint(1, 500) if rng.random() < 0.0005 else 0
+            event = (-amount, -amount // 10, overkill)
+        else:
+            event = (amount, rng.randint(0, amount), 0)
+
+        events.append(DamageTakenEvent(timedelta(seconds=t), source, None, "0", target, target_id, 90, *event))
+
+    return events
+
+
+def main(argv=None):
+    import io
+    import argparse
+    import contextlib
+
+    parser = argparse.ArgumentParser(description="Memory and lookups of the raid deficit timeline.")
+    parser.add_argument("--players", type=int, default=40, help="Number of players in the raid.")
+    parser.add_argument("--hours", type=float, default=3.0, help="Length of the raid in hours.")
+    parser.add_argument("--lookups", type=int, default=10000, help="Number of random lookups to time.")
+
+    args = parser.parse_args(argv)
+
+    events = make_events(args.players, args.hours)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        times = raid_damage_taken(events)[0]["all"]
+
+        # only the timeline is kept of the results
+        tracemalloc.start()
+        timeline = raid_damage_taken(events)[2]
+        timeline_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # a dict of the deficits of everyone after each event, as kept before
+    tracemalloc.start()
+    snapshots = list(timeline)
+    snapshots_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rng = random.Random(1)
+    lookup_times = [rng.uniform(0, times[-1]) for _ in range(args.lookups)]
+
+    t0 = time.perf_counter()
+    for t in lookup_times:
+        timeline.at(t)
+    dt_timeline = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for t in lookup_times:
+        snapshots[bisect.bisect_right(times, t) - 1]
+    dt_snapshots = time.perf_counter() - t0
+
+    print(f"  {args.players} players, {args.hours:.1f} hours, {len(events)} events")
+    print(f"  {'':10s}  {'memory':>9s}  {'lookup':>9s}")
+    print(f"  {'dicts':10s}  {snapshots_size / 1e6:6.1f} MB  {dt_snapshots / args.lookups * 1e6:6.1f} us")
+    print(f"  {'timeline':10s}  {timeline_size / 1e6:6.1f} MB  {dt_timeline / args.lookups * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Memory and grouping speed of the columnar event table, compared with lists of named tuples.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import time
+import tracemalloc
+
+from src import group_processed_lines
+from src.readers.read_from_raw import RawProcessor
+from .synthetic_log import make_synthetic_log
+
+
+def process(log_file):
+    """Process all heals and damage in a log, returns the processor."""
+    processor = RawProcessor(log_file, include_damage=True)
+    processor.process()
+    return processor
+
+
+def measure(build):
+    """Peak and retained memory of building an object, in MB, along with the object."""
+    tracemalloc.start()
+    obj = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return obj, retained / 1024 / 1024, peak / 1024 / 1024
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare memory use of event lists and the event table.")
+    parser.add_argument("--size", type=int, default=100, help="Size of the synthetic log, in MB.")
+    parser.add_argument("--log", default="synthetic_log_memory.txt", help="Path of the synthetic log.")
+
+    args = parser.parse_args(argv)
+
+    make_synthetic_log(args.log, args.size)
+
+    processor, processor_mb, _ = measure(lambda: process(args.log))
+    n_events = len(processor.events)
+    table_mb = processor.events.data.nbytes / 1024 / 1024
+
+    events, list_mb, _ = measure(lambda: list(processor.all_events))
+
+    print(f"  {n_events} events")
+    print()
+    print(f"  {'storage':<16s}  {'retained MB':>11s}  {'bytes / event':>13s}")
+    print(f"  {'named tuples':<16s}  {list_mb:11.1f}  {list_mb * 1024 * 1024 / n_events:13.0f}")
+    print(f"  {'event table':<16s}  {table_mb:11.1f}  {table_mb * 1024 * 1024 / n_events:13.0f}")
+    print(f"  {'processor':<16s}  {processor_mb:11.1f}  {processor_mb * 1024 * 1024 / n_events:13.0f}")
+    print()
+
+    cases = (("named tuples", lambda: list(processor.heals)), ("event table", lambda: processor.heals))
+    for name, get_lines in cases:
+        t0 = time.perf_counter()
+        group_processed_lines(get_lines(), False)
+        dt = time.perf_counter() - t0
+        print(f"  grouping by spell, {name:<12s}  {dt:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
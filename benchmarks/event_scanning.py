@@ -0,0 +1,71 @@
+"""
+Benchmark of processing a raw log by reading every line, against scanning the memory mapped log for wanted events.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import time
+
+from src.readers.read_from_raw import RawProcessor, iter_lines, DECODER
+from src.utils import ms_to_datetime
+
+from .synthetic_log import make_synthetic_log
+
+
+def process_all_lines(processor):
+    """Line by line processing, as RawProcessor.process used to do it."""
+    decode = DECODER.decode
+
+    for line in iter_lines(processor.source):
+        if "SPELL_HEAL," in line or "SPELL_PERIODIC_HEAL," in line:
+            processor.process_heal(decode(line))
+
+        elif "UNIT_DIED," in line:
+            processor.process_death(decode(line))
+
+        elif "SPELL_RESURRECT," in line:
+            processor.process_resurrection(decode(line))
+
+        elif processor.include_damage:
+            if "SWING_DAMAGE_LANDED," in line or "SPELL_DAMAGE," in line or "SPELL_PERIODIC_DAMAGE," in line:
+                processor.process_damage(decode(line))
+
+    processor.events.time_view = ms_to_datetime
+
+
+def time_it(func, *args):
+    t0 = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare line by line processing with the mmap event scanner.")
+    parser.add_argument("log_file", nargs="?", default="synthetic_log.txt", help="Path to the synthetic log.")
+    parser.add_argument("--size", type=int, default=256, help="Size of the synthetic log in MB.")
+    parser.add_argument("--character", default="Saintis", help="Character to filter heals for.")
+
+    args = parser.parse_args(argv)
+
+    make_synthetic_log(args.log_file, args.size)
+
+    print(f"  {'mode':<24s}  {'lines':>10s}  {'scanner':>10s}  {'speed-up':>8s}")
+    for character_name, include_damage in ((args.character, False), (None, False), (None, True)):
+        old = RawProcessor(args.log_file, character_name=character_name, include_damage=include_damage)
+        new = RawProcessor(args.log_file, character_name=character_name, include_damage=include_damage)
+
+        dt_old = time_it(process_all_lines, old)
+        dt_new = time_it(new.process)
+
+        assert old.all_events == new.all_events, "Scanner gave different events"
+
+        mode = character_name if character_name else "all characters"
+        if include_damage:
+            mode += " + damage"
+
+        print(f"  {mode:<24s}  {dt_old:9.2f}s  {dt_new:9.2f}s  {dt_old / dt_new:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Time to run many replications of casting strategies over a long encounter, in lock-step, against single runs.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import io
+import time
+import contextlib
+
+from src.damage.damage_taken import raid_damage_taken
+from src.simulation import CharacterData
+from src.simulation.engine import HealingSimulation
+from src.simulation.monte_carlo import BatchSimulation
+from src.simulation.casting_strategy import CastingStrategy, SingleSpellStrategy
+
+from .deficit_timeline import make_events
+from .simulation import SPELL_IDS
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time Monte Carlo evaluation of casting strategies.")
+    parser.add_argument("--players", type=int, default=40, help="Number of players in the raid.")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Length of the encounter in minutes.")
+    parser.add_argument("--rate", type=float, default=5.0, help="Damage and heal events a second.")
+    parser.add_argument("--replications", type=int, default=1000, help="Replications of each strategy.")
+    parser.add_argument("--crit", type=float, default=0.15, help="Crit chance of the healer.")
+
+    args = parser.parse_args(argv)
+
+    encounter_time = args.minutes * 60
+    events = make_events(args.players, args.minutes / 60, args.rate)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, _, deficits, _, _ = raid_damage_taken(events)
+
+    character_data = CharacterData(800.0, args.crit, 40.0, 200.0, 8000.0)
+
+    strategies = [CastingStrategy(None)] + [SingleSpellStrategy(None, sid) for sid in SPELL_IDS]
+
+    print(f"  {args.players} players, {args.minutes:.0f} minutes, {len(deficits)} deficit changes")
+    print(f"  {args.replications} replications of each strategy")
+    print(f"  {'strategy':28s}  {'lock-step':>9s}  {'single':>9s}  {'net heal':>8s}  {'95% CI':>17s}")
+
+    total = 0.0
+    for i, strategy in enumerate(strategies):
+        t0 = time.perf_counter()
+        net = BatchSimulation(deficits, character_data, strategy, encounter_time, args.replications, seed=i)
+        net = net.run().summarise()["net"]
+        dt = time.perf_counter() - t0
+        total += dt
+
+        # time of a single run, for the time all replications would take one at a time
+        t0 = time.perf_counter()
+        HealingSimulation(deficits, character_data, strategy, encounter_time, seed=i).run()
+        dt_single = (time.perf_counter() - t0) * args.replications
+
+        ci = f"{net.ci_low:.0f}-{net.ci_high:.0f}"
+        print(f"  {strategy.name:28s}  {dt:7.2f} s  {dt_single:7.1f} s  {net.mean:8.0f}  {ci:>17s}")
+
+    print(f"  {len(strategies)} strategies in {total:.1f} s, {total / len(strategies):.2f} s each")
+
+
+if __name__ == "__main__":
+    main()
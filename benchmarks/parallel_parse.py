@@ -0,0 +1,50 @@
+"""
+Scaling of parsing a single large raw log over a process pool, with an increasing number of jobs.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import time
+
+from src.readers.read_from_raw import RawProcessor
+
+from .synthetic_log import make_synthetic_log
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time parsing a whole log with different numbers of jobs.")
+    parser.add_argument("log_file", nargs="?", default="synthetic_log.txt", help="Path to the synthetic log.")
+    parser.add_argument("--size", type=int, default=256, help="Size of the synthetic log in MB.")
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count(), help="Largest number of jobs to try.")
+
+    args = parser.parse_args(argv)
+
+    make_synthetic_log(args.log_file, args.size)
+
+    jobs = [1]
+    while jobs[-1] * 2 <= args.max_jobs:
+        jobs.append(jobs[-1] * 2)
+
+    if jobs[-1] != args.max_jobs:
+        jobs.append(args.max_jobs)
+
+    print(f"  {'jobs':>4s}  {'time':>8s}  {'speed-up':>8s}  {'events':>8s}")
+
+    reference = None
+    for n in jobs:
+        processor = RawProcessor(args.log_file, use_index=False, jobs=n)
+
+        t0 = time.perf_counter()
+        table = processor.parse_all()
+        dt = time.perf_counter() - t0
+
+        if reference is None:
+            reference = dt
+
+        print(f"  {n:4d}  {dt:6.2f} s  {reference / dt:7.1f}x  {len(table):8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Scaling of per-spell plotting over a process pool, running `overheal_plot` with an increasing number of jobs.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import time
+import tempfile
+import contextlib
+
+from overheal_plot import overheal_plot
+from .synthetic_log import TEST_LOG
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time overheal_plot with different numbers of jobs.")
+    parser.add_argument("--log", default=TEST_LOG, help="Log to plot spells for.")
+    parser.add_argument("--character", default="Saintis", help="Character to plot spells for.")
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count(), help="Largest number of jobs to try.")
+
+    args = parser.parse_args(argv)
+
+    jobs = [1]
+    while jobs[-1] * 2 <= args.max_jobs:
+        jobs.append(jobs[-1] * 2)
+
+    if jobs[-1] != args.max_jobs:
+        jobs.append(args.max_jobs)
+
+    print(f"  {'jobs':>4s}  {'time':>8s}  {'speed-up':>8s}")
+
+    reference = None
+    for n in jobs:
+        with tempfile.TemporaryDirectory() as path, contextlib.redirect_stdout(None):
+            t0 = time.perf_counter()
+            overheal_plot(args.log, args.character, path=path, encounter=0, jobs=n)
+            dt = time.perf_counter() - t0
+
+        if reference is None:
+            reference = dt
+
+        print(f"  {n:4d}  {dt:6.2f} s  {reference / dt:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark of the parsed log cache, timing processing of a log with no cache, when writing the cache and when loading it.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import time
+
+from src.readers import log_cache
+from src.readers.read_from_raw import RawProcessor
+from .synthetic_log import make_synthetic_log
+
+
+def time_process(log_file, **kwargs):
+    t0 = time.perf_counter()
+    processor = RawProcessor(log_file, include_damage=True, **kwargs)
+    processor.process()
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time processing a log with and without the parsed log cache.")
+    parser.add_argument("--size", type=int, default=100, help="Size of the synthetic log, in MB.")
+    parser.add_argument("--log", default="synthetic_log_cache.txt", help="Path of the synthetic log.")
+    parser.add_argument("--runs", type=int, default=8, help="Number of runs on the log, like scripts in a pipeline.")
+
+    args = parser.parse_args(argv)
+
+    make_synthetic_log(args.log, args.size)
+
+    for path in log_cache.cache_paths(args.log):
+        if os.path.exists(path):
+            os.remove(path)
+
+    no_cache = time_process(args.log)
+    first = time_process(args.log, use_cache=True)
+    cached = [time_process(args.log, use_cache=True) for _ in range(args.runs - 1)]
+
+    print(f"  {'run':<24s}  {'time':>8s}")
+    print(f"  {'no cache':<24s}  {no_cache:6.2f} s")
+    print(f"  {'first, writing cache':<24s}  {first:6.2f} s")
+    print(f"  {'later, loading cache':<24s}  {sum(cached) / len(cached):6.2f} s")
+    print()
+    print(f"  {args.runs} runs: {args.runs * no_cache:.2f} s without cache, {first + sum(cached):.2f} s with cache")
+
+
+if __name__ == "__main__":
+    main()
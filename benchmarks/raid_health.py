@@ -0,0 +1,88 @@
+"""
+Scaling of tracking the health of a raid, with the size of the raid and the number of events.
+
+Players die now and then and stay dead for a while, without taking events, so there are often several dead players at
+once, as in a wipe.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import io
+import time
+import random
+import contextlib
+from datetime import timedelta
+
+from src.readers.event_types import DamageTakenEvent
+from src.damage.damage_taken import RaidHealthTracker
+
+
+def make_events(players=40, hours=1.0, rate=20.0, death_chance=0.002, seed=0):
+    """
+    Damage taken and heals of a raid, `rate` events a second on average.
+
+    :param death_chance: chance of each damage event killing its target, who then takes no events for 30 to 120 s
+    """
+    rng = random.Random(seed)
+    ids = [(f"Player-4755-{i:08X}", f"Raider{i}") for i in range(players)]
+
+    # time each player is dead until
+    dead_until = [0.0] * players
+
+    events = []
+    t = 0.0
+    end = hours * 3600
+    while t < end:
+        t += rng.expovariate(rate)
+        i = rng.randrange(players)
+        if dead_until[i] > t:
+            continue
+
+        target_id, target = ids[i]
+        source = ids[rng.randrange(players)][1]
+        amount = rng.randint(100, 2000)
+
+        if rng.random() < 0.5:
+            overkill = 0
+            if rng.random() < death_chance:
+                overkill = -rng.randint(1, 500)
+                dead_until[i] = t + rng.uniform(30, 120)
+
+            event = (-amount, -amount // 10, overkill)
+        else:
+            event = (amount, rng.randint(0, amount), 0)
+
+        events.append(DamageTakenEvent(timedelta(seconds=t), source, None, "0", target, target_id, 90, *event))
+
+    return events
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time tracking raid health for different raid sizes and log lengths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=(10, 20, 40, 80, 160), help="Raid sizes to try.")
+    parser.add_argument("--hours", type=float, nargs="+", default=(0.5, 1.0, 2.0, 4.0), help="Log lengths to try.")
+
+    args = parser.parse_args(argv)
+
+    print(f"  {'players':>7s}  {'hours':>5s}  {'events':>8s}  {'time':>8s}  {'per event':>9s}  {'max dead':>8s}")
+
+    for players in args.sizes:
+        for hours in args.hours:
+            events = make_events(players, hours)
+            tracker = RaidHealthTracker()
+
+            max_dead = 0
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for e in events:
+                    tracker.add(e)
+                    max_dead = max(max_dead, len(tracker.death_times))
+            dt = time.perf_counter() - t0
+
+            per_event = dt / len(events) * 1e6
+            print(f"  {players:7d}  {hours:5.1f}  {len(events):8d}  {dt:6.2f} s  {per_event:6.2f} us  {max_dead:8d}")
+
+
+if __name__ == "__main__":
+    main()
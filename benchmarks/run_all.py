@@ -0,0 +1,79 @@
+"""
+Time taken by the nightly report of `run_all.py`, reading the log once, against running the scripts one by one.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import io
+import os
+import time
+import contextlib
+
+import overheal_table
+import overheal_crit
+import count_buffs
+import evaluate_3t1
+import run_all
+from src.readers import log_cache
+from src.readers.read_from_raw import RawProcessor
+from src.readers.scanner import scan_lines
+
+from .synthetic_log import make_synthetic_log
+
+
+def _remove_cache(log_file):
+    for path in log_cache.cache_paths(log_file):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def one_by_one(log_file, character_name):
+    """The analyses of the report, each script reading the log itself, as when run one after the other."""
+    overheal_table.process_log(log_file, character_name, encounter=0, log_cache=True)
+    overheal_crit.overheal_crit(log_file, character_name, encounter=0, log_cache=True)
+
+    buff_data = count_buffs.get_buff_lines(log_file)
+    count_buffs.display_data(*count_buffs.aggregate_buff_lines(*buff_data))
+
+    evaluate_3t1.get_flash_heal_casts(character_name, scan_lines(log_file, evaluate_3t1.CAST_EVENTS))
+
+    RawProcessor(log_file).get_casts()
+    RawProcessor(log_file).get_deaths()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the nightly report against running the scripts one by one.")
+    parser.add_argument("log_file", nargs="?", default="synthetic_log.txt", help="Path to the synthetic log.")
+    parser.add_argument("--size", type=int, default=64, help="Size of the synthetic log in MB.")
+    parser.add_argument("--character", default="Saintis", help="Character to analyse.")
+
+    args = parser.parse_args(argv)
+
+    make_synthetic_log(args.log_file, args.size)
+
+    runs = (
+        ("one by one", lambda: one_by_one(args.log_file, args.character)),
+        ("run_all", lambda: run_all.run_all(args.log_file, args.character, encounter=0)),
+    )
+
+    print(f"  {'':10s}  {'no cache':>8s}  {'cached':>8s}")
+
+    for name, run in runs:
+        # a new log has no parsed log cache yet, the scripts make it on their first run
+        _remove_cache(args.log_file)
+
+        times = []
+        for _ in range(2):
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run()
+            times.append(time.perf_counter() - t0)
+
+        print(f"  {name:10s}  {times[0]:6.2f} s  {times[1]:6.2f} s")
+
+    _remove_cache(args.log_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Time to evaluate casting strategies over a long encounter with the discrete-event healing simulation.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import io
+import time
+import contextlib
+
+from src.damage.damage_taken import raid_damage_taken
+from src.simulation import CharacterData
+from src.simulation.engine import HealingSimulation
+from src.simulation.casting_strategy import CastingStrategy, SingleSpellStrategy
+
+from .deficit_timeline import make_events
+
+SPELL_IDS = (
+    "10917",
+    "10916",
+    "10915",
+    "9474",
+    "9473",
+    "9472",
+    "2061",
+    "2053",
+    "10965",
+    "10964",
+    "10963",
+    "2060",
+    "6064",
+    "6063",
+    "2055",
+    "2054",
+)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time evaluating casting strategies over an encounter.")
+    parser.add_argument("--players", type=int, default=40, help="Number of players in the raid.")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Length of the encounter in minutes.")
+    parser.add_argument("--rate", type=float, default=5.0, help="Damage and heal events a second.")
+    parser.add_argument("--repeat", type=int, default=5, help="Times to evaluate each strategy.")
+
+    args = parser.parse_args(argv)
+
+    encounter_time = args.minutes * 60
+    events = make_events(args.players, args.minutes / 60, args.rate)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, _, deficits, _, _ = raid_damage_taken(events)
+
+    character_data = CharacterData(800.0, 0.0, 40.0, 200.0, 8000.0)
+
+    strategies = [CastingStrategy(None)] + [SingleSpellStrategy(None, sid) for sid in SPELL_IDS]
+
+    print(f"  {args.players} players, {args.minutes:.0f} minutes, {len(deficits)} deficit changes")
+    print(f"  {'strategy':28s}  {'time':>8s}  {'casts':>5s}  {'healing':>8s}")
+
+    total = 0.0
+    for strategy in strategies:
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            sim = HealingSimulation(deficits, character_data, strategy, encounter_time).run()
+        dt = (time.perf_counter() - t0) / args.repeat
+        total += dt
+
+        print(f"  {strategy.name:28s}  {dt * 1000:5.1f} ms  {sim.casts:5d}  {sim.sum_net_healing:8.0f}")
+
+    print(f"  {len(strategies)} strategies in {total * 1000:.0f} ms, {total / len(strategies) * 1000:.1f} ms each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmarks of the spell power sweeps in `overheal_plot` and `overheal_probability`, comparing the per-step loops with
+the vectorised versions.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import time
+
+import numpy as np
+
+from overheal_plot import sweep_lines_for_spell
+from overheal_probability import overheal_counts
+
+
+def random_lines(n, seed=0):
+    """Random (heal, overheal, is_crit) lines, roughly like a Greater Heal."""
+    rng = np.random.default_rng(seed)
+    heals = rng.integers(1900, 2400, n)
+    overheals = np.minimum(heals, rng.integers(0, 2500, n) * rng.integers(0, 2, n))
+    crits = rng.random(n) < 0.15
+
+    return list(zip(heals.tolist(), overheals.tolist(), crits.tolist()))
+
+
+def process_lines_for_spell(lines, dh, base_heal=None):
+    """The per-step loop `sweep_lines_for_spell` replaced, for a single spell power adjustment."""
+    n_h = 0
+    n_oh = 0
+    n_f_oh = 0
+    n_oh_nc = 0
+
+    total_h = 0.0
+    total_oh = 0.0
+
+    total_h_nc = 0.0
+    total_oh_nc = 0.0
+
+    for h, oh, crit in lines:
+        dh_c = dh
+
+        oh_nc = oh
+        h_nc = h
+
+        if base_heal and h < base_heal:
+            # Skip unexpectedly low heals
+            continue
+
+        if crit:
+            # scale spell power differential by 1.5 if spell was a crit
+            dh_c *= 1.5
+
+            # Scale oh down
+            h_nc = h / 1.5
+            oh_nc = oh - (h - h_nc)
+
+        # remove spell power contribution
+        h -= dh_c
+        oh -= dh_c
+        if oh < 0.0:
+            oh = 0.0
+
+        h_nc -= dh
+        oh_nc -= dh
+        if oh_nc < 0.0:
+            oh_nc = 0.0
+
+        n_h += 1
+
+        if oh > 0.0:
+            n_oh += 1
+            if oh >= h:
+                n_f_oh += 1
+
+        if oh_nc > 0.0:
+            n_oh_nc += 1
+
+        total_h += h
+        total_oh += oh
+
+        total_h_nc += h_nc
+        total_oh_nc += oh_nc
+
+    return n_h, n_oh, n_f_oh, n_oh_nc, total_h, total_oh, total_h_nc, total_oh_nc
+
+
+def loop_sweep(lines, dhs, base_heal):
+    return [process_lines_for_spell(lines, dh, base_heal) for dh in dhs]
+
+
+def loop_overheal_counts(lines, dhs, _):
+    """The per-step loop `overheal_counts` replaced."""
+    counts = []
+
+    for dh in dhs:
+        n_h = n_oh = n_oh_nc = 0
+
+        for h, oh, crit in lines:
+            dh_c = dh * 1.5 if crit else dh
+            oh_nc = oh - (h - h / 1.5) if crit else oh
+
+            if h - dh_c < 0.0:
+                continue
+
+            n_h += 1
+            n_oh += oh - dh_c > 0.0
+            n_oh_nc += oh_nc - dh > 0.0
+
+        counts.append((n_h, n_oh, n_oh_nc))
+
+    return counts
+
+
+def binary_search_counts(lines, dhs, _):
+    return overheal_counts(lines, 1.0, -dhs)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare spell power sweep speeds.")
+    parser.add_argument("--heals", type=int, default=5000, help="Number of heals to sweep over.")
+    parser.add_argument("--steps", type=int, default=401, help="Number of spell power steps.")
+
+    args = parser.parse_args(argv)
+
+    lines = random_lines(args.heals)
+    dhs = -np.linspace(0, 400, args.steps) * 0.857
+
+    print(f"  {args.heals} heals, {args.steps} spell power steps")
+    print()
+
+    cases = (
+        ("overheal_plot", (("loop", loop_sweep), ("vectorised", sweep_lines_for_spell))),
+        ("overheal_probability", (("loop", loop_overheal_counts), ("searchsorted", binary_search_counts))),
+    )
+
+    for script, sweeps in cases:
+        print(f"  {script}")
+
+        reference = None
+        for name, sweep in sweeps:
+            t0 = time.perf_counter()
+            sweep(lines, dhs, 1900)
+            dt = time.perf_counter() - t0
+
+            if reference is None:
+                reference = dt
+
+            print(f"    {name:<12s}  {dt:8.3f} s  {reference / dt:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
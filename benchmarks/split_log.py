@@ -0,0 +1,78 @@
+"""
+Benchmark of splitting a large raw log by raid, against plainly copying the log, for speed and peak memory.
+
+Each run is done in a fresh subprocess, in a fresh output directory, so the peak resident set size can be compared.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import contextlib
+import subprocess
+
+from .synthetic_log import make_synthetic_log
+
+MODES = ("copy", "split", "gzip")
+
+
+def run_child(log_file, mode, output_dir):
+    import split_log
+
+    t0 = time.perf_counter()
+    if mode == "copy":
+        shutil.copyfile(log_file, os.path.join(output_dir, "copy.txt"))
+        n_files = 1
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            paths = split_log.split_log(log_file, output_dir=output_dir, compress="gzip" if mode == "gzip" else None)
+        n_files = len(paths)
+    dt = time.perf_counter() - t0
+
+    # ru_maxrss is in kB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{peak_mb:.1f} {dt:.2f} {n_files}")
+
+
+def run(log_file, mode):
+    with tempfile.TemporaryDirectory() as output_dir:
+        cmd = [sys.executable, "-m", "benchmarks.split_log", log_file, "--child", mode, output_dir]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+
+    peak_mb, dt, n_files = out.split()
+
+    return float(peak_mb), float(dt), int(n_files)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare splitting a log by raid with copying it.")
+    parser.add_argument("log_file", nargs="?", default="synthetic_log.txt", help="Path to the synthetic log.")
+    parser.add_argument("--size", type=int, default=2048, help="Size of the synthetic log in MB.")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.log_file, *args.child)
+        return
+
+    make_synthetic_log(args.log_file, args.size)
+    size_mb = os.path.getsize(args.log_file) / 1024 / 1024
+
+    print(f"Synthetic log: {size_mb:.0f} MB")
+    print()
+    print(f"  {'mode':<6s}  {'peak RSS':>10s}  {'time':>8s}  {'speed':>10s}  {'files':>6s}")
+
+    for mode in MODES:
+        peak_mb, dt, n_files = run(args.log_file, mode)
+        print(f"  {mode:<6s}  {peak_mb:7.0f} MB  {dt:7.2f}s  {size_mb / dt:5.0f} MB/s  {n_files:6d}")
+
+
+if __name__ == "__main__":
+    main()
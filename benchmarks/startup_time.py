@@ -0,0 +1,97 @@
+"""
+Benchmark of the start up time of the scripts.
+
+Runs every script with `-h`, and overheal_table.py on the test log, under `python -X importtime`, and reports the time
+spent importing modules on top of a bare interpreter, as well as the wall time of the whole run, both the best of a few
+runs.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+
+import sys
+import time
+import subprocess
+
+SCRIPTS = (
+    "overheal_table.py",
+    "overheal_crit.py",
+    "overheal_summary.py",
+    "overheal_plot.py",
+    "overheal_probability.py",
+    "overheal_cdf.py",
+    "estimate_spell_power.py",
+    "track_damage_taken.py",
+    "analyse_casts.py",
+    "analyse_spells.py",
+    "optimise_casts.py",
+    "split_log.py",
+)
+
+TABLE_RUN = ("overheal_table.py", "tests/test_log.txt", "Saintis", "-e", "0")
+
+
+def import_times(stderr):
+    """Cumulative import time of each top level import, in ms, from the output of `python -X importtime`."""
+    times = dict()
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            # nested import, already counted in its parent
+            continue
+
+        times[name.strip()] = int(cumulative) / 1000
+
+    return times
+
+
+def time_run(args, repeat, bare=()):
+    """
+    Best import time and best wall time, in ms, of running python with the given arguments.
+
+    :param bare: names of modules imported by a bare interpreter, left out of the import time
+    """
+    best_import = best_wall = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True)
+        wall = (time.perf_counter() - t0) * 1000
+
+        times = import_times(result.stderr)
+        imported = sum(t for name, t in times.items() if name not in bare)
+
+        best_import = min(best_import, imported)
+        best_wall = min(best_wall, wall)
+
+    return best_import, best_wall
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the start up of the scripts.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs to take the best of.")
+
+    args = parser.parse_args(argv)
+
+    bare = import_times(
+        subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True).stderr
+    )
+    _, bare_wall = time_run(("-c", "pass"), args.repeat)
+
+    print(f"  bare interpreter: {bare_wall:.0f} ms")
+    print()
+    print(f"  {'':<48s}  {'imports':>8s}  {'wall':>8s}")
+
+    runs = [(script, "-h") for script in SCRIPTS] + [TABLE_RUN]
+    for run in runs:
+        imported, wall = time_run(run, args.repeat, bare)
+        label = " ".join(run)
+        print(f"  {label:<48s}  {imported:5.0f} ms  {wall:5.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of peak memory use when processing a large raw log, with and without streaming.
+
+Each run is done in a fresh subprocess, so the peak resident set size can be compared directly.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import sys
+import time
+import resource
+import subprocess
+
+from .synthetic_log import make_synthetic_log
+
+
+def run_child(log_file, stream):
+    from src.readers.read_from_raw import RawProcessor
+
+    t0 = time.perf_counter()
+    processor = RawProcessor(log_file, character_name="Saintis", stream=stream)
+    encounters = processor.get_encounters()
+    processor.process()
+    processor.get_deaths()
+    dt = time.perf_counter() - t0
+
+    # ru_maxrss is in kB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{peak_mb:.1f} {dt:.2f} {len(encounters)} {len(processor.heals)}")
+
+
+def run(log_file, stream):
+    cmd = [sys.executable, "-m", "benchmarks.streaming_memory", log_file, "--child"]
+    if stream:
+        cmd.append("--stream")
+
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    peak_mb, dt, n_encounters, n_heals = out.split()
+
+    return float(peak_mb), float(dt), int(n_encounters), int(n_heals)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare peak memory of streamed and in-memory log processing.")
+    parser.add_argument("log_file", nargs="?", default="synthetic_log.txt", help="Path to the synthetic log.")
+    parser.add_argument("--size", type=int, default=2048, help="Size of the synthetic log in MB.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stream", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stream-only", action="store_true", help="Only run the streaming mode.")
+
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.log_file, args.stream)
+        return
+
+    copies = make_synthetic_log(args.log_file, args.size)
+    print(f"Synthetic log: {copies} copies of the test log")
+    print()
+    print(f"  {'mode':<10s}  {'peak RSS':>10s}  {'time':>8s}  {'encounters':>10s}  {'heals':>8s}")
+
+    modes = (True,) if args.stream_only else (True, False)
+    for stream in modes:
+        peak_mb, dt, n_encounters, n_heals = run(args.log_file, stream)
+        mode = "stream" if stream else "in-memory"
+        print(f"  {mode:<10s}  {peak_mb:7.0f} MB  {dt:7.1f}s  {n_encounters:10d}  {n_heals:8d}")
+
+
+if __name__ == "__main__":
+    main()
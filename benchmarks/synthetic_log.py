@@ -0,0 +1,164 @@
+"""
+Builds large synthetic combat logs, by repeating the test log or by simulating the casts of a whole raid.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import heapq
+import random
+import shutil
+
+TEST_LOG = "tests/test_log.txt"
+
+
+def make_synthetic_log(path, size_mb, template=TEST_LOG):
+    """
+    Write a log of at least `size_mb` megabytes made from copies of the template log.
+
+    An existing file of the right size is reused, as these can take a while to write.
+
+    :param path: where to write the log
+    :param size_mb: minimum size of the log, in MB
+    :param template: the log to repeat
+    :returns the number of copies of the template in the log
+    """
+    template_size = os.path.getsize(template)
+    copies = max(1, -(-size_mb * 1024 * 1024 // template_size))
+
+    if os.path.exists(path) and os.path.getsize(path) == copies * template_size:
+        return copies
+
+    print(f"Writing {copies} copies of `{template}` to `{path}`...")
+    with open(path, "wb") as out:
+        for _ in range(copies):
+            with open(template, "rb") as fh:
+                shutil.copyfileobj(fh, out)
+
+    return copies
+
+
+# spell id, name, cast time in seconds and mean heal of the healing spells cast in a simulated raid
+RAID_HEALS = ((10917, "Flash Heal", 1.5, 900), (6064, "Heal", 3.0, 1300), (10396, "Healing Wave", 2.5, 2000))
+# instant spells cast by healers, without a heal event
+RAID_INSTANTS = ((10901, "Power Word: Shield"), (988, "Dispel Magic"), (10938, "Power Word: Fortitude"))
+# spells cast by everyone else
+RAID_ATTACKS = (
+    (25241, "Shadow Bolt", 3.0),
+    (10151, "Fireball", 3.5),
+    (11585, "Overpower", 0.0),
+    (2687, "Bloodrage", 0.0),
+)
+
+_ADVANCED = "0000000000000000,100,100,0,0,0,-1,0,0,0,0.00,0.00,0,0.0000,60"
+_NO_TARGET = "0000000000000000,nil,0x80000000,0x80000000"
+
+
+def _time_text(seconds):
+    ms = int(round(seconds * 1000))
+    s, ms = divmod(ms, 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return f"4/28 {19 + h}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def make_raid_log(path, players=40, hours=3.0, healers=8, seed=0):
+    """
+    Write a log of the casts of a whole raid, as read when analysing casts.
+
+    Healers cast heals, some cancelled, interrupted or followed by the next cast starting in the same batch as the heal
+    lands, and instant spells that have no heal. Everyone else casts attacks. Events land in server batches of 0.1 s,
+    and players die now and then. An existing file is reused.
+
+    :param path: where to write the log
+    :param players: number of players in the raid
+    :param hours: length of the log in hours
+    :param healers: number of the players that are healers
+    :param seed: seed of the random casts
+    :returns the number of lines in the log
+    """
+    if os.path.exists(path):
+        with open(path, "rb") as fh:
+            return sum(1 for _ in fh)
+
+    rng = random.Random(seed)
+    players = [(f"Player-4755-{i:08X}", f'"Raider{i}-Dreadmist"') for i in range(players)]
+    end = hours * 3600
+
+    events = []
+
+    def add(t, event, first=False):
+        """Add an event at time t, to the start of its batch if first."""
+        t = round(t, 1)
+        events.append((t, 0 if first else 1, len(events), f"{_time_text(t)}  {event}"))
+
+    # (time of the next cast, player, if starting in the same batch as the last cast lands)
+    queue = [(rng.uniform(0, 2), i, False) for i in range(len(players))]
+    heapq.heapify(queue)
+
+    while queue:
+        t, i, chained = heapq.heappop(queue)
+        if t > end:
+            continue
+
+        player_id, name = players[i]
+        target_id, target = players[rng.randrange(len(players))]
+        source = f"{player_id},{name},0x514,0x0"
+        target_fields = f"{target_id},{target},0x514,0x0"
+
+        if rng.random() < 0.0005:
+            add(t, f"UNIT_DIED,{_NO_TARGET},{target_fields}")
+
+        if i < healers and rng.random() < 0.75:
+            spell_id, spell, cast_time, heal = rng.choice(RAID_HEALS)
+            spell_fields = f'{spell_id},"{spell}",0x2'
+            add(t, f"SPELL_CAST_START,{source},{_NO_TARGET},{spell_fields}", first=chained)
+
+            roll = rng.random()
+            done = t + cast_time
+
+            if roll < 0.05:
+                add(t + cast_time / 2, f'SPELL_CAST_FAILED,{source},{_NO_TARGET},{spell_fields},"Interrupted"')
+                heapq.heappush(queue, (t + cast_time / 2 + 0.5, i, False))
+                continue
+
+            if roll < 0.10:
+                # cancelled by starting another cast
+                heapq.heappush(queue, (t + rng.uniform(0.2, cast_time - 0.1), i, False))
+                continue
+
+            amount = int(rng.gauss(heal, heal / 10))
+            over = max(0, int(amount * rng.uniform(-0.5, 1.0)))
+            add(done, f"SPELL_CAST_SUCCESS,{source},{target_fields},{spell_fields},{player_id},{_ADVANCED}")
+            add(
+                done,
+                f"SPELL_HEAL,{source},{target_fields},{spell_fields},{target_id},{_ADVANCED},{amount},{amount},{over},0,nil",
+            )
+
+            if roll < 0.20:
+                heapq.heappush(queue, (done, i, True))
+            else:
+                heapq.heappush(queue, (done + rng.uniform(0.1, 1.5), i, False))
+
+        elif i < healers:
+            spell_id, spell = rng.choice(RAID_INSTANTS)
+            spell_fields = f'{spell_id},"{spell}",0x2'
+            add(t, f"SPELL_CAST_SUCCESS,{source},{target_fields},{spell_fields},{player_id},{_ADVANCED}")
+            heapq.heappush(queue, (t + 1.5, i, False))
+
+        else:
+            spell_id, spell, cast_time = rng.choice(RAID_ATTACKS)
+            spell_fields = f'{spell_id},"{spell}",0x1'
+            if cast_time > 0:
+                add(t, f"SPELL_CAST_START,{source},{_NO_TARGET},{spell_fields}")
+
+            done = t + cast_time
+            add(done, f"SPELL_CAST_SUCCESS,{source},{_NO_TARGET},{spell_fields},{player_id},{_ADVANCED}")
+            heapq.heappush(queue, (done + 1.5, i, False))
+
+    events.sort()
+
+    with open(path, "w", encoding="utf-8") as out:
+        for event in events:
+            out.write(event[3] + "\n")
+
+    return len(events)
@@ -0,0 +1,75 @@
+"""
+Cost of picking a heal target as the size of the raid grows, for the target policies against merging all deficits.
+
+Each step changes the deficit of a random player and picks a target, as the simulation does for each deficit change.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import time
+import random
+
+from src.simulation.targeting import LargestDeficit, TankPriority, SmartHealGroups
+
+
+def pick_by_merging(deficits, applied_heals):
+    """Target with the largest deficit, merging in the applied heals of everyone, as picked before."""
+    dd = {k: min(0, deficits.get(k, 0) + applied_heals.get(k, 0)) for k in set(deficits)}
+    d = min(dd, key=dd.get)
+    return d, dd[d]
+
+
+def make_changes(players, steps, seed=0):
+    rng = random.Random(seed)
+    return [(f"Raider{rng.randrange(players)}", -rng.randint(0, 5000)) for _ in range(steps)]
+
+
+def time_merging(changes):
+    deficits = dict()
+    applied_heals = dict()
+
+    t0 = time.perf_counter()
+    for player_id, deficit in changes:
+        deficits[player_id] = deficit
+        pick_by_merging(deficits, applied_heals)
+
+    return time.perf_counter() - t0
+
+
+def time_policy(policy, changes):
+    selector = policy.selector()
+
+    t0 = time.perf_counter()
+    for player_id, deficit in changes:
+        selector.update(player_id, deficit)
+        selector.pick()
+
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time picking heal targets for different raid sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=(10, 20, 40, 80, 160, 640), help="Raid sizes to try.")
+    parser.add_argument("--steps", type=int, default=20000, help="Deficit changes to pick a target after.")
+
+    args = parser.parse_args(argv)
+
+    print(f"  time per pick, over {args.steps} picks")
+    print(f"  {'players':>7s}  {'merging':>9s}  {'largest':>9s}  {'tanks':>9s}  {'groups':>9s}")
+
+    for players in args.sizes:
+        changes = make_changes(players, args.steps)
+
+        tanks = [f"Raider{i}" for i in range(min(players, 4))]
+        groups = [[f"Raider{i}" for i in range(g, min(g + 5, players))] for g in range(0, players, 5)]
+
+        times = [time_merging(changes)]
+        for policy in (LargestDeficit(), TankPriority(tanks), SmartHealGroups(groups)):
+            times.append(time_policy(policy, changes))
+
+        print(f"  {players:7d}  " + "  ".join(f"{dt / args.steps * 1e6:6.1f} us" for dt in times))
+
+
+if __name__ == "__main__":
+    main()
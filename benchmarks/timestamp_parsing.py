@@ -0,0 +1,67 @@
+"""
+Microbenchmark of timestamp parsing, comparing `datetime.strptime` with the fixed-format decoders in `src.utils`.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import timeit
+from datetime import datetime
+
+from src import utils
+from src.readers.read_from_raw import get_lines
+from .synthetic_log import TEST_LOG
+
+
+def strptime_time_stamp(text):
+    """The timestamp parser from before, for comparison."""
+    return datetime.strptime(text.split("  ")[0], utils.STR_P_TIME)
+
+
+def parse_uncached(parse, texts):
+    """Parse each timestamp, clearing the last-seen cache every time."""
+    for text in texts:
+        utils._last_ms = (None, 0)
+        utils._last_datetime = (None, None)
+        parse(text)
+
+
+def parse_all(parse, texts):
+    for text in texts:
+        parse(text)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare timestamp parsing speeds.")
+    parser.add_argument("-n", "--number", type=int, default=5, help="Number of passes over the test log.")
+
+    args = parser.parse_args(argv)
+
+    # first part of every line, as the readers pass it in
+    texts = [line.split(",", 1)[0] for line in get_lines(TEST_LOG)]
+
+    cases = (
+        ("strptime", parse_all, strptime_time_stamp),
+        ("get_time_stamp, no cache", parse_uncached, utils.get_time_stamp),
+        ("get_time_stamp", parse_all, utils.get_time_stamp),
+        ("parse_time_ms, no cache", parse_uncached, utils.parse_time_ms),
+        ("parse_time_ms", parse_all, utils.parse_time_ms),
+    )
+
+    print(f"  {len(texts)} timestamps, {args.number} passes")
+    print()
+    print(f"  {'parser':<26s}  {'ns / call':>10s}  {'speed-up':>8s}")
+
+    reference = None
+    for name, runner, parse in cases:
+        dt = timeit.timeit(lambda: runner(parse, texts), number=args.number)
+        ns = dt / (args.number * len(texts)) * 1e9
+
+        if reference is None:
+            reference = ns
+
+        print(f"  {name:<26s}  {ns:10.0f}  {reference / ns:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
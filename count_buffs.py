@@ -4,47 +4,49 @@ Count up cast buffs and resurrections.
 By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
 import spell_data as sd
-from src.readers import read_from_raw as raw
+from src.readers.scanner import scan_lines
+from src.readers.decoder import EventDecoder
 
+BUFF_EVENTS = ("SPELL_RESURRECT", "SPELL_DISPEL", "SPELL_DISPEL_FAILED", "SPELL_CAST_SUCCESS")
 
-def get_line_data(line):
-    """Get data from a spell line."""
-    line_parts = line.split(",")
+DECODER = EventDecoder(("spell_id", "spell_name", "source", "target"))
 
-    cast_player = line_parts[2].strip('"').split("-")[0]
-    target = line_parts[6].strip('"')
-    if "-" in target:
-        target = target.split("-")[0]
 
-    spell_id = line_parts[9]
-    spell_name = line_parts[10]
+def get_line_data(record):
+    """Get data from a decoded spell line."""
+    return (record.spell_id, record.spell_name, record.source, record.target)
 
-    return (spell_id, spell_name, cast_player, target)
 
+def buff_handlers():
+    """
+    Handlers collecting the data of resurrection, buff and dispel lines, for `EventDecoder.dispatch` or an `EventBus`.
 
-def get_buff_lines(log_file):
-    log = raw.get_lines(log_file)
-
+    :returns handlers, (res_lines, buff_lines, dispel_lines), the handlers by event type and the lists they fill
+    """
     # Filtered and processed lines
     res_lines = []
     buff_lines = []
     dispel_lines = []
 
-    for line in log:
-        if "SPELL_RESURRECT" in line:
-            line_data = get_line_data(line)
-            res_lines.append(line_data)
+    def buff(record, *_):
+        if record.spell_id in sd.SPELL_BUFFS:
+            buff_lines.append(get_line_data(record))
 
-        elif "SPELL_DISPEL" in line:
-            line_data = get_line_data(line)
-            dispel_lines.append(line_data)
+    handlers = {
+        "SPELL_RESURRECT": lambda record, *_: res_lines.append(get_line_data(record)),
+        "SPELL_DISPEL": lambda record, *_: dispel_lines.append(get_line_data(record)),
+        "SPELL_DISPEL_FAILED": lambda record, *_: dispel_lines.append(get_line_data(record)),
+        "SPELL_CAST_SUCCESS": buff,
+    }
 
-        elif "SPELL_CAST_SUCCESS" in line:
-            line_data = get_line_data(line)
-            if line_data[0] in sd.SPELL_BUFFS:
-                buff_lines.append(line_data)
+    return handlers, (res_lines, buff_lines, dispel_lines)
+
+
+def get_buff_lines(log_file):
+    handlers, buff_data = buff_handlers()
+    DECODER.dispatch(scan_lines(log_file, BUFF_EVENTS), handlers)
 
-    return res_lines, buff_lines, dispel_lines
+    return buff_data
 
 
 def aggregate_buff_lines(res_lines, buff_lines, dispel_lines):
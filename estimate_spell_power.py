@@ -3,8 +3,6 @@ Python script that estimates spell power from logs.
 
 By: Filip Gokstorp (Saintis), 2020
 """
-import numpy as np
-
 from src.readers import read_heals
 from src import group_processed_lines
 
@@ -22,6 +20,8 @@ def filter_out_reduced_healing(raw_heals):
 
 
 def process_spell(spell_id, spell_lines, heal_increase=0.0):
+    import numpy as np
+
     spell_name = sd.spell_name(spell_id)
 
     n_heals = 0
@@ -130,7 +130,7 @@ def estimate_spell_power(source, character_name, spell_id=None, spiritual_healin
 
 
 if __name__ == "__main__":
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     parser = OverhealParser(
         description="Analyses logs and and estimates spell power and crit chance.",
@@ -143,4 +143,4 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    estimate_spell_power(args.source, args.character_name, args.spell_id, args.sh, args.ir)
+    estimate_spell_power(args.source, args.character_name, args.spell_id, args.sh, args.ir, **reader_options(args))
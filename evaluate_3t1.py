@@ -7,79 +7,65 @@ Whenever a spell is cast, check if the previous spell as a FH and new spell was
 By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
 
-from src.readers import read_from_raw as raw
-from src.utils import get_player_name, get_time_stamp
+from src.utils import get_time_stamp
 from src.readers import get_processor
+from src.readers.scanner import scan_lines
+from src.readers.decoder import EventDecoder
 
+CAST_EVENTS = ("SPELL_CAST_SUCCESS", "SPELL_CAST_START")
 
-def get_flash_heal_casts(character_name, log_lines):
-    """Get spell casts and time stamps for specified character in lines."""
+DECODER = EventDecoder(("source", "spell_name"))
 
-    flash_casts = 0
-    t1_3_potentials = 0
 
-    t_end = None
+class FlashHealCounter:
+    """Counts the Flash Heals of a character, and the casts started right after them, from cast records in log order."""
 
-    for line in log_lines:
-        line_parts = line.split(",")
+    def __init__(self, character_name):
+        self.character_name = character_name
 
-        if "SPELL_CAST_SUCCESS" in line_parts[0]:
-            source = get_player_name(line_parts[2])
+        self.flash_casts = 0
+        self.t1_3_potentials = 0
 
-            if character_name != source:
-                continue
+        self._t_end = None
 
-            if line_parts[10] == '"Flash Heal"':
-                # Finished casting Flash Heal
-                flash_casts += 1
+    def handlers(self):
+        """Dict of the function adding each event type, for `EventDecoder.dispatch` or an `EventBus`."""
+        return {event_type: self.add for event_type in CAST_EVENTS}
 
-                t_end = get_time_stamp(line_parts[0])
-            else:
-                # Could have cast an instant spell
-                t_start = get_time_stamp(line_parts[0])
+    def add(self, record, *_):
+        if self.character_name != record.source:
+            return
 
-                if t_end is None:
-                    continue
+        if record.event_type == "SPELL_CAST_SUCCESS" and record.spell_name == "Flash Heal":
+            # Finished casting Flash Heal
+            self.flash_casts += 1
 
-                # compare delay since last cast
-                d_cast = (t_start - t_end).total_seconds()
-                if d_cast < 0.1:
-                    t1_3_potentials += 1
+            self._t_end = get_time_stamp(record.timestamp)
+            return
 
-        elif "SPELL_CAST_START" in line_parts[0]:
-            # Starting to cast a spell
-            source = get_player_name(line_parts[2])
+        # Starting to cast a spell, or could have cast an instant spell
+        t_start = get_time_stamp(record.timestamp)
 
-            if character_name != source:
-                continue
+        if self._t_end is None:
+            return
 
-            t_start = get_time_stamp(line_parts[0])
+        # compare delay since last cast
+        d_cast = (t_start - self._t_end).total_seconds()
+        if d_cast < 0.1:
+            self.t1_3_potentials += 1
 
-            if t_end is None:
-                continue
 
-            # compare delay since last cast
-            d_cast = (t_start - t_end).total_seconds()
-            if d_cast < 0.1:
-                t1_3_potentials += 1
+def get_flash_heal_casts(character_name, log_lines):
+    """Get spell casts and time stamps for specified character in lines."""
+    counter = FlashHealCounter(character_name)
+    DECODER.dispatch(log_lines, counter.handlers())
 
-    return flash_casts, t1_3_potentials
+    return counter.flash_casts, counter.t1_3_potentials
 
 
-def evaluate_3t1(source, character_name, encounter_i=None):
-    """Evaluate number of Flash Heals back-to-back."""
-    if "http://" in source or "https://" is source:
-        print("Evaluate 3T1 only works with a combatlog txt file, it does not work with a WCL link yet.")
-        return
-
-    processor = get_processor(source, character_name=character_name)
-    encounter = processor.select_encounter(encounter_i)
-
-    lines = raw.get_lines(source)
+def print_evaluation(encounter, fh_casts, t1_3_potentials):
+    """Print the evaluation of 3T1 for an encounter."""
     e_time = encounter.duration
-    encounter_lines = lines[encounter.start : encounter.end]
-    fh_casts, t1_3_potentials = get_flash_heal_casts(character_name, encounter_lines)
-
     fh_ratio = 0 if fh_casts == 0 else t1_3_potentials / fh_casts
 
     print(f"Evaluation of 3T1  ({encounter.boss}, {e_time:.0f}s)")
@@ -91,6 +77,21 @@ def evaluate_3t1(source, character_name, encounter_i=None):
     )
 
 
+def evaluate_3t1(source, character_name, encounter_i=None):
+    """Evaluate number of Flash Heals back-to-back."""
+    if "http://" in source or "https://" in source:
+        print("Evaluate 3T1 only works with a combatlog txt file, it does not work with a WCL link yet.")
+        return
+
+    processor = get_processor(source, character_name=character_name)
+    encounter = processor.select_encounter(encounter_i)
+
+    encounter_lines = scan_lines(source, CAST_EVENTS, encounter.start, encounter.end)
+    fh_casts, t1_3_potentials = get_flash_heal_casts(character_name, encounter_lines)
+
+    print_evaluation(encounter, fh_casts, t1_3_potentials)
+
+
 def main(argv=None):
     from src.parser import OverhealParser
 
@@ -3,27 +3,59 @@ Optimise spell casts to heal damage taken.
 
 By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
-import numpy as np
-import matplotlib.pyplot as plt
+import os
 
+from src import readers
+from src.raid import load_raid
 from src.utils import shorten_spell_name
-from src.readers import read_from_raw as raw
 from src.damage.damage_taken import raid_damage_taken
-from src.simulation import CharacterData, evaluate_casting_strategy
-from src.simulation.casting_strategy import CastingStrategy, SingleSpellStrategy
 
 import spell_data as sd
 
 
 def main(argv=None):
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
-    parser = OverhealParser(need_character=True, accept_encounter=True, accept_spell_id=True, accept_spell_power=True)
+    parser = OverhealParser(
+        need_character=True, accept_encounter=True, accept_spell_id=True, accept_spell_power=True, accept_jobs=True
+    )
     parser.add_argument("-v", "--verbose")
     parser.add_argument("--mana", type=int)
+    parser.add_argument("--path")
+    parser.add_argument(
+        "-n",
+        "--replications",
+        type=int,
+        default=0,
+        help="Number of replications of each strategy to run, to compare the mean healing over the crits rolled. "
+        "Pass a 0 for a single run of each.",
+    )
+    parser.add_argument(
+        "--crit",
+        type=float,
+        default=0.15,
+        help="Crit chance of the healer, rolled for each direct heal. Defaults to 0.15.",
+    )
+    parser.add_argument("--seed", type=int, help="Seed of the random crits, for reproducible results.")
+    parser.add_argument(
+        "--targeting",
+        choices=("largest", "tanks", "groups"),
+        default="largest",
+        help="Whom to heal: the largest deficit, the largest deficit counting the tanks double, or the most injured of "
+        "the group with the largest deficit. Tanks and groups are read from `raid.json`.",
+    )
 
     args = parser.parse_args(argv)
 
+    import numpy as np
+    import matplotlib.pyplot as plt
+
+    from src.simulation import CharacterData, evaluate_casting_strategy
+    from src.simulation.casting_strategy import CastingStrategy, SingleSpellStrategy
+    from src.simulation.monte_carlo import evaluate_replications
+    from src.simulation.targeting import TankPriority, SmartHealGroups
+    from src.jobs import run_jobs
+
     source = args.source
     encounter = args.encounter
     spell_power = args.spell_power
@@ -35,27 +67,33 @@ def main(argv=None):
     if mana is None:
         mana = 8000.0
 
-    lines = raw.get_lines(source)
+    processor = readers.get_processor(source, include_damage=True, **reader_options(args))
+    encounter = processor.select_encounter(encounter=encounter)
+    if encounter is None:
+        encounter = processor.all_encounters
 
-    # todo: fix
-    # encounter, encounter_lines, encounter_start, encounter_end = encounter_picker(lines, encounter)
-    data = raw.get_processed_lines(lines)
-    events = data.all_events
+    processor.process(encounter=encounter)
+    events = processor.all_events
 
-    # encounter_time = (encounter_end - encounter_start).total_seconds()
+    encounter_time = encounter.duration
     mp5 = 40.0
     mp5ooc = mp5 + 160.0
-    character_data_nc = CharacterData(spell_power, 0.0, mp5, mp5ooc, mana)
-    character_data_ac = CharacterData(spell_power, 1.0, mp5, mp5ooc, mana)
+    character_data = CharacterData(spell_power, args.crit, mp5, mp5ooc, mana)
 
-    times, _, deficits, name_dict, _ = raid_damage_taken(events, character_name=args.character_name)
+    _, _, deficits, name_dict, _ = raid_damage_taken(events, character_name=args.character_name)
 
-    # encounter_time = (encounter_end - encounter_start).total_seconds()
-    encounter = 120.0
     # optimise_casts(args.character_name, times["all"], deficits, name_dict, character_data, encounter_time, spell_id=args.spell_id, verbose=args.verbose)
 
     talents = None
 
+    policy = None
+    if args.targeting != "largest":
+        raid = load_raid()
+        if args.targeting == "tanks":
+            policy = TankPriority(raid["tanks"], name_dict)
+        else:
+            policy = SmartHealGroups(raid.get("groups", []), name_dict)
+
     sids = {
         "10917": "Flash Heal (Rank 7)",
         "10916": "Flash Heal (Rank 6)",
@@ -74,71 +112,72 @@ def main(argv=None):
         "2055": "Heal (Rank 2)",
         "2054": "Heal (Rank 1)",
     }
-    sids = {}
     names = []
     lows = []
     highs = []
-    path = "figs/optimise"
-    for sid in sids:
-        strategy = SingleSpellStrategy(talents, sid)
-
-        nh_nc, gh_nc = evaluate_casting_strategy(
-            args.character_name,
-            times["all"],
-            deficits,
-            name_dict,
-            character_data_nc,
-            encounter_time,
-            strategy=strategy,
-            verbose=False,
-            show=False,
-            plot=False,
-            path=path,
-        )
-        # nh_ac, gh_ac = evaluate_casting_strategy(
-        #     args.character_name,
-        #     times["all"],
-        #     deficits,
-        #     name_dict,
-        #     character_data_ac,
-        #     encounter_time,
-        #     spell_id=sid,
-        #     verbose=False,
-        #     show=False,
-        #     plot=False,
-        #     path=path,
-        # )
-
-        lows.append(nh_nc)
-        highs.append(gh_nc)
-        names.append(strategy.name)
 
-    # Add basic strategy as well
-    strategy = CastingStrategy(talents)
-
-    nh_nc, gh_nc = evaluate_casting_strategy(
-        args.character_name,
-        times["all"],
-        deficits,
-        name_dict,
-        character_data_nc,
-        encounter_time,
-        strategy=strategy,
-        verbose=False,
-        show=False,
-        plot=False,
-        path=path,
-    )
+    path = args.path
+    if path is None:
+        path = "figs/optimise"
+    os.makedirs(path, exist_ok=True)
 
-    lows.append(nh_nc)
-    highs.append(gh_nc)
-    names.append(strategy.name)
+    strategies = [SingleSpellStrategy(talents, sid) for sid in sids]
+
+    # Add basic strategy as well
+    strategies.append(CastingStrategy(talents))
+
+    errors = None
+    if args.replications > 0:
+        # the same seed for every strategy, so each is evaluated over the same crit rolls
+        tasks = [
+            (deficits, character_data, strategy, encounter_time, args.replications, args.seed, 0.95, policy)
+            for strategy in strategies
+        ]
+        summaries = run_jobs(evaluate_replications, tasks, args.jobs)
+
+        print()
+        print(f"  {'Strategy':28s}  {'Net heal':>9s}  {'95% CI':>17s}  {'5-95%':>17s}  {'Casts':>5s}  {'End mana':>8s}")
+
+        for strategy, summary in zip(strategies, summaries):
+            net = summary["net"]
+            names.append(strategy.name)
+            lows.append(net.mean)
+            highs.append(summary["gross"].mean)
+
+            print(
+                f"  {strategy.name:28s}  {net.mean:9.0f}  {net.ci_low:8.0f}-{net.ci_high:<8.0f}  "
+                f"{net.percentiles[5]:8.0f}-{net.percentiles[95]:<8.0f}  {summary['casts'].mean:5.1f}  "
+                f"{summary['mana'].mean:8.0f}"
+            )
+
+        nets = [summary["net"] for summary in summaries]
+        errors = [[net.mean - net.ci_low for net in nets], [net.ci_high - net.mean for net in nets]]
+    else:
+        for strategy in strategies:
+            nh_nc, gh_nc = evaluate_casting_strategy(
+                args.character_name,
+                deficits,
+                name_dict,
+                character_data,
+                encounter_time,
+                strategy=strategy,
+                verbose=False,
+                show=False,
+                plot=False,
+                path=path,
+                seed=args.seed,
+                policy=policy,
+            )
+
+            lows.append(nh_nc)
+            highs.append(gh_nc)
+            names.append(strategy.name)
 
     sids = list(map(lambda s: shorten_spell_name(sd.spell_name(s)), sids))
 
     fig, ax = plt.subplots(figsize=(12, 8), constrained_layout=True)
 
-    ax.bar(names, lows, color="#33cc33", label="Net heal")
+    ax.bar(names, lows, yerr=errors, color="#33cc33", label="Net heal")
     ax.bar(names, np.subtract(highs, lows), bottom=lows, color="#85e085", label="Overheal")
     ax.grid(axis="y")
     ax.set_axisbelow(True)
@@ -154,7 +193,7 @@ def main(argv=None):
         y = high + 200
         ax.text(x, y, f"{high/1000:.1f}k", ha="center", va="bottom")
 
-    character_data_str = str(character_data_nc)
+    character_data_str = str(character_data)
     ax.set_title(f"Spam cast healing for {encounter}\n{character_data_str}")
     ax.set_ylabel("Net healing")
     ax.set_xlabel("Healing strategy")
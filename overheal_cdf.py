@@ -4,16 +4,19 @@ Script that estimates spell cumulative distribution function of overheal chance.
 By: Filip Gokstorp (Saintis), 2020
 """
 import os
-import numpy as np
-import matplotlib.pyplot as plt
+from functools import partial
 
 from src.readers import read_heals
 from src import group_processed_lines
+from src.jobs import run_jobs
 
 import spell_data as sd
 
 
 def process_spell(player_name, spell_id, spell_lines, spell_power=None, show=True, path=None):
+    import numpy as np
+    import matplotlib.pyplot as plt
+
     spell_name = sd.spell_name(spell_id)
 
     relative_underheal = []
@@ -70,8 +73,10 @@ def process_spell(player_name, spell_id, spell_lines, spell_power=None, show=Tru
     if show:
         plt.show()
 
+    plt.close()
+
 
-def overheal_cdf(source, character_name, spell_id=None, path=None, **kwargs):
+def overheal_cdf(source, character_name, spell_id=None, path=None, jobs=1, spell_power=None, **kwargs):
 
     # make sure directories exist
     if path is None:
@@ -96,29 +101,30 @@ def overheal_cdf(source, character_name, spell_id=None, path=None, **kwargs):
             print(f"Could not find casts of spell [{spell_id}]")
             exit(1)
 
-        process_spell(character_name, spell_id, lines, **kwargs)
+        process_spell(character_name, spell_id, lines, spell_power=spell_power)
     else:
-        for spell_id, lines in heal_lines.items():
-            process_spell(character_name, spell_id, lines, show=False, path=path, **kwargs)
-        for spell_id, lines in periodic_lines.items():
-            process_spell(character_name, spell_id, lines, show=False, path=path, **kwargs)
+        tasks = [(character_name, spell_id, lines) for spell_id, lines in heal_lines.items()]
+        tasks += [(character_name, spell_id, lines) for spell_id, lines in periodic_lines.items()]
+
+        run_jobs(partial(process_spell, spell_power=spell_power, show=False, path=path), tasks, jobs)
 
 
 def main():
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     parser = OverhealParser(
         description="Analyses logs and gives overheal cdf.",
         need_character=True,
         accept_spell_id=True,
         accept_spell_power=True,
+        accept_jobs=True,
     )
     parser.add_argument("--path", help="Path to output figures too.", default="figs/cdf")
     args = parser.parse_args()
 
     path = args.path
 
-    overheal_cdf(args.source, args.character_name, args.spell_id, path)
+    overheal_cdf(args.source, args.character_name, args.spell_id, path, jobs=args.jobs, **reader_options(args))
 
 
 if __name__ == "__main__":
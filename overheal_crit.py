@@ -125,8 +125,8 @@ def print_results(data):
     print()
 
 
-def overheal_crit(source, character_name, spell_id=None, encounter=None):
-    processor = readers.get_processor(source, character_name=character_name)
+def overheal_crit(source, character_name, spell_id=None, encounter=None, **kwargs):
+    processor = readers.get_processor(source, character_name=character_name, **kwargs)
 
     encounter = processor.select_encounter(encounter=encounter)
 
@@ -157,7 +157,7 @@ def overheal_crit(source, character_name, spell_id=None, encounter=None):
 
 def main(argv=None):
     import os
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     # make sure directories exist
     os.makedirs("figs/crit", exist_ok=True)
@@ -176,7 +176,9 @@ for each spell, and for the average spell profile over the whole combat log.
 
     args = parser.parse_args(argv)
 
-    overheal_crit(args.source, args.character_name, spell_id=args.spell_id, encounter=args.encounter)
+    overheal_crit(
+        args.source, args.character_name, spell_id=args.spell_id, encounter=args.encounter, **reader_options(args)
+    )
 
 
 if __name__ == "__main__":
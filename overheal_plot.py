@@ -5,16 +5,17 @@ By: Filip Gokstorp (Saintis), 2020
 """
 import os
 
-import numpy as np
-import matplotlib.pyplot as plt
-
 from src import readers
 from src import group_processed_lines
+from src.jobs import run_jobs
 
 import spell_data as sd
 
 
 def plot_overheal(player, spell_powers, spell_id, data, sp_shift=0, sp_extrap=200, path=None, encounter=None):
+    import numpy as np
+    import matplotlib.pyplot as plt
+
     if path is None:
         path = "figs/overheal"
 
@@ -115,105 +116,134 @@ def plot_overheal(player, spell_powers, spell_id, data, sp_shift=0, sp_extrap=20
     print(f"Saving fig for {player}, {spell_id}, {encounter}")
 
 
-def process_lines_for_spell(lines, dh, base_heal=None):
-    """
-    Counts up heals and overheals, as well as sum heal and overheal amounts for given spell power adjustment.
+def sweep_lines_for_spell(lines, dhs, base_heal=None, chunk_size=2 ** 20):
     """
-    n_h = 0
-    n_oh = 0
-    n_f_oh = 0
-    n_oh_nc = 0
-
-    total_h = 0.0
-    total_oh = 0.0
-
-    total_h_nc = 0.0
-    total_oh_nc = 0.0
+    Counts up heals and overheals, as well as sum heal and overheal amounts, for a whole array of spell power
+    adjustments at once.
 
-    for h, oh, crit in lines:
-        dh_c = dh
+    The heals are broadcast against the adjustments, a chunk of adjustments at a time to bound the memory used.
 
-        oh_nc = oh
-        h_nc = h
-
-        if base_heal and h < base_heal:
-            # Skip unexpectedly low heals
-            continue
-
-        if crit:
-            # scale spell power differential by 1.5 if spell was a crit
-            dh_c *= 1.5
-
-            # Scale oh down
-            h_nc = h / 1.5
-            oh_nc = oh - (h - h_nc)
+    :param lines: list of (heal, overheal, is_crit)
+    :param dhs: array of heal adjustments
+    :param base_heal: heals below this are skipped
+    :param chunk_size: maximum number of elements in the intermediate (adjustment, heal) arrays
+    :returns (n_h, n_oh, n_f_oh, n_oh_nc, total_h, total_oh, total_h_nc, total_oh_nc), arrays over the adjustments
+    """
+    import numpy as np
+
+    data = np.asarray(lines, dtype=float).reshape(-1, 3)
+    h, oh, crit = data[:, 0], data[:, 1], data[:, 2] > 0
+
+    if base_heal:
+        # Skip unexpectedly low heals
+        keep = h >= base_heal
+        h, oh, crit = h[keep], oh[keep], crit[keep]
+
+    # scale spell power differential by 1.5 if spell was a crit, and scale oh down
+    scale = np.where(crit, 1.5, 1.0)
+    h_nc = h / scale
+    oh_nc = oh - (h - h_nc)
+
+    dhs = np.asarray(dhs, dtype=float)
+    n_steps = len(dhs)
+    n_h = np.full(n_steps, len(h))
+    n_oh = np.zeros(n_steps, dtype=int)
+    n_f_oh = np.zeros(n_steps, dtype=int)
+    n_oh_nc = np.zeros(n_steps, dtype=int)
+    total_h = np.zeros(n_steps)
+    total_oh = np.zeros(n_steps)
+    total_h_nc = np.zeros(n_steps)
+    total_oh_nc = np.zeros(n_steps)
+
+    step = max(1, chunk_size // max(1, len(h)))
+    for i in range(0, n_steps, step):
+        chunk = slice(i, i + step)
+        dh = dhs[chunk, None]
 
         # remove spell power contribution
-        h -= dh_c
-        oh -= dh_c
-        if oh < 0.0:
-            oh = 0.0
-
-        h_nc -= dh
-        oh_nc -= dh
-        if oh_nc < 0.0:
-            oh_nc = 0.0
+        dh_c = dh * scale
+        h_i = h - dh_c
+        oh_i = np.maximum(oh - dh_c, 0.0)
 
-        n_h += 1
+        h_nc_i = h_nc - dh
+        oh_nc_i = np.maximum(oh_nc - dh, 0.0)
 
-        if oh > 0.0:
-            n_oh += 1
-            if oh >= h:
-                n_f_oh += 1
+        any_oh = oh_i > 0.0
+        n_oh[chunk] = any_oh.sum(axis=1)
+        n_f_oh[chunk] = (any_oh & (oh_i >= h_i)).sum(axis=1)
+        n_oh_nc[chunk] = (oh_nc_i > 0.0).sum(axis=1)
 
-        if oh_nc > 0.0:
-            n_oh_nc += 1
-
-        total_h += h
-        total_oh += oh
-
-        total_h_nc += h_nc
-        total_oh_nc += oh_nc
+        total_h[chunk] = h_i.sum(axis=1)
+        total_oh[chunk] = oh_i.sum(axis=1)
+        total_h_nc[chunk] = h_nc_i.sum(axis=1)
+        total_oh_nc[chunk] = oh_nc_i.sum(axis=1)
 
     return n_h, n_oh, n_f_oh, n_oh_nc, total_h, total_oh, total_h_nc, total_oh_nc
 
 
 def group_lines_for_spell(spell_id, lines, spell_powers):
-    total_heals = []
-    total_overheals = []
-    total_underheals = []
-
-    count_heals = []
+    """
+    Heal and overheal averages and fractions of a spell over the spell powers.
 
-    nn_underheals = []
-    nn_overheals = []
-    nn_full_overheals = []
+    :returns the curves to plot, or None if the spell has no heals at or above its base heal
+    """
+    import numpy as np
 
     coefficient = sd.spell_coefficient(spell_id)
     base_heal = sd.spell_heal(spell_id)
 
-    for i, sp in enumerate(spell_powers):
-        data = process_lines_for_spell(lines, -sp * coefficient, base_heal)
-        n_h, n_oh, n_f_oh, n_oh_nc, total_h, total_oh, total_h_nc, total_oh_nc = data
+    data = sweep_lines_for_spell(lines, -np.asarray(spell_powers) * coefficient, base_heal)
+    n_h, n_oh, n_f_oh, n_oh_nc, total_h, total_oh, total_h_nc, total_oh_nc = data
 
-        total_heals.append(total_h / n_h)
-        total_overheals.append(total_oh / n_h)
-        total_underheals.append((total_h - total_oh) / n_h)
+    if not n_h.any():
+        return None
 
-        count_heals.append(n_h)
+    total_heals = total_h / n_h
+    total_overheals = total_oh / n_h
+    total_underheals = (total_h - total_oh) / n_h
 
-        nn_underheals.append((n_h - n_oh) / n_h)
-        nn_overheals.append(n_oh / n_h)
-        nn_full_overheals.append(n_f_oh / n_h)
+    count_heals = n_h
+
+    nn_underheals = (n_h - n_oh) / n_h
+    nn_overheals = n_oh / n_h
+    nn_full_overheals = n_f_oh / n_h
 
     return (total_heals, total_overheals, total_underheals, count_heals, nn_underheals, nn_overheals, nn_full_overheals)
 
 
+def plot_spell(character_name, spell_id, lines, spell_powers, sp_shift, sp_extrap, path=None, encounter=None):
+    """Computes and plots the spell power sweep of a single spell."""
+    out = group_lines_for_spell(spell_id, lines, spell_powers)
+    if out is None:
+        print(f"No heals of {spell_id} at or above its base heal, skipping it.")
+        return
+
+    plot_overheal(
+        character_name,
+        spell_powers,
+        spell_id,
+        out,
+        sp_shift=sp_shift,
+        sp_extrap=sp_extrap,
+        path=path,
+        encounter=encounter,
+    )
+
+
 def overheal_plot(
-    source, character_name, ignore_crit=False, spell_id=None, spell_power=None, path=None, encounter=None, **kwargs
+    source,
+    character_name,
+    ignore_crit=False,
+    spell_id=None,
+    spell_power=None,
+    path=None,
+    encounter=None,
+    jobs=1,
+    **kwargs,
 ):
+    import numpy as np
 
-    processor = readers.get_processor(source, character_name=character_name)
+    processor = readers.get_processor(source, character_name=character_name, **kwargs)
     encounter = processor.select_encounter(encounter=encounter)
 
     processor.process(encounter=encounter)
@@ -236,23 +266,16 @@ def overheal_plot(
 
     spell_powers = np.linspace(0, -sp_neg, int(sp_neg) + 1)
 
-    for spell_id, lines in heal_lines.items():
-        out = group_lines_for_spell(spell_id, lines, spell_powers)
-        plot_overheal(
-            character_name,
-            spell_powers,
-            spell_id,
-            out,
-            sp_shift=sp_shift,
-            sp_extrap=sp_extrap,
-            path=path,
-            encounter=encounter,
-        )
+    tasks = [
+        (character_name, spell_id, lines, spell_powers, sp_shift, sp_extrap, path, encounter)
+        for spell_id, lines in heal_lines.items()
+    ]
+    run_jobs(plot_spell, tasks, jobs)
 
 
 def main(argv=None):
     import argparse
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     parser = OverhealParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -270,6 +293,7 @@ def main(argv=None):
         accept_spell_id=True,
         accept_spell_power=True,
         accept_encounter=True,
+        accept_jobs=True,
     )
 
     parser.add_argument("--ignore_crit", action="store_true", help="Remove critical heals from analysis")
@@ -285,6 +309,8 @@ def main(argv=None):
         ignore_crit=args.ignore_crit,
         path=args.path,
         encounter=args.encounter,
+        jobs=args.jobs,
+        **reader_options(args),
     )
 
 
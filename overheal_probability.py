@@ -4,11 +4,10 @@ Script that gets the probability of an overheal based of +heal.
 By: Filip Gokstorp (Saintis), 2020
 """
 import os
-import numpy as np
-import matplotlib.pyplot as plt
 
 from src.readers import read_heals
 from src import group_processed_lines
+from src.jobs import run_jobs
 
 import spell_data as sd
 
@@ -16,6 +15,9 @@ import spell_data as sd
 def plot_oh_prob(
     player_name, spell_id, spell_powers, sp_extrap, sp_shift, n_heals, n_overheals, n_overheals_nc, path=None
 ):
+    import numpy as np
+    import matplotlib.pyplot as plt
+
     if path is None:
         path = "figs/probability"
 
@@ -75,8 +77,69 @@ def plot_oh_prob(
     plt.close()
 
 
+def _count_above(thresholds, values, inclusive=False):
+    """Number of thresholds above (or equal to, if inclusive) each value, using a sort and a binary search."""
+    import numpy as np
+
+    thresholds = np.sort(thresholds)
+    side = "left" if inclusive else "right"
+    return len(thresholds) - np.searchsorted(thresholds, values, side=side)
+
+
+def overheal_counts(lines, coefficient, spell_powers):
+    """
+    Counts heals, overheals and non-crit overheals for each spell power change.
+
+    Each heal stays a heal, or an overheal, up until a threshold spell power change. The thresholds are sorted once,
+    and every spell power point counted with a binary search.
+
+    :param lines: list of (heal, overheal, is_crit)
+    :param coefficient: the spell coefficient
+    :param spell_powers: array of spell power changes, 0 or negative
+    :returns (n_heals, n_overheals, n_overheals_nc), arrays over the spell powers
+    """
+    import numpy as np
+
+    data = np.asarray(lines, dtype=float).reshape(-1, 3)
+    h, oh, crit = data[:, 0], data[:, 1], data[:, 2] > 0
+
+    dh = coefficient * -np.asarray(spell_powers, dtype=float)
+
+    n_heals = np.zeros(len(dh), dtype=int)
+    n_overheals = np.zeros(len(dh), dtype=int)
+    n_overheals_nc = np.zeros(len(dh), dtype=int)
+
+    for is_crit in (False, True):
+        h_c = h[crit == is_crit]
+        oh_c = oh[crit == is_crit]
+
+        # scale spell power differential by 1.5 if spell was a crit
+        dh_c = dh * 1.5 if is_crit else dh
+
+        # heals with negative remaining heal could happen for heals on healing reduced players, these are ignored
+        n_heals += _count_above(h_c, dh_c, inclusive=True)
+
+        # an overheal is counted while there is overheal left, and the heal itself is not ignored
+        capped = oh_c <= h_c
+        n_oh = _count_above(oh_c[capped], dh_c) + _count_above(h_c[~capped], dh_c, inclusive=True)
+        n_overheals += n_oh
+
+        if not is_crit:
+            n_overheals_nc += n_oh
+            continue
+
+        # Scale oh down
+        oh_nc = oh_c - (h_c - h_c / 1.5)
+        capped = oh_nc * 1.5 <= h_c
+        n_overheals_nc += _count_above(oh_nc[capped], dh) + _count_above(h_c[~capped], dh_c, inclusive=True)
+
+    return n_heals, n_overheals, n_overheals_nc
+
+
 def spell_overheal_probability(player_name, spell_id, lines, spell_power=None, path=None):
     """Plots overheal probability of each spell"""
+    import numpy as np
+
     if spell_power is None or spell_power <= 0:
         sp_neg = 400.0
         sp_shift = 0.0
@@ -90,55 +153,13 @@ def spell_overheal_probability(player_name, spell_id, lines, spell_power=None, p
             sp_extrap = 1500.0 - spell_power
 
     spell_powers = np.linspace(0, -sp_neg, int(sp_neg / 1) + 1)
-    n_heals = []
-    n_overheals = []
-    n_overheals_nc = []
 
     # Fail more gracefully if we are missing a coefficient
     coefficient = sd.spell_coefficient(spell_id)
     if coefficient == 0:
         return
 
-    for sp in spell_powers:
-        n_h = 0
-        n_oh = 0
-        n_oh_nc = 0
-
-        for h, oh, crit in lines:
-            dh = coefficient * -sp
-            dh_c = dh
-
-            oh_nc = oh
-
-            if crit:
-                # scale spell power differential by 1.5 if spell was a crit
-                dh_c *= 1.5
-
-                # Scale oh down
-                oh_nc = oh - (h - h / 1.5)
-
-            # remove spell power contribution
-            h -= dh_c
-            oh -= dh_c
-            oh_nc -= dh
-
-            if h < 0.0:
-                # could happen for heals on healing reduced players, we just ignore these for now
-                continue
-
-            n_h += 1
-            # n_h_nc += not_crit
-
-            if oh > 0.0:
-                n_oh += 1
-
-            if oh_nc > 0.0:
-                n_oh_nc += 1
-
-        n_heals.append(n_h)
-        n_overheals.append(n_oh)
-
-        n_overheals_nc.append(n_oh_nc)
+    n_heals, n_overheals, n_overheals_nc = overheal_counts(lines, coefficient, spell_powers)
 
     # plot probabilities
     plot_oh_prob(
@@ -147,24 +168,26 @@ def spell_overheal_probability(player_name, spell_id, lines, spell_power=None, p
 
 
 def overheal_probability(
-    source, character_name, spell_power=500, ignore_crit=False, spell_id=None, path=None, **kwargs
+    source, character_name, spell_power=500, ignore_crit=False, spell_id=None, path=None, jobs=1, **kwargs
 ):
     heals, periodics, absorbs = read_heals(source, character_name=character_name, **kwargs)
 
     # Group lines
     heal_lines = group_processed_lines(heals + periodics, ignore_crit, spell_id=spell_id)
-    for spell_id, lines in heal_lines.items():
-        spell_overheal_probability(character_name, spell_id, lines, spell_power, path=path)
+
+    tasks = [(character_name, spell_id, lines, spell_power, path) for spell_id, lines in heal_lines.items()]
+    run_jobs(spell_overheal_probability, tasks, jobs)
 
 
 def main(argv=None):
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     parser = OverhealParser(
         description="""Plots probability of overheals for different spells.""",
         need_character=True,
         accept_spell_id=True,
         accept_spell_power=True,
+        accept_jobs=True,
     )
 
     parser.add_argument("--ignore_crit", action="store_true", help="Remove critical heals from analysis")
@@ -179,6 +202,8 @@ def main(argv=None):
         spell_power=args.spell_power,
         ignore_crit=args.ignore_crit,
         path=args.path,
+        jobs=args.jobs,
+        **reader_options(args),
     )
 
 
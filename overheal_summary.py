@@ -4,8 +4,6 @@ Python script for getting a summary plot of heals and their overheal fraction.
 By: Filip Gokstorp (Saintis), 2020
 """
 import os
-import numpy as np
-import matplotlib.pyplot as plt
 
 from src import readers
 from src import group_processed_lines
@@ -48,11 +46,14 @@ def process_spell(spell_id, spell_lines, spell_power=None):
     return n_heal, n_underheal, n_overheal, n_downrank, n_drop_h
 
 
-def overheal_summary(source, character_name, spell_power, path=None, show=False, encounter=None):
+def overheal_summary(source, character_name, spell_power, path=None, show=False, encounter=None, **kwargs):
     # log_lines = raw.get_lines(log_file)
     # heal_lines, periodic_lines, _ = read_heals(source, character_name=character_name)
 
-    processor = readers.get_processor(source, character_name=character_name)
+    import numpy as np
+    import matplotlib.pyplot as plt
+
+    processor = readers.get_processor(source, character_name=character_name, **kwargs)
     encounter = processor.select_encounter(encounter=encounter)
 
     processor.process(encounter=encounter)
@@ -140,7 +141,7 @@ def overheal_summary(source, character_name, spell_power, path=None, show=False,
 
 
 def main(argv=None):
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     parser = OverhealParser(
         description="Analyses logs and gives summary plot.",
@@ -160,6 +161,7 @@ def main(argv=None):
         path=args.path,
         show=args.show,
         encounter=args.encounter,
+        **reader_options(args),
     )
 
 
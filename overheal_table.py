@@ -3,8 +3,6 @@ Python script for parsing a log and calculating overheals amounts and counts.
 
 By: Filip Gokstorp (Saintis), 2020
 """
-import numpy as np
-
 from src import readers
 from src import group_processed_lines
 import spell_data as sd
@@ -27,6 +25,8 @@ def print_spell_aggregate(spell_id, name, data):
 
 def aggregate_lines(grouped_lines, spell_power=0.0):
     """Aggregates and evaluates grouped lines"""
+    import numpy as np
+
     # heals, any OH, half OH, full OH, aH, aOH
     total_data = np.zeros(6)
     data_list = []
@@ -80,6 +80,26 @@ def aggregate_lines(grouped_lines, spell_power=0.0):
     return total_data, data_list
 
 
+def add_aggregates(running, data_list):
+    """
+    Adds the aggregated data of spells into running totals.
+
+    :param running: dictionary of aggregated data by spell id, updated in place
+    :param data_list: list of (spell_id, data) to add, as given by `aggregate_lines`
+    :returns total_data, data_list of the running totals
+    """
+    for spell_id, data in data_list:
+        if spell_id in running:
+            running[spell_id] = running[spell_id] + data
+        else:
+            running[spell_id] = data
+
+    data_list = list(running.items())
+    total_data = sum(data for _, data in data_list)
+
+    return total_data, data_list
+
+
 def display_lines(total_data, data_list, group):
     """Print data lines for cli display"""
     if len(data_list) == 0:
@@ -102,8 +122,8 @@ def display_lines(total_data, data_list, group):
     print_spell_aggregate("", group_name, total_data)
 
 
-def process_log(source, character_name=None, ignore_crit=False, encounter=None, **kwargs):
-    processor = readers.get_processor(source, character_name=character_name)
+def process_log(source, character_name=None, ignore_crit=False, encounter=None, spell_power=0.0, **kwargs):
+    processor = readers.get_processor(source, character_name=character_name, **kwargs)
     encounter = processor.select_encounter(encounter=encounter)
 
     processor.process(encounter=encounter)
@@ -116,7 +136,7 @@ def process_log(source, character_name=None, ignore_crit=False, encounter=None,
     if encounter:
         print(f"  {encounter.boss}:")
 
-    total_data, data_list = aggregate_lines(heal_lines, **kwargs)
+    total_data, data_list = aggregate_lines(heal_lines, spell_power)
     display_lines(total_data, data_list, "Spell")
     # print()
     # total_data, data_list = aggregate_lines(periodic_lines, **kwargs)
@@ -125,9 +145,39 @@ def process_log(source, character_name=None, ignore_crit=False, encounter=None,
     print()
 
 
+def follow_log(source, character_name=None, ignore_crit=False, poll_interval=0.5, spell_power=0.0, **kwargs):
+    """
+    Follows a log while it is being written, printing the table of each encounter as soon as it ends, followed by the
+    table of all encounters since following started.
+    """
+    processor = readers.get_processor(source, character_name=character_name, **kwargs)
+    encounters = processor.follow(poll_interval=poll_interval)
+    running = dict()
+
+    print(f"Following `{source}`, tables are shown as encounters end. Press Ctrl+C to stop.")
+
+    try:
+        for encounter, encounter_processor in encounters:
+            heal_lines = group_processed_lines(encounter_processor.heals, ignore_crit)
+            total_data, data_list = aggregate_lines(heal_lines, spell_power)
+
+            print()
+            print(f"  {encounter.boss} ({encounter.duration:.0f}s):")
+            display_lines(total_data, data_list, "Spell")
+
+            total_data, data_list = add_aggregates(running, data_list)
+
+            print()
+            print("  All encounters:")
+            display_lines(total_data, data_list, "Spell")
+            print()
+    except KeyboardInterrupt:
+        pass
+
+
 def main(argv=None):
     import argparse
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     parser = OverhealParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -146,12 +196,25 @@ def main(argv=None):
     )
 
     parser.add_argument("--ignore_crit", action="store_true", help="Remove critical heals from analysis")
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Follow a log file while it is being written, e.g. during a raid, showing the table of each encounter as "
+        "it ends.",
+    )
 
     args = parser.parse_args(argv)
 
     # print(vars(args))
 
-    process_log(args.source, args.character_name, args.ignore_crit, encounter=args.encounter)
+    if args.follow:
+        if ".txt" not in args.source:
+            parser.error("--follow needs a raw log file.")
+
+        follow_log(args.source, args.character_name, args.ignore_crit, **reader_options(args))
+        return
+
+    process_log(args.source, args.character_name, args.ignore_crit, encounter=args.encounter, **reader_options(args))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+"""
+Nightly report of a raw combat log, running several analyses over a single read of the log.
+
+Shows the overheal table, the value of crit, the buffs cast, the evaluation of 3T1, the casting activity and the deaths,
+of an encounter, or of the whole log. Each analysis subscribes to an event bus, which reads and decodes the lines of the
+log only once for all of them.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import overheal_table
+import overheal_crit
+import count_buffs
+import evaluate_3t1
+import analyse_casts
+from src import group_processed_lines
+from src.readers.read_from_raw import RawProcessor, CastMatcher, CAST_DECODER
+from src.readers.event_bus import EventBus
+
+
+def run_all(source, character_name, encounter=None):
+    """
+    Run all analyses of a character over an encounter, reading the log once.
+
+    :param source: path to the raw log file
+    :param character_name: name of the character to analyse
+    :param encounter: encounter number, 0 for the whole log, or None to ask
+    """
+    processor = RawProcessor(source, character_name=character_name)
+    encounter = processor.select_encounter(encounter=encounter)
+    if encounter is None:
+        encounter = processor.all_encounters
+
+    bus = EventBus()
+    processor.subscribe(bus, encounter)
+
+    buff_handlers, buff_data = count_buffs.buff_handlers()
+    bus.subscribe(buff_handlers, count_buffs.DECODER.fields)
+
+    counter = evaluate_3t1.FlashHealCounter(character_name)
+    bus.subscribe(counter.handlers(), evaluate_3t1.DECODER.fields)
+
+    matcher = CastMatcher()
+    bus.subscribe(matcher.handlers(), CAST_DECODER.fields, finish=matcher.finish)
+
+    bus.run(source, encounter.start, encounter.end)
+
+    print()
+    print(f"  {encounter.boss}:")
+    heal_lines = group_processed_lines(processor.heals, False)
+    total_data, data_list = overheal_table.aggregate_lines(heal_lines)
+    overheal_table.display_lines(total_data, data_list, "Spell")
+
+    # only direct heals can crit
+    heal_lines = group_processed_lines(processor.direct_heals, False)
+    overheal_crit.print_results([overheal_crit.process_spell(s, lines) for s, lines in heal_lines.items()])
+
+    count_buffs.display_data(*count_buffs.aggregate_buff_lines(*buff_data))
+    print()
+
+    evaluate_3t1.print_evaluation(encounter, counter.flash_casts, counter.t1_3_potentials)
+    print()
+
+    casts = [c for c in matcher.cast_list if c[0] == character_name]
+    analyse_casts.analyse_activity({character_name: casts} if casts else {}, encounter, [character_name])
+    print()
+
+    print("Deaths:")
+    for timestamp, _, name in processor.deaths:
+        print(f"  {timestamp.total_seconds():6.1f}s  {name}")
+
+
+def main(argv=None):
+    from src.parser import OverhealParser
+
+    parser = OverhealParser(
+        description="Runs the overheal table, crit, buffs, 3T1, cast activity and deaths analyses of a raw combat log "
+        "at once, reading the log only once.",
+        need_character=True,
+        accept_encounter=True,
+    )
+    args = parser.parse_args(argv)
+
+    if ".txt" not in args.source:
+        parser.error("run_all needs a raw log file.")
+
+    run_all(args.source, args.character_name, encounter=args.encounter)
+
+
+if __name__ == "__main__":
+    main()
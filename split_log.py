@@ -1,66 +1,363 @@
-"""Utility functions for splitting a log by raid"""
+"""
+Utility functions for splitting a log by raid.
 
+The log is first scanned for its encounter lines only, which tells which raid each part of the log belongs to from the
+bosses in it. A part ends with the kill of the last boss of its raid, or with the last encounter before an encounter of
+another raid. Each part is then copied straight from the log into its own file, a block at a time, so logs of any size
+are split with little memory. The encounter index of each part is saved next to it, so it is ready for the scripts.
+Compressed parts have no index, as they need decompressing before the scripts can read them.
 
-def _write_lines(file_name, lines):
-    with open(file_name, "w", encoding="utf-8") as f:
-        f.writelines(lines)
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import io
+import os
+import queue
+import threading
 
+from src.readers import log_index
+from src.readers.scanner import scan_blocks
 
-def split_log(log, year=None):
-    if year is None:
-        year = "-"
-    else:
-        year = "-" + year
+# short name, full name and bosses of each raid, the last boss ends the raid
+RAIDS = (
+    ("Ony", "Onyxia", ("Onyxia",)),
+    (
+        "MC",
+        "Molten Core",
+        (
+            "Lucifron",
+            "Magmadar",
+            "Gehennas",
+            "Garr",
+            "Shazzrah",
+            "Baron Geddon",
+            "Sulfuron Harbinger",
+            "Golemagg the Incinerator",
+            "Majordomo Executus",
+            "Ragnaros",
+        ),
+    ),
+    (
+        "BWL",
+        "Blackwing Lair",
+        (
+            "Razorgore the Untamed",
+            "Vaelastrasz the Corrupt",
+            "Broodlord Lashlayer",
+            "Firemaw",
+            "Ebonroc",
+            "Flamegor",
+            "Chromaggus",
+            "Nefarian",
+        ),
+    ),
+    (
+        "ZG",
+        "Zul'Gurub",
+        (
+            "High Priestess Jeklik",
+            "High Priest Venoxis",
+            "High Priestess Mar'li",
+            "Bloodlord Mandokir",
+            "Edge of Madness",
+            "High Priest Thekal",
+            "Gahz'ranka",
+            "High Priestess Arlokk",
+            "Jin'do the Hexxer",
+            "Hakkar",
+        ),
+    ),
+    (
+        "AQ20",
+        "Ruins of Ahn'Qiraj",
+        ("Kurinnaxx", "General Rajaxx", "Moam", "Buru the Gorger", "Ayamiss the Hunter", "Ossirian the Unscarred"),
+    ),
+    (
+        "AQ40",
+        "Temple of Ahn'Qiraj",
+        (
+            "The Prophet Skeram",
+            "Silithid Royalty",
+            "Battleguard Sartura",
+            "Fankriss the Unyielding",
+            "Viscidus",
+            "Princess Huhuran",
+            "Twin Emperors",
+            "Ouro",
+            "C'thun",
+        ),
+    ),
+    (
+        "Naxx",
+        "Naxxramas",
+        (
+            "Anub'Rekhan",
+            "Grand Widow Faerlina",
+            "Maexxna",
+            "Noth the Plaguebringer",
+            "Heigan the Unclean",
+            "Loatheb",
+            "Instructor Razuvious",
+            "Gothik the Harvester",
+            "The Four Horsemen",
+            "Patchwerk",
+            "Grobbulus",
+            "Gluth",
+            "Thaddius",
+            "Sapphiron",
+            "Kel'Thuzad",
+        ),
+    ),
+)
+
+RAID_NAMES = {raid: name for raid, name, _ in RAIDS}
+BOSS_RAIDS = {boss: raid for raid, _, bosses in RAIDS for boss in bosses}
+FINAL_BOSSES = {bosses[-1] for _, _, bosses in RAIDS}
+
+COMPRESSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+# bytes to copy at a time, and blocks to queue up for the writer thread when compressing
+BLOCK_SIZE = 1 << 20
+QUEUE_BLOCKS = 8
+
+
+class Split:
+    """A part of the log to save to its own file."""
+
+    def __init__(self, raid, start, end, encounter_lines, date):
+        """
+        :param raid: short name of the raid, or None if no boss of a known raid is in the part
+        :param start: byte offset of the start of the part
+        :param end: byte offset of the end of the part (exclusive)
+        :param encounter_lines: (offset, event_type, line) of the encounter lines in the part
+        :param date: (month, day) of the last encounter in the part
+        """
+        self.raid = raid
+        self.start = start
+        self.end = end
+        self.encounter_lines = encounter_lines
+        self.date = date
+
+    def index_entries(self):
+        """Encounter index of the part, with byte offsets from the start of the part."""
+        lines = [(offset - self.start, event_type, line) for offset, event_type, line in self.encounter_lines]
+
+        # an encounter cut off by the start of the part can't be paired up
+        while lines and lines[0][1] == "ENCOUNTER_END":
+            del lines[0]
+
+        return log_index.pair_encounters(lines)
+
+
+def _line_end(fh, offset):
+    """Byte offset of the start of the line after the line starting at offset."""
+    fh.seek(offset)
+    fh.readline()
+    return fh.tell()
+
+
+def _date(timestamp):
+    month, day = timestamp.split()[0].split("/")
+    return int(month), int(day)
 
-    # split log into parts for MC / BWL / ZG / Ony
-    f = open(log, "r", encoding="utf-8")
-    lines = f.readlines()
 
-    line_buffer = []
-    month = 0
-    day = 0
+def find_splits(log_file):
+    """
+    Find the parts of a log belonging to each raid, by scanning its encounters.
 
-    for line in lines:
-        line_buffer.append(line)
+    :param log_file: path to the log file
+    :returns generator of Split, in log order, each given as soon as its end is found
+    """
+    size = os.path.getsize(log_file)
 
-        if "ENCOUNTER_END" in line:
-            line_parts = line.split(",")
-            boss = line_parts[2].strip('"')
-            win = line_parts[5] == "1\n"
+    start = 0
+    raid = None
+    lines = []
+    date = (0, 0)
 
-            if not win:
+    # end of the last encounter in the current part
+    last_end = None
+
+    with open(log_file, "rb") as fh:
+        for offset, event_type, line in scan_blocks(log_file, log_index.ENCOUNTER_EVENTS, BLOCK_SIZE):
+            timestamp, boss = log_index.parse_encounter_line(line)
+            boss_raid = BOSS_RAIDS.get(boss)
+
+            if event_type == "ENCOUNTER_START":
+                if raid is not None and boss_raid is not None and boss_raid != raid and last_end is not None:
+                    # moved on to another raid, split after the last encounter of the previous one
+                    yield Split(raid, start, last_end, [entry for entry in lines if entry[0] < last_end], date)
+
+                    lines = [entry for entry in lines if entry[0] >= last_end]
+                    start = last_end
+                    raid = None
+                    last_end = None
+
+                if raid is None:
+                    raid = boss_raid
+
+                lines.append((offset, event_type, line))
                 continue
 
-            date = line_parts[0].split()[0].split("/")
+            lines.append((offset, event_type, line))
+            date = _date(timestamp)
+            last_end = _line_end(fh, offset)
+
+            if raid is None:
+                raid = boss_raid
+
+            win = line.split(",")[5].strip() == "1"
+            if win and boss in FINAL_BOSSES:
+                yield Split(boss_raid, start, last_end, lines, date)
+
+                lines = []
+                start = last_end
+                raid = None
+                last_end = None
 
-            month = int(date[0])
-            day = int(date[1])
+    if start < size:
+        yield Split(raid, start, size, lines, date)
 
-            if boss == "Ragnaros":
-                file_name = f"MC{year}-{month:02d}-{day:02d}.txt"
-                print(f'Found Molten Core raid. Saving to "{file_name}"')
-                _write_lines(file_name, line_buffer)
-                line_buffer.clear()
 
-            elif boss == "Onyxia":
-                file_name = f"Ony{year}-{month:02d}-{day:02d}.txt"
-                print(f'Found Onyxia raid. Saving to "{file_name}"')
-                _write_lines(file_name, line_buffer)
-                line_buffer.clear()
+class _ThreadWriter:
+    """Writes blocks to a file object on a thread of its own, so compressing them doesn't hold up reading the log."""
 
-            elif boss == "Nefarian":
-                file_name = f"BWL{year}-{month:02d}-{day:02d}.txt"
-                print(f'Found Blackwing Lair raid. Saving to "{file_name}"')
-                _write_lines(file_name, line_buffer)
-                line_buffer.clear()
+    def __init__(self, fh):
+        self._fh = fh
+        self._queue = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self._error = None
 
-            elif boss == "Hakkar":
-                file_name = f"ZG{year}-{month:02d}-{day:02d}.txt"
-                print(f'Found Zul\'Gurub raid. Saving to "{file_name}"')
-                _write_lines(file_name, line_buffer)
-                line_buffer.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
 
-    _write_lines(f"rem{year}-{month:02d}-{day:02d}.txt", line_buffer)
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            if block is None:
+                break
+
+            if self._error is None:
+                try:
+                    self._fh.write(block)
+                except Exception as e:
+                    self._error = e
+
+    def write(self, block):
+        self._queue.put(block)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._fh.close()
+
+        if self._error is not None:
+            raise self._error
+
+
+def _open_output(file_name, compress=None):
+    """Open an output file for writing bytes, compressed on a writer thread if asked to."""
+    if compress is None:
+        return open(file_name, "wb")
+
+    if compress == "gzip":
+        import gzip
+
+        fh = gzip.open(file_name, "wb", compresslevel=6)
+    elif compress == "zstd":
+        import zstandard
+
+        fh = zstandard.ZstdCompressor().stream_writer(open(file_name, "wb"))
+    else:
+        raise ValueError(f"Unknown compression {compress}, should be one of {', '.join(COMPRESSIONS)}")
+
+    return _ThreadWriter(fh)
+
+
+def _copy_range(fh, out, start, end):
+    remaining = end - start
+
+    if isinstance(out, io.BufferedWriter) and hasattr(os, "sendfile"):
+        # copy within the kernel, without reading the blocks into python
+        out.flush()
+        try:
+            while remaining > 0:
+                sent = os.sendfile(out.fileno(), fh.fileno(), start, min(remaining, 1 << 30))
+                if sent == 0:
+                    break
+
+                start += sent
+                remaining -= sent
+            return
+        except OSError:
+            # not supported between these files, copy the rest the usual way
+            pass
+
+    fh.seek(start)
+
+    while remaining > 0:
+        block = fh.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            break
+
+        out.write(block)
+        remaining -= len(block)
+
+
+def _file_name(split, year, compress, used):
+    month, day = split.date
+    raid = "rem" if split.raid is None else split.raid
+
+    name = f"{raid}{year}-{month:02d}-{day:02d}"
+    if name in used:
+        # another part of the same raid on the same day
+        used[name] += 1
+        name += f"-{used[name]}"
+    else:
+        used[name] = 1
+
+    return name + ".txt" + COMPRESSIONS.get(compress, "")
+
+
+def split_log(log, year=None, output_dir=".", compress=None):
+    """
+    Split a log into a file for each raid.
+
+    :param log: path to the log file
+    :param year: the year the log was produced in, only used for the output file names
+    :param output_dir: directory to save the files in
+    :param compress: None, "gzip" or "zstd", to compress the files. Compressed files are saved without an index.
+    :returns list of paths of the files saved
+    """
+    if year is None:
+        year = "-"
+    else:
+        year = "-" + year
+
+    used = dict()
+    paths = []
+
+    if compress is not None:
+        print("Compressed parts are saved without an encounter index, decompress them before analysing.")
+
+    with open(log, "rb") as fh:
+        for split in find_splits(log):
+            path = os.path.join(output_dir, _file_name(split, year, compress, used))
+
+            if split.raid is not None:
+                print(f'Found {RAID_NAMES[split.raid]} raid. Saving to "{path}"')
+
+            out = _open_output(path, compress)
+            try:
+                _copy_range(fh, out, split.start, split.end)
+            finally:
+                out.close()
+
+            if compress is None:
+                # the index is keyed on the size and time of the file, and offsets into it, so only works uncompressed
+                log_index.save_index(path, split.index_entries())
+
+            paths.append(path)
+
+    return paths
 
 
 def main(argv=None):
@@ -69,9 +366,22 @@ def main(argv=None):
     parser = argparse.ArgumentParser("Script for splitting a log into parts.")
     parser.add_argument("log", help="The logfile to split.")
     parser.add_argument("-y", "--year", help="The year the log was produced in. Only for output file name.")
+    parser.add_argument("-o", "--output_dir", default=".", help="Directory to save the parts in.")
+    parser.add_argument(
+        "--compress",
+        choices=tuple(COMPRESSIONS),
+        help="Compress the parts with gzip or zstd. Compressed parts are saved without an encounter index.",
+    )
 
     args = parser.parse_args(argv)
-    split_log(args.log, year=args.year)
+
+    if args.compress == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            parser.error("--compress zstd needs the zstandard package, `pip install zstandard`.")
+
+    split_log(args.log, year=args.year, output_dir=args.output_dir, compress=args.compress)
 
 
 if __name__ == "__main__":
@@ -14,6 +14,11 @@ def group_processed_lines(processed_lines, ignore_crit, spell_id=None):
     :param spell_id: spell id to filter for
     :returns a dictionary by spell id, with a list of (heal, overheal, is_crit)
     """
+    if hasattr(processed_lines, "group_by_spell"):
+        # columnar events, group without creating event tuples
+        columns = processed_lines.group_by_spell(ignore_crit, spell_id=spell_id)
+        return {s: list(zip(*(c.tolist() for c in cs))) for s, cs in columns.items()}
+
     spell_dict = dict()
 
     filter_spell_id = spell_id
@@ -3,6 +3,124 @@ Functions for tracking damage taken by raid or character.
 
 By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
+from array import array
+from bisect import bisect_right
+
+# number of changes between dense checkpoints of all deficits in a timeline
+CHECKPOINT_INTERVAL = 64
+
+
+class DeficitTimeline:
+    """
+    Health deficits of all raid members over time, as a compact log of changes.
+
+    Each event changes the deficit of a single raid member, so only (time, player code, new deficit) is kept per event,
+    in flat arrays, along with a dense checkpoint of the deficits of everyone every `CHECKPOINT_INTERVAL` changes. The
+    deficits at any time are found by a binary search for the last change before it, then applying the few changes
+    after the checkpoint before that.
+
+    Indexing or iterating gives the deficits after each event, as a dict of deficit by player id, in order of first
+    appearance.
+    """
+
+    def __init__(self, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.checkpoint_interval = checkpoint_interval
+
+        # player ids by code, in order of first appearance
+        self.ids = []
+        self._codes = dict()
+
+        self.times = array("d")
+        self._players = array("i")
+        self._deficits = array("d")
+
+        self._current = array("d")
+        self._checkpoints = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, t, player_id, deficit):
+        """
+        Add a change of the deficit of a player, changes should be added in time order.
+
+        :param t: time of the change, in seconds
+        :param player_id: the player id
+        :param deficit: the new deficit of the player
+        """
+        if len(self.times) % self.checkpoint_interval == 0:
+            self._checkpoints.append(array("d", self._current))
+
+        code = self._codes.get(player_id)
+        if code is None:
+            code = len(self.ids)
+            self._codes[player_id] = code
+            self.ids.append(player_id)
+            self._current.append(0)
+
+        self._current[code] = deficit
+
+        self.times.append(t)
+        self._players.append(code)
+        self._deficits.append(deficit)
+
+    def _deficits_after(self, i):
+        """Deficits by player code after the first i changes."""
+        checkpoint = (i - 1) // self.checkpoint_interval
+        deficits = list(self._checkpoints[checkpoint])
+
+        for j in range(checkpoint * self.checkpoint_interval, i):
+            code = self._players[j]
+            if code == len(deficits):
+                deficits.append(0)
+
+            deficits[code] = self._deficits[j]
+
+        return deficits
+
+    def _as_dict(self, deficits):
+        return dict(zip(self.ids, deficits))
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("deficit timeline index out of range")
+
+        return self._as_dict(self._deficits_after(i + 1))
+
+    def __iter__(self):
+        deficits = dict()
+        for _, player_id, deficit in self.changes():
+            deficits[player_id] = deficit
+            yield dict(deficits)
+
+    def changes(self):
+        """The changes, in order, as (time, player id, new deficit)."""
+        ids = self.ids
+        for t, code, deficit in zip(self.times, self._players, self._deficits):
+            yield t, ids[code], deficit
+
+    def at(self, t):
+        """
+        Deficits at a time, after all changes up to and including it.
+
+        :param t: the time, in seconds
+        :returns dict of deficit by player id, empty before the first change
+        """
+        i = bisect_right(self.times, t)
+        if i == 0:
+            return dict()
+
+        return self._as_dict(self._deficits_after(i))
+
+    def next_time(self, t):
+        """Time of the first change after a time, or None if there are no more changes."""
+        i = bisect_right(self.times, t)
+        if i == len(self.times):
+            return None
+
+        return self.times[i]
 
 
 def _get_net_health_change(e, current_deficit):
@@ -72,47 +190,78 @@ def character_damage_taken(events, character_name, verbose=False):
     return times, deficits, nets, health_pcts, health_ests
 
 
-def raid_damage_taken(events, character_name=None, verbose=False):
-    # for each character
-    times = dict(all=[])
-    health_pcts = dict(all=[])
-    deficits = dict(all=[])
-    deficits_time = []
-    health_diffs = dict(all=[])
-    health_ests = dict(all=[])
-    deficit = dict()
-    all_deficit = 0
-
-    death_times = dict()
-    min_deficit = 0
-    min_deficits = []
-
-    name_dict = dict()
+class RaidHealthTracker:
+    """
+    Tracks the health deficit of every raid member, event by event.
 
-    for e in events:
+    Running totals are kept of the deficit of the whole raid and of the dead players, updated with each death and
+    resurrection, so each event is handled in constant time whatever the size of the raid. Events can be added all at
+    once from a processed log, or one at a time as they are read, e.g. when following a log.
+    """
+
+    def __init__(self, character_name=None, verbose=False):
+        """
+        :param character_name: if given, heals from this character are ignored
+        :param verbose: if true, print the raid deficit after each event
+        """
+        self.character_name = character_name
+        self.verbose = verbose
+
+        # history for each character, and for the whole raid under "all"
+        self.times = dict(all=[])
+        self.health_pcts = dict(all=[])
+        self.deficits = dict(all=[])
+        self.health_diffs = dict(all=[])
+        self.health_ests = dict(all=[])
+
+        # deficits of everyone after each event
+        self.deficits_time = DeficitTimeline()
 
+        # raid deficit counting dead players as having no deficit, after each event
+        self.min_deficits = []
+
+        self.name_dict = dict()
+
+        # current deficit of each character, the whole raid and the dead
+        self.deficit = dict()
+        self.raid_deficit = 0
+        self.dead_deficit = 0
+
+        self.death_times = dict()
+
+    @property
+    def alive_deficit(self):
+        """Current deficit of the players alive."""
+        return self.raid_deficit - self.dead_deficit
+
+    def add(self, e):
+        """Add a heal or damage taken event, events should be added in time order."""
         target_id = e.target_id
-        if target_id not in name_dict:
-            name_dict[target_id] = e.target
-
-        if target_id not in times:
-            times[target_id] = []
-            health_pcts[target_id] = []
-            deficits[target_id] = []
-            health_diffs[target_id] = []
-            health_ests[target_id] = []
-            deficit[target_id] = 0
-
-        current_deficit = deficit[target_id]
+        if target_id not in self.name_dict:
+            self.name_dict[target_id] = e.target
+
+            self.times[target_id] = []
+            self.health_pcts[target_id] = []
+            self.deficits[target_id] = []
+            self.health_diffs[target_id] = []
+            self.health_ests[target_id] = []
+            self.deficit[target_id] = 0
+
+        death_times = self.death_times
+
+        current_deficit = self.deficit[target_id]
         net, overheal, overkill = _get_net_health_change(e, current_deficit)
 
-        source = e.source
-        if source == character_name:
+        if e.source == self.character_name:
             # if character name is specified, ignore all heals from that character
             net = min(0, net)
 
         current_deficit += net
-        all_deficit += net
+        self.raid_deficit += net
+
+        if target_id in death_times:
+            # deficit of the target is counted again below if still dead
+            self.dead_deficit -= self.deficit[target_id]
 
         timestamp = e.timestamp
         if target_id in death_times and timestamp > death_times[target_id]:
@@ -120,24 +269,18 @@ def raid_damage_taken(events, character_name=None, verbose=False):
 
             del death_times[target_id]
 
-            # Recalculate min deficit
-            dead_deficits = list(deficits[character_id][-1] for character_id in death_times.keys())
-            min_deficit = sum(dead_deficits)
-
         if overkill < 0:
             # someone died, lower raid min deficit
             print(f"{e.target} died, {current_deficit} deficit, {-overkill} overkill")
             death_times[target_id] = timestamp
 
-        # if (overheal and current_deficit < 0) or current_deficit > 0:
-        #     print(f"{target} got overhealed with {current_deficit} deficit.")
-        #     all_deficit -= current_deficit
-        #     current_deficit = 0
-
         if current_deficit > 0:
-            all_deficit -= current_deficit
+            self.raid_deficit -= current_deficit
             current_deficit = 0
 
+        if target_id in death_times:
+            self.dead_deficit += current_deficit
+
         t = timestamp.total_seconds()
 
         # estimate total health from deficit and %health
@@ -149,29 +292,45 @@ def raid_damage_taken(events, character_name=None, verbose=False):
         else:
             health_est = None
 
-        times[target_id].append(t)
-        deficits[target_id].append(current_deficit)
-        deficit[target_id] = current_deficit
+        self.times[target_id].append(t)
+        self.deficits[target_id].append(current_deficit)
+        self.deficit[target_id] = current_deficit
 
-        health_pcts[target_id].append(health_pct - 100)
-        health_diffs[target_id].append(net)
-        health_ests[target_id].append(health_est)
+        self.health_pcts[target_id].append(health_pct - 100)
+        self.health_diffs[target_id].append(net)
+        self.health_ests[target_id].append(health_est)
 
-        times["all"].append(t)
-        deficits["all"].append(all_deficit)
-        health_diffs["all"].append(net)
+        self.times["all"].append(t)
+        self.deficits["all"].append(self.raid_deficit)
+        self.health_diffs["all"].append(net)
 
-        if verbose:
-            print(t, all_deficit)
+        if self.verbose:
+            print(t, self.raid_deficit)
+
+        self.min_deficits.append(self.dead_deficit)
+
+        # only the deficit of the target changes, dead players have no deficit to heal
+        self.deficits_time.append(t, target_id, 0 if target_id in death_times else current_deficit)
 
-        # update min deficit
-        if target_id in death_times.keys():
-            dead_deficits = (deficits[character_id][-1] for character_id in death_times.keys())
-            min_deficit = sum(dead_deficits)
+    def extend(self, events):
+        """Add events, in time order."""
+        for e in events:
+            self.add(e)
 
-        min_deficits.append(min_deficit)
+    def results(self):
+        """The tracked history, as returned by `raid_damage_taken`."""
+        return self.times, self.deficits, self.deficits_time, self.name_dict, self.min_deficits
+
+
+def raid_damage_taken(events, character_name=None, verbose=False):
+    """
+    Track the health deficits of the raid over the events, see `RaidHealthTracker`.
 
-        deficit_time = {k: deficit[k] if k not in death_times else 0 for k in deficit}
-        deficits_time.append(deficit_time)
+    :returns times, deficits, deficits_time, name_dict, min_deficits, the times and deficits of each character and of
+        the whole raid under "all", the DeficitTimeline of everyone, the names of the characters by id, and the raid
+        deficit counting dead players as having no deficit
+    """
+    tracker = RaidHealthTracker(character_name, verbose)
+    tracker.extend(events)
 
-    return times, deficits, deficits_time, name_dict, min_deficits
+    return tracker.results()
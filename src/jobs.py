@@ -0,0 +1,61 @@
+"""
+Running independent pieces of work, like per-spell analysis and plotting, over a pool of processes.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import io
+import os
+import contextlib
+
+
+def _init_worker():
+    """Workers only ever save figures to file, so use the non-interactive backend."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def _run_captured(function, task):
+    """Run a task, capturing what it prints, so the output can be printed in task order."""
+    output = io.StringIO()
+
+    with contextlib.redirect_stdout(output):
+        result = function(*task)
+
+    return result, output.getvalue()
+
+
+def run_jobs(function, tasks, jobs=1, initializer=_init_worker):
+    """
+    Calls a function for each of a list of argument tuples, over a pool of processes if using more than one job.
+
+    :param function: function to call, must be picklable, i.e. defined at the top level of a module
+    :param tasks: list of argument tuples to call the function with
+    :param jobs: number of processes to use, 0 for one per core, 1 to run everything in this process
+    :param initializer: function to set up each worker process with, by default setting up plotting to file
+    :returns list of results, in the same order as the tasks. Anything printed by the tasks is also printed in order.
+    """
+    tasks = list(tasks)
+
+    if jobs is None:
+        jobs = 1
+    elif jobs <= 0:
+        jobs = os.cpu_count() or 1
+
+    jobs = min(jobs, len(tasks))
+
+    if jobs <= 1:
+        return [function(*task) for task in tasks]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer) as pool:
+        futures = [pool.submit(_run_captured, function, task) for task in tasks]
+
+        for future in futures:
+            result, output = future.result()
+            print(output, end="")
+            results.append(result)
+
+    return results
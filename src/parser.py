@@ -5,6 +5,8 @@ By: Filip Gokstorp (Saintis), 2020
 """
 import argparse
 
+from .readers import response_cache
+
 
 class OverhealParser(argparse.ArgumentParser):
     """Default setup for an arg parser for Overheal scripts."""
@@ -17,6 +19,7 @@ class OverhealParser(argparse.ArgumentParser):
         accept_spell_id=False,
         accept_spell_power=False,
         accept_encounter=False,
+        accept_jobs=False,
         **kwargs
     ):
         super().__init__(**kwargs)
@@ -26,6 +29,26 @@ class OverhealParser(argparse.ArgumentParser):
             help="Data source, either path to the .txt log file to analyse, link to a Warcraftlog report or the WCL "
             "report code.",
         )
+        self.add_argument(
+            "--api_cache",
+            choices=response_cache.CACHE_MODES,
+            default="use",
+            help="How to use the local cache of WCL API responses. `refresh` downloads everything again and updates "
+            "the cache, `bypass` ignores the cache completely.",
+        )
+        self.add_argument(
+            "--parse_jobs",
+            type=int,
+            default=1,
+            help="Number of processes to parse raw log files with, splitting the log into pieces. Pass a 0 to use one "
+            "process per core.",
+        )
+        self.add_argument(
+            "--log_cache",
+            action="store_true",
+            help="Cache the parsed events of raw log files next to the log, so later runs only read the cache. The "
+            "cache is made when a whole log is processed.",
+        )
 
         if need_character:
             self.add_argument("character_name", help="Character name to perform analysis for.")
@@ -51,3 +74,17 @@ class OverhealParser(argparse.ArgumentParser):
                 help="The encounter index to pick directly. Bypasses the encounter selection menu. Pass a 0 for all "
                 "encounters.",
             )
+
+        if accept_jobs:
+            self.add_argument(
+                "-j",
+                "--jobs",
+                type=int,
+                default=1,
+                help="Number of processes to analyse and plot spells with. Pass a 0 to use one process per core.",
+            )
+
+
+def reader_options(args):
+    """Options of the processors reading the data, from the parsed command line arguments of an `OverhealParser`."""
+    return dict(cache_mode=args.api_cache, parse_jobs=args.parse_jobs, log_cache=args.log_cache)
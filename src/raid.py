@@ -0,0 +1,19 @@
+"""
+Raid setup, the healers, tanks and groups of the raid, as listed in `raid.json`.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import json
+
+
+def load_raid():
+    """Reads the raid setup, the lists of healers and tanks, and optionally the groups, from `raid.json`."""
+    try:
+        with open("raid.json") as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        print(
+            "Could not find raid setup file `raid.json`. Please create a file similar to `raid_example.json` with a "
+            "list of your healers and tanks."
+        )
+        exit(400)
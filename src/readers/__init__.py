@@ -10,15 +10,19 @@ def url_to_code(source):
     return source.split("#")[0].split("/")[-1]
 
 
-def read_heals(source, **kwargs):
+def read_heals(source, cache_mode="use", parse_jobs=1, log_cache=False, **kwargs):
     """
     Read data from specified source
+
+    :param cache_mode: how to use the cache of WCL API responses, one of `response_cache.CACHE_MODES`
+    :param parse_jobs: number of processes to parse a raw log with, 0 for one per core
+    :param log_cache: if true, the parsed events of a raw log are read from a cache next to the log
     """
 
     if ".txt" in source:
         from . import read_from_raw as raw
 
-        heals, periodics = raw.get_heals(source, **kwargs)
+        heals, periodics = raw.get_heals(source, use_cache=log_cache, jobs=parse_jobs, **kwargs)
         absorbs = []
 
         return heals, periodics, absorbs
@@ -31,18 +35,22 @@ def read_heals(source, **kwargs):
 
     from . import read_from_api as api
 
-    return api.get_heals(code, **kwargs)
+    return api.get_heals(code, cache_mode=cache_mode, **kwargs)
 
 
-def get_processor(source, **kwargs):
+def get_processor(source, cache_mode="use", parse_jobs=1, log_cache=False, **kwargs):
     """
     Get a data processor for the specified source
+
+    :param cache_mode: how to use the cache of WCL API responses, one of `response_cache.CACHE_MODES`
+    :param parse_jobs: number of processes to parse a raw log with, 0 for one per core
+    :param log_cache: if true, the parsed events of a raw log are read from a cache next to the log
     """
     if ".txt" in source:
         # Dealing with a raw combatlog text file
         from .read_from_raw import RawProcessor
 
-        return RawProcessor(source, **kwargs)
+        return RawProcessor(source, use_cache=log_cache, jobs=parse_jobs, **kwargs)
 
     # Assuming source is a url pointing towards a WCL report, or the report code itself
     if "https://" in source or "http://" in source:
@@ -50,4 +58,4 @@ def get_processor(source, **kwargs):
 
     from .read_from_api import APIProcessor
 
-    return APIProcessor(source, **kwargs)
+    return APIProcessor(source, cache_mode=cache_mode, **kwargs)
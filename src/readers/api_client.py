@@ -0,0 +1,215 @@
+"""
+HTTP client for the WarcraftLogs API.
+
+A single client keeps a pool of keep-alive connections, so fetching many pages doesn't pay for a new connection and
+TLS handshake on every request. Responses are gzip compressed, and requests failing with a rate limit, server error or
+connection error are retried with exponential backoff. Timing of every request is kept for reporting. The session, and
+the requests package, are only set up once the first request goes out, so reports read from the cache never need them.
+
+Responses can be kept in a `ResponseCache`, so the same report pages are only downloaded once. The cache mode sets how
+it is used: "use" reads from and writes to the cache, "refresh" downloads everything again and updates the cache, and
+"bypass" doesn't touch the cache at all.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import time
+import threading
+from json.decoder import JSONDecodeError
+
+from .response_cache import CACHE_MODES
+
+# status codes worth trying again
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class APIError(Exception):
+    """Error getting data from the WCL API."""
+
+    def __init__(self, message, exit_code=200):
+        """
+        :param message: description of the error, as shown to the user
+        :param exit_code: code the scripts exit with on the error
+        """
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+class RequestStats:
+    """Timing statistics of the requests made by a client."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.bytes = 0
+
+        self._lock = threading.Lock()
+
+    def add(self, dt, n_bytes=0, retry=False, failure=False):
+        """Record a single request attempt."""
+        with self._lock:
+            self.requests += 1
+            self.retries += retry
+            self.failures += failure
+            self.total_time += dt
+            self.max_time = max(self.max_time, dt)
+            self.bytes += n_bytes
+
+    @property
+    def mean_time(self):
+        return self.total_time / self.requests if self.requests else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.requests} requests, {self.retries} retries, {self.failures} failures, "
+            f"{self.mean_time * 1000:.0f} ms mean, {self.max_time * 1000:.0f} ms max, {self.bytes / 1024:.0f} kB"
+        )
+
+
+class APIClient:
+    """Pooled, retrying HTTP client for WCL API requests."""
+
+    def __init__(
+        self, api_key=None, max_retries=4, backoff=0.5, timeout=60.0, pool_size=16, cache=None, cache_mode="use"
+    ):
+        """
+        :param api_key: the WCL API key added to every request, or a function returning it, called on the first request
+        :param max_retries: number of times to retry a failed request before giving up
+        :param backoff: seconds to wait before the first retry, doubling for every retry after
+        :param timeout: seconds to wait for a response
+        :param pool_size: number of connections to keep open
+        :param cache: optional ResponseCache to keep responses in
+        :param cache_mode: how to use the cache, one of "use", "refresh" or "bypass"
+        """
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {cache_mode}, must be one of {CACHE_MODES}")
+
+        self.api_key = api_key
+        self.cache = cache
+        self.cache_mode = cache_mode
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.stats = RequestStats()
+
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                if callable(self.api_key):
+                    self.api_key = self.api_key()
+
+                session = requests.Session()
+                session.headers["Accept-Encoding"] = "gzip"
+
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+
+        return self._session
+
+    def _wait(self, attempt, response=None):
+        """Sleep before the next attempt, honouring Retry-After on rate limits."""
+        delay = self.backoff * 2 ** attempt
+
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("Retry-After", 0)))
+            except ValueError:
+                pass
+
+        time.sleep(delay)
+
+    def get(self, url, cacheable=None, **params):
+        """
+        Get an API request, from the cache if there, otherwise from the API.
+
+        :param url: full url with request details to use.
+        :param cacheable: optional function of a response, returning false if the response may still change, so
+            shouldn't be cached.
+        :returns the JSON response
+        :raises APIError: if the request fails, or keeps failing after all retries
+        """
+        use_cache = self.cache is not None and self.cache_mode != "bypass"
+
+        if use_cache and self.cache_mode == "use":
+            data = self.cache.get(url, params)
+            if data is not None:
+                return data
+
+        data = self.request(url, **params)
+
+        if use_cache and (cacheable is None or cacheable(data)):
+            self.cache.put(url, params, data)
+
+        return data
+
+    def request(self, url, **params):
+        """
+        Get an API request, retrying on rate limits and server errors.
+
+        :param url: full url with request details to use.
+        :returns the JSON response
+        :raises APIError: if the request fails, or keeps failing after all retries
+        """
+        import requests
+
+        session = self.session
+        if self.api_key is not None:
+            params = dict(api_key=self.api_key, **params)
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            t0 = time.perf_counter()
+
+            try:
+                response = session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                self.stats.add(time.perf_counter() - t0, retry=not last_attempt, failure=last_attempt)
+                if last_attempt:
+                    raise APIError(f"Error getting API request: {url}\nError: {ex}") from ex
+
+                self._wait(attempt)
+                continue
+
+            dt = time.perf_counter() - t0
+
+            if response.status_code in RETRY_STATUS and not last_attempt:
+                self.stats.add(dt, len(response.content), retry=True)
+                self._wait(attempt, response)
+                continue
+
+            if response.status_code != 200:
+                self.stats.add(dt, len(response.content), failure=True)
+                raise APIError(
+                    f"Error getting API request: {response.url}\n"
+                    f"Status code: {response.status_code}\n"
+                    f"Error: {response.text}"
+                )
+
+            try:
+                data = response.json()
+            except JSONDecodeError as ex:
+                self.stats.add(dt, len(response.content), failure=True)
+                raise APIError(
+                    "WarcraftLogs did not return proper JSON, it is likely down for maintenance.\n"
+                    f"Request response: {response.text}",
+                    exit_code=300,
+                ) from ex
+
+            self.stats.add(dt, len(response.content))
+            return data
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
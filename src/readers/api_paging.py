@@ -0,0 +1,137 @@
+"""
+Concurrent paging of WarcraftLogs event streams.
+
+The WCL events endpoints return events in pages, each page pointing to the timestamp the next one starts at, so a
+single stream can only be fetched one page at a time. Instead the time window is split into ranges, one per fight, and
+the ranges are paged through concurrently, with a semaphore bounding the number of requests in flight. Several streams,
+e.g. healing and damage-taken, can be fetched at the same time in the same way, each with its own filter parameters.
+
+Requests are made with a blocking get function run in a thread pool, so the same function and error handling is used as
+for single requests. Paging can be started from synchronous code or from within a running event loop, as in Jupyter.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# default number of requests in flight at once
+MAX_CONCURRENCY = 4
+
+
+def fight_ranges(fights, start, end, gaps=True):
+    """
+    Split a time window into ranges at the fight boundaries.
+
+    By default gaps between fights are kept as their own ranges, so the ranges always cover the whole window. Without
+    gaps only the parts of the window inside a fight are covered.
+
+    :param fights: list of fight dicts, with start_time and end_time, as given by the WCL fights endpoint
+    :param start: start of the window, in ms
+    :param end: end of the window, in ms
+    :param gaps: if false, leave out the time between fights
+    :returns list of (start, end) ranges, in order
+    """
+    if not gaps:
+        ranges = []
+        for f in sorted(fights, key=lambda f: f["start_time"]):
+            s, e = max(start, f["start_time"]), min(end, f["end_time"])
+            if s < e:
+                ranges.append((s, e))
+
+        return ranges
+
+    bounds = {start, end}
+    for f in fights:
+        for t in (f["start_time"], f["end_time"]):
+            if start < t < end:
+                bounds.add(t)
+
+    bounds = sorted(bounds)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+async def _fetch_range(get, url, range_start, range_end, shared_end, semaphore, executor, on_page, params):
+    """Page through a single range, returns the events in it."""
+    loop = asyncio.get_event_loop()
+    events = []
+
+    next_start = range_start
+    request_more = True
+    while request_more:
+        async with semaphore:
+            data = await loop.run_in_executor(executor, lambda s=next_start: get(url, start=s, end=range_end, **params))
+
+        page = data["events"]
+        if shared_end:
+            # the next range starts at range_end, don't count events on the boundary twice
+            page = [e for e in page if e["timestamp"] < range_end]
+
+        events.extend(page)
+
+        if "nextPageTimestamp" in data:
+            done = data["nextPageTimestamp"] - next_start
+            next_start = data["nextPageTimestamp"]
+        else:
+            done = range_end - next_start
+            request_more = False
+
+        if on_page is not None:
+            on_page(url, done)
+
+    return events
+
+
+async def _fetch_streams(get, urls, ranges, max_concurrency, on_page, stream_params):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    n = len(ranges)
+    shared_ends = [i < n - 1 and ranges[i + 1][0] == e for i, (_, e) in enumerate(ranges)]
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        tasks = [
+            _fetch_range(get, url, s, e, shared_ends[i], semaphore, executor, on_page, params)
+            for url, params in zip(urls, stream_params)
+            for i, (s, e) in enumerate(ranges)
+        ]
+        pages = await asyncio.gather(*tasks)
+
+    # join ranges back together, per stream
+    streams = []
+    for i_url in range(len(urls)):
+        events = []
+        for range_events in pages[i_url * n : (i_url + 1) * n]:
+            events.extend(range_events)
+        streams.append(events)
+
+    return streams
+
+
+def fetch_streams(get, urls, ranges, max_concurrency=MAX_CONCURRENCY, on_page=None, stream_params=None, **params):
+    """
+    Fetch all events of several event streams, paging through the ranges concurrently.
+
+    :param get: function fetching a single page, called as get(url, start=..., end=..., **params), returning the JSON
+    :param urls: list of event stream urls
+    :param ranges: list of (start, end) ranges, in order, e.g. from `fight_ranges`
+    :param max_concurrency: maximum number of requests in flight at once
+    :param on_page: optional function called as on_page(url, ms) after each page, with the ms of the range covered
+    :param stream_params: optional list of dicts of extra request parameters, one per url, e.g. to filter the events
+    :param params: extra request parameters for all urls
+    :returns list of event lists, one per url, each in timestamp order
+    """
+    if len(ranges) == 0:
+        return [[] for _ in urls]
+
+    if stream_params is None:
+        stream_params = [{} for _ in urls]
+
+    stream_params = [dict(params, **p) for p in stream_params]
+    fetch = _fetch_streams(get, urls, ranges, max_concurrency, on_page, stream_params)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(fetch)
+
+    # called from within an event loop, e.g. in Jupyter, which asyncio.run can't be, so page in a loop of its own
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, fetch).result()
@@ -0,0 +1,316 @@
+"""
+Table driven decoding of raw combat log lines into typed records.
+
+A line is split into its fields once, keeping quoted fields, like names, whole even if they contain commas. The event
+type then picks the layout of the fields from a table, and only the fields asked for are picked out and converted, using
+a field map compiled once per event type. Anything after decoding, e.g. handling each event type, is done by looking up
+a handler in a dictionary by the event type.
+
+The layouts follow the advanced combat log: the source and target fields, then the prefix fields of the event type (the
+spell for SPELL_ events, nothing for SWING_ events), then the advanced unit info if the event carries it, then the
+suffix fields (amounts for damage and heals). Logs without advanced logging lack the unit info, which is told apart by
+the number of fields.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+from operator import itemgetter
+from collections import namedtuple
+
+from ..utils import get_player_name
+
+BASE = (
+    "source_id",
+    "source",
+    "source_flags",
+    "source_raid_flags",
+    "target_id",
+    "target",
+    "target_flags",
+    "target_raid_flags",
+)
+SPELL = ("spell_id", "spell_name", "spell_school")
+ADVANCED = (
+    "info_id",
+    "owner_id",
+    "health_pct",
+    "max_health",
+    "attack_power",
+    "spell_power",
+    "armor",
+    "power_type",
+    "power",
+    "max_power",
+    "power_cost",
+    "position_x",
+    "position_y",
+    "map_id",
+    "facing",
+    "level",
+)
+DAMAGE = (
+    "amount",
+    "gross_amount",
+    "overkill",
+    "school",
+    "resisted",
+    "blocked",
+    "absorbed",
+    "critical",
+    "glancing",
+    "crushing",
+)
+HEAL = ("amount", "gross_amount", "overheal", "absorbed", "critical")
+EXTRA_SPELL = ("extra_spell_id", "extra_spell_name", "extra_school")
+ABSORB = ("caster_id", "caster", "caster_flags", "caster_raid_flags") + SPELL + ("amount", "total_amount")
+
+# field layouts of each event type, the fields after the timestamp and event type, in order
+LAYOUTS = {
+    "SWING_DAMAGE": (BASE + ADVANCED + DAMAGE,),
+    "SWING_DAMAGE_LANDED": (BASE + ADVANCED + DAMAGE,),
+    "RANGE_DAMAGE": (BASE + SPELL + ADVANCED + DAMAGE,),
+    "SPELL_DAMAGE": (BASE + SPELL + ADVANCED + DAMAGE,),
+    "SPELL_PERIODIC_DAMAGE": (BASE + SPELL + ADVANCED + DAMAGE,),
+    "SPELL_HEAL": (BASE + SPELL + ADVANCED + HEAL,),
+    "SPELL_PERIODIC_HEAL": (BASE + SPELL + ADVANCED + HEAL,),
+    # absorbs of melee hits have no spell for the attack
+    "SPELL_ABSORBED": (BASE + ABSORB, BASE + ("attack_spell_id", "attack_spell_name", "attack_spell_school") + ABSORB),
+    "SPELL_CAST_START": (BASE + SPELL,),
+    "SPELL_CAST_SUCCESS": (BASE + SPELL + ADVANCED,),
+    "SPELL_CAST_FAILED": (BASE + SPELL + ("failed_type",),),
+    "SPELL_RESURRECT": (BASE + SPELL,),
+    "SPELL_DISPEL": (BASE + SPELL + EXTRA_SPELL + ("aura_type",),),
+    "SPELL_DISPEL_FAILED": (BASE + SPELL + EXTRA_SPELL,),
+    "UNIT_DIED": (BASE,),
+}
+
+# conversion of field text to values, fields not listed are kept as text
+NAME_FIELDS = ("source", "target", "caster")
+TEXT_FIELDS = ("spell_name", "extra_spell_name", "attack_spell_name", "failed_type")
+INT_FIELDS = (
+    "amount",
+    "gross_amount",
+    "total_amount",
+    "overheal",
+    "overkill",
+    "absorbed",
+    "resisted",
+    "blocked",
+    "health_pct",
+    "max_health",
+    "attack_power",
+    "spell_power",
+    "armor",
+    "power",
+    "max_power",
+    "power_cost",
+    "level",
+)
+FLAG_FIELDS = ("critical", "glancing", "crushing")
+
+
+def _strip_quotes(text):
+    return text.strip('"')
+
+
+def _is_set(text):
+    return text == "1"
+
+
+def _none(_):
+    return None
+
+
+def _converted(convert, i):
+    """Getter of the converted field at position i of the split line."""
+
+    def getter(parts):
+        return convert(parts[i])
+
+    return getter
+
+
+CONVERTERS = dict()
+CONVERTERS.update((f, get_player_name) for f in NAME_FIELDS)
+CONVERTERS.update((f, _strip_quotes) for f in TEXT_FIELDS)
+CONVERTERS.update((f, int) for f in INT_FIELDS)
+CONVERTERS.update((f, _is_set) for f in FLAG_FIELDS)
+
+
+def _without_advanced(layout):
+    """Layout of the same event in a log without advanced logging."""
+    n = len(ADVANCED)
+    for i in range(len(layout) - n + 1):
+        if layout[i : i + n] == ADVANCED:
+            return layout[:i] + layout[i + n :]
+
+    return None
+
+
+def _add_basic_layouts(layouts):
+    all_layouts = dict()
+    for event_type, event_layouts in layouts.items():
+        basic = tuple(b for b in (_without_advanced(layout) for layout in event_layouts) if b is not None)
+        all_layouts[event_type] = event_layouts + basic
+
+    return all_layouts
+
+
+LAYOUTS = _add_basic_layouts(LAYOUTS)
+
+
+def _split_quoted(text):
+    """Split on commas outside of quotes, keeping the quotes."""
+    fields = [""]
+    for i, piece in enumerate(text.split('"')):
+        if i % 2:
+            fields[-1] += '"' + piece + '"'
+            continue
+
+        parts = piece.split(",")
+        fields[-1] += parts[0]
+        fields.extend(parts[1:])
+
+    return fields
+
+
+def split_line(line):
+    """
+    Split a log line into its timestamp, event type and fields, tokenising the line only once.
+
+    Commas inside quoted fields don't split the field, e.g. for names like "Vek'lor, Emperor". Quotes are kept.
+
+    :param line: a raw log line, with or without the newline
+    :returns (timestamp, event_type, fields), the timestamp as text and a list of the field texts
+    """
+    line = line.rstrip("\r\n")
+
+    if '"' in line and "," in "".join(line.split('"')[1::2]):
+        parts = _split_quoted(line)
+    else:
+        parts = line.split(",")
+
+    timestamp, _, event_type = parts[0].partition("  ")
+    return timestamp, event_type, parts[1:]
+
+
+class EventDecoder:
+    """Decodes log lines into records of a given set of fields."""
+
+    def __init__(self, fields, skip=None, layouts=None):
+        """
+        :param fields: names of the fields to decode, records get the event_type and timestamp fields, then these.
+            Fields not in the layout of an event type are None.
+        :param skip: optional dict of field name to text, lines where the field contains the text are skipped without
+            decoding the rest of the line, e.g. {"target_id": "Creature"}
+        :param layouts: field layouts by event type, defaults to `LAYOUTS`
+        """
+        self.fields = tuple(fields)
+        self.skip = dict() if skip is None else dict(skip)
+        self.layouts = LAYOUTS if layouts is None else layouts
+        self.record = namedtuple("Record", ("event_type", "timestamp") + self.fields)
+
+        # compiled field maps, by event type and number of parts in the line
+        self._field_maps = dict()
+
+    def _compile(self, event_type, layout):
+        """
+        Compile the field map of a layout into a function making a record from the split line.
+
+        The positions of the fields in the layout are looked up once here, leaving a getter per field, picking out and
+        converting its part of the line, and the skip checks, with their positions.
+        """
+        index = {name: i + 1 for i, name in enumerate(layout)}
+
+        getters = []
+        for name in self.fields:
+            if name not in index:
+                getters.append(_none)
+            elif name in CONVERTERS:
+                getters.append(_converted(CONVERTERS[name], index[name]))
+            else:
+                getters.append(itemgetter(index[name]))
+
+        getters = tuple(getters)
+        checks = tuple((text, index[name]) for name, text in self.skip.items() if name in index)
+        record = self.record
+
+        def field_map(timestamp, parts):
+            for text, i in checks:
+                if text in parts[i]:
+                    return None
+
+            return record(event_type, timestamp, *[get(parts) for get in getters])
+
+        return field_map
+
+    def _field_map(self, event_type, parts):
+        """Compiled field map of a line, or None if the event type isn't known."""
+        layouts = self.layouts.get(event_type)
+        if layouts is None:
+            return None
+
+        n_fields = len(parts) - 1
+        layout = next((lo for lo in layouts if len(lo) == n_fields), None)
+
+        if layout is None:
+            # assume the first layout, if no layout has the right number of fields
+            layout = layouts[0]
+
+        field_map = self._compile(event_type, layout)
+        self._field_maps[(event_type, len(parts))] = field_map
+
+        return field_map
+
+    def decode(self, line):
+        """
+        Decode a log line.
+
+        Lines are split on all commas first, as quoted fields with commas are rare. A line with quotes, and a number of
+        fields not matching any layout, is split again keeping quoted fields whole.
+
+        :param line: the raw log line
+        :returns record namedtuple, or None if the event type of the line isn't known or the line is skipped
+        """
+        line = line.rstrip("\r\n")
+        parts = line.split(",")
+        timestamp, _, event_type = parts[0].partition("  ")
+
+        field_map = self._field_maps.get((event_type, len(parts)))
+        if field_map is None:
+            if event_type not in self.layouts:
+                return None
+
+            if '"' in line and not any(len(lo) == len(parts) - 1 for lo in self.layouts[event_type]):
+                parts = _split_quoted(line)
+
+            field_map = self._field_maps.get((event_type, len(parts))) or self._field_map(event_type, parts)
+
+        return field_map(timestamp, parts)
+
+    def decode_all(self, lines, event_types=None):
+        """
+        Decode log lines, skipping lines of unknown event types.
+
+        :param lines: iterable of raw log lines
+        :param event_types: optional event types to keep, others are skipped
+        :returns generator of records
+        """
+        decode = self.decode
+
+        for line in lines:
+            record = decode(line)
+
+            if record is None or (event_types is not None and record.event_type not in event_types):
+                continue
+
+            yield record
+
+    def dispatch(self, lines, handlers):
+        """
+        Decode log lines and pass each record to the handler of its event type.
+
+        :param lines: iterable of raw log lines
+        :param handlers: dict of functions by event type, each called with a record. Other event types are skipped.
+        """
+        for record in self.decode_all(lines, handlers):
+            handlers[record.event_type](record)
@@ -0,0 +1,77 @@
+"""
+Running several analyses over a single pass of a raw combat log.
+
+Each analysis subscribes handlers for the event types it needs, along with the record fields it reads. The bus then
+scans the log once for all of the event types, decodes each line once into a record with all of the fields, and passes
+the record on to every handler of its event type. This way any number of analyses read and tokenise the log only once.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+from collections import defaultdict
+
+from .decoder import EventDecoder
+from .scanner import scan_events
+
+
+class EventBus:
+    """Passes decoded records from one scan of a log to the handlers subscribed to their event types."""
+
+    def __init__(self):
+        self.fields = []
+
+        # lists of (handler, skip) by event type
+        self._handlers = defaultdict(list)
+        self._finish = []
+
+    def subscribe(self, handlers, fields, skip=None, finish=None):
+        """
+        Subscribe an analysis to the bus.
+
+        :param handlers: dict of functions by event type, each called with a decoded record and the byte offset of its
+            line, in log order
+        :param fields: names of the record fields the handlers read
+        :param skip: optional dict of field name to text, records where the field contains the text are not given to
+            these handlers, same as the skip of an EventDecoder
+        :param finish: optional function to call once the whole log has been read
+        """
+        for field in fields:
+            if field not in self.fields:
+                self.fields.append(field)
+
+        skip = tuple(dict(skip or ()).items())
+        for event_type, handler in handlers.items():
+            self._handlers[event_type].append((handler, skip))
+
+        if finish is not None:
+            self._finish.append(finish)
+
+    def run(self, log_file, start=None, end=None):
+        """
+        Scan a log once, passing the records of the subscribed event types to their handlers.
+
+        :param log_file: path to the log file
+        :param start: byte offset to start from, should be the start of a line
+        :param end: byte offset to stop at (exclusive), or None for the rest of the log
+        """
+        decoder = EventDecoder(self.fields)
+        decode = decoder.decode
+
+        # skips as positions in the record, skipping the event_type and timestamp fields
+        handlers = {
+            event_type: [(h, tuple((self.fields.index(f) + 2, text) for f, text in skip)) for h, skip in subscribed]
+            for event_type, subscribed in self._handlers.items()
+        }
+
+        for offset, event_type, line in scan_events(log_file, tuple(handlers), start, end):
+            record = decode(line)
+            if record is None:
+                continue
+
+            for handler, skip in handlers[event_type]:
+                if skip and any(record[i] is not None and text in record[i] for i, text in skip):
+                    continue
+
+                handler(record, offset)
+
+        for finish in self._finish:
+            finish()
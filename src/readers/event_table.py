@@ -0,0 +1,383 @@
+"""
+Columnar storage of heal and damage events.
+
+Events are stored in a structured numpy array, with names, ids and spell ids interned as integer codes and timestamps
+stored as integer milliseconds. The lists of `HealEvent` and `DamageTakenEvent` the processors expose are lazy views
+over the table, creating the named tuples only when iterated over.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+from collections.abc import Sequence
+
+import numpy as np
+
+from .event_types import HealEvent, DamageTakenEvent
+
+# Event kinds
+DIRECT_HEAL = 0
+PERIODIC_HEAL = 1
+ABSORB = 2
+DAMAGE = 3
+DEATH = 4
+RESURRECTION = 5
+
+HEAL_KINDS = (DIRECT_HEAL, PERIODIC_HEAL, ABSORB)
+ALL_KINDS = (DIRECT_HEAL, PERIODIC_HEAL, ABSORB, DAMAGE)
+
+EVENT_DTYPE = np.dtype(
+    [
+        ("timestamp", "i8"),
+        ("source", "i4"),
+        ("source_id", "i4"),
+        ("spell_id", "i4"),
+        ("target", "i4"),
+        ("target_id", "i4"),
+        ("health_pct", "i2"),
+        ("amount", "i4"),  # total heal, or total damage
+        ("over", "i4"),  # overheal, or mitigated damage
+        ("overkill", "i4"),
+        ("kind", "i1"),
+        ("crit", "?"),
+        ("offset", "i8"),  # byte offset of the event in a raw log
+    ]
+)
+
+# columns holding interned values
+INTERNED = ("source", "source_id", "spell_id", "target", "target_id")
+
+# health_pct value stored for missing data
+NO_HEALTH = -1
+
+
+class StringPool:
+    """Interns values as integer codes. Code 0 is always None."""
+
+    def __init__(self, values=None):
+        self.values = [None]
+        self.codes = {None: 0}
+
+        if values is not None:
+            for v in values[1:]:
+                self.intern(v)
+
+    def intern(self, value):
+        code = self.codes.get(value)
+
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+
+        return code
+
+    def code(self, value):
+        """Code of a value, or -1 if it has never been seen."""
+        return self.codes.get(value, -1)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class EventTable:
+    """Growable table of heal and damage events."""
+
+    def __init__(self, time_view=None, chunk_size=65536):
+        """
+        :param time_view: function converting integer millisecond timestamps into the objects the event views give.
+        :param chunk_size: number of events to collect before packing them into a numpy array.
+        """
+        self.time_view = time_view
+        self.chunk_size = chunk_size
+        self.strings = StringPool()
+
+        self._chunks = []
+        self._pending = []
+        self._data = None
+        self.version = 0
+
+    @classmethod
+    def from_data(cls, data, values, time_view=None):
+        """
+        Table holding already packed events, e.g. loaded from file.
+
+        :param data: structured array of events
+        :param values: the interned values the codes in data refer to
+        """
+        table = cls(time_view=time_view)
+        table.strings = StringPool(values)
+        table._chunks = [data]
+
+        return table
+
+    def append(
+        self,
+        kind,
+        timestamp,
+        source,
+        source_id,
+        spell_id,
+        target,
+        target_id,
+        health_pct,
+        amount,
+        over,
+        overkill=0,
+        crit=False,
+        offset=0,
+    ):
+        """Add an event to the table."""
+        intern = self.strings.intern
+
+        if health_pct is None:
+            health_pct = NO_HEALTH
+
+        self._pending.append(
+            (
+                timestamp,
+                intern(source),
+                intern(source_id),
+                intern(spell_id),
+                intern(target),
+                intern(target_id),
+                health_pct,
+                amount,
+                over,
+                overkill,
+                kind,
+                crit,
+                offset,
+            )
+        )
+        self._data = None
+        self.version += 1
+
+        if len(self._pending) >= self.chunk_size:
+            self.pack()
+
+    def append_event(self, kind, event, timestamp):
+        """Add a HealEvent or DamageTakenEvent to the table, with the timestamp given in milliseconds."""
+        if kind == DAMAGE:
+            overkill = event.overkill
+            crit = False
+        else:
+            overkill = 0
+            crit = event.is_crit
+
+        self.append(kind, timestamp, *event[1:9], overkill=overkill, crit=crit)
+
+    def pack(self):
+        """Packs events added since the last pack into a numpy array."""
+        if self._pending:
+            self._chunks.append(np.array(self._pending, dtype=EVENT_DTYPE))
+            self._pending = []
+
+    @property
+    def data(self):
+        """All events, as a structured numpy array."""
+        if self._data is None:
+            self.pack()
+
+            if len(self._chunks) == 0:
+                self._data = np.zeros(0, dtype=EVENT_DTYPE)
+            elif len(self._chunks) == 1:
+                self._data = self._chunks[0]
+            else:
+                self._data = np.concatenate(self._chunks)
+                self._chunks = [self._data]
+
+        return self._data
+
+    def __len__(self):
+        return sum(len(c) for c in self._chunks) + len(self._pending)
+
+    def sort(self):
+        """Sorts events by timestamp, keeping the order of events with equal timestamps."""
+        data = self.data
+        order = np.argsort(data["timestamp"], kind="stable")
+
+        self._data = data[order]
+        self._chunks = [self._data]
+        self.version += 1
+
+    def kind_mask(self, kinds):
+        """Boolean mask of events of the given kinds."""
+        return np.isin(self.data["kind"], kinds)
+
+    @property
+    def heal_mask(self):
+        return self.kind_mask(HEAL_KINDS)
+
+    @property
+    def direct_mask(self):
+        return self.data["kind"] == DIRECT_HEAL
+
+    @property
+    def periodic_mask(self):
+        return self.data["kind"] == PERIODIC_HEAL
+
+    @property
+    def damage_mask(self):
+        return self.data["kind"] == DAMAGE
+
+    @property
+    def crit_mask(self):
+        return self.data["crit"]
+
+    def code(self, value):
+        """Code of an interned value, to compare against the interned columns."""
+        return self.strings.code(value)
+
+    def decode(self, codes):
+        """Converts an array of codes back into their values."""
+        values = self.strings.values
+        return [values[c] for c in codes.tolist()]
+
+    def extend(self, data, values):
+        """
+        Add events from another table.
+
+        :param data: structured array of events
+        :param values: the interned values the codes in data refer to
+        """
+        if len(data) == 0:
+            return
+
+        data = np.array(data, dtype=EVENT_DTYPE)
+
+        # translate codes into codes of this table
+        codes = np.array([self.strings.intern(v) for v in values], dtype="i4")
+        for column in INTERNED:
+            data[column] = codes[data[column]]
+
+        self.pack()
+        self._chunks.append(data)
+        self._data = None
+        self.version += 1
+
+    def view(self, kinds=ALL_KINDS):
+        """Lazy sequence of named tuple events of the given kinds."""
+        return EventView(self, kinds)
+
+
+class EventView(Sequence):
+    """
+    Sequence of events of some kinds from an event table.
+
+    Events are created as HealEvent or DamageTakenEvent named tuples when accessed.
+    """
+
+    def __init__(self, table, kinds):
+        self.table = table
+        self.kinds = tuple(kinds)
+
+        self._indices = None
+        self._version = None
+
+    @property
+    def indices(self):
+        """Indices of the events in the table."""
+        if self._version != self.table.version:
+            self._indices = np.flatnonzero(self.table.kind_mask(self.kinds))
+            self._version = self.table.version
+
+        return self._indices
+
+    @property
+    def data(self):
+        """Events in the view, as a structured numpy array."""
+        return self.table.data[self.indices]
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self._events(self.table.data[self.indices[i]]))
+
+        index = self.indices[i]
+        return next(self._events(self.table.data[index : index + 1]))
+
+    def __iter__(self):
+        data = self.table.data
+        indices = self.indices
+
+        chunk_size = self.table.chunk_size
+        for i in range(0, len(indices), chunk_size):
+            yield from self._events(data[indices[i : i + chunk_size]])
+
+    def _events(self, data):
+        table = self.table
+        values = table.strings.values
+        time_view = table.time_view
+
+        timestamps = data["timestamp"].tolist()
+        if time_view is not None:
+            timestamps = map(time_view, timestamps)
+
+        interned = [[values[c] for c in data[column].tolist()] for column in INTERNED]
+        health_pcts = [None if h == NO_HEALTH else h for h in data["health_pct"].tolist()]
+
+        columns = zip(
+            data["kind"].tolist(),
+            timestamps,
+            *interned,
+            health_pcts,
+            data["amount"].tolist(),
+            data["over"].tolist(),
+            data["overkill"].tolist(),
+            data["crit"].tolist(),
+        )
+
+        for kind, timestamp, *fields, amount, over, overkill, crit in columns:
+            if kind == DAMAGE:
+                yield DamageTakenEvent(timestamp, *fields, amount, over, overkill)
+            else:
+                yield HealEvent(timestamp, *fields, amount, over, crit)
+
+    def __eq__(self, other):
+        if not isinstance(other, (Sequence, list)):
+            return NotImplemented
+
+        return list(self) == list(other)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return f"EventView({len(self)} events)"
+
+    def group_by_spell(self, ignore_crit=False, spell_id=None):
+        """
+        Groups heals by spell id, using the table columns directly.
+
+        :param ignore_crit: if true, filters out crits
+        :param spell_id: spell id to filter for
+        :returns a dictionary by spell id, in order of first appearance, with arrays of (heal, overheal, is_crit)
+        """
+        data = self.data
+
+        if ignore_crit:
+            data = data[~data["crit"]]
+
+        if spell_id:
+            data = data[data["spell_id"] == self.table.code(spell_id)]
+
+        # stable sort by spell id, keeping events of each spell in order
+        order = np.argsort(data["spell_id"], kind="stable")
+        data = data[order]
+
+        codes, first = np.unique(data["spell_id"], return_index=True)
+        bounds = np.append(first, len(data))
+        values = self.table.strings.values
+
+        groups = []
+        for code, i_start, i_end in zip(codes.tolist(), bounds[:-1].tolist(), bounds[1:].tolist()):
+            spell_data = data[i_start:i_end]
+            groups.append((order[i_start], code, (spell_data["amount"], spell_data["over"], spell_data["crit"])))
+
+        # in order of first appearance
+        groups.sort(key=lambda g: g[0])
+        return {values[code]: columns for _, code, columns in groups}
@@ -0,0 +1,112 @@
+"""
+Persistent cache of the parsed events of a raw combat log.
+
+The events are saved as a `.npy` file of the event table next to the log, along with a small JSON file holding the
+interned names and ids and the key of the log the cache was made from. On later runs the events are loaded with memory
+mapping instead of parsing the log again.
+
+A cache is used if the log has the same size and modification time as when it was saved, or failing that, the same
+content hash. It is rebuilt whenever the parser version changes.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from .event_table import EventTable, EVENT_DTYPE
+
+# bump whenever the parsing of events changes
+CACHE_VERSION = 1
+
+DATA_SUFFIX = ".events.npy"
+META_SUFFIX = ".events.json"
+
+
+def cache_paths(log_file):
+    """Paths of the data and meta files of the cache belonging to a log."""
+    return log_file + DATA_SUFFIX, log_file + META_SUFFIX
+
+
+def file_hash(log_file, block_size=1 << 20):
+    """Content hash of a file."""
+    h = hashlib.blake2b(digest_size=20)
+
+    with open(log_file, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def save_cache(log_file, table):
+    """
+    Save the events parsed from a log. Fails silently if the cache cannot be written.
+
+    :param log_file: path to the log file
+    :param table: EventTable of all events in the log
+    """
+    data_path, meta_path = cache_paths(log_file)
+
+    stat = os.stat(log_file)
+    meta = dict(
+        version=CACHE_VERSION,
+        size=stat.st_size,
+        mtime=stat.st_mtime_ns,
+        hash=file_hash(log_file),
+        strings=table.strings.values,
+    )
+
+    # files are written under temporary names and moved into place, so other processes never see half written files
+    try:
+        # np.save adds .npy to names without it
+        tmp_data = f"{data_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_data, table.data)
+        os.replace(tmp_data, data_path)
+
+        # meta is written last, as it marks the cache as valid
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as fp:
+            json.dump(meta, fp)
+        os.replace(tmp_meta, meta_path)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def load_cache(log_file):
+    """
+    Load the cached events of a log.
+
+    :param log_file: path to the log file
+    :returns EventTable with memory mapped events, or None if there is no up to date cache
+    """
+    data_path, meta_path = cache_paths(log_file)
+
+    try:
+        with open(meta_path, encoding="utf-8") as fp:
+            meta = json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != CACHE_VERSION:
+        return None
+
+    stat = os.stat(log_file)
+    if meta.get("size") != stat.st_size:
+        return None
+
+    if meta.get("mtime") != stat.st_mtime_ns and meta.get("hash") != file_hash(log_file):
+        return None
+
+    try:
+        data = np.load(data_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    if data.dtype != EVENT_DTYPE:
+        return None
+
+    return EventTable.from_data(data, meta["strings"])
+
@@ -0,0 +1,152 @@
+"""
+Following a raw combat log while the client is still writing it.
+
+The follower remembers the byte offset up to which it has read the log, and on every poll only looks at the complete
+lines added after it. Events are parsed as soon as they are written, but only inside encounters, so when the
+ENCOUNTER_END line shows up the encounter is ready to analyse straight away, without reading any earlier part of the
+log again.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import time
+
+from . import log_index
+from .processor import Encounter
+from .scanner import scan_events
+from ..utils import get_time_stamp
+
+# bytes to read at a time when looking back for the end of the last complete line
+_BLOCK_SIZE = 1 << 16
+
+
+def _complete_end(log_file, start, size):
+    """Byte offset just after the last complete line between start and size, or start if there is no complete line."""
+    with open(log_file, "rb") as fh:
+        end = size
+        while end > start:
+            block_start = max(start, end - _BLOCK_SIZE)
+            fh.seek(block_start)
+            i = fh.read(end - block_start).rfind(b"\n")
+
+            if i >= 0:
+                return block_start + i + 1
+
+            end = block_start
+
+    return start
+
+
+class LogFollower:
+    """Follows a raw combat log as it grows, processing each encounter as it is written."""
+
+    def __init__(self, log_file, from_start=False, **kwargs):
+        """
+        :param log_file: path to the log file
+        :param from_start: if true, encounters already in the log are processed too, otherwise only encounters ending
+            after the follower is made are, including one in progress.
+        :param kwargs: options for the RawProcessor of each encounter, e.g. character_name or include_damage
+        """
+        self.log_file = log_file
+        self.options = kwargs
+
+        # byte offset of the first line not read yet
+        self.offset = 0
+
+        # (offset, start_time, boss) and processor of the encounter in progress
+        self._start = None
+        self._processor = None
+
+        if not from_start:
+            self._skip_to_end()
+
+    def _skip_to_end(self):
+        """Move to the end of the log, keeping the last encounter if it is still in progress."""
+        end = _complete_end(self.log_file, 0, os.path.getsize(self.log_file))
+
+        last = None
+        for last in scan_events(self.log_file, log_index.ENCOUNTER_EVENTS, 0, end):
+            pass
+
+        if last is not None and last[1] == "ENCOUNTER_START":
+            # parse the encounter in progress from its start
+            self.offset = last[0]
+        else:
+            self.offset = end
+
+    def _start_encounter(self, offset, line):
+        from .read_from_raw import RawProcessor
+
+        start_time, boss = log_index.parse_encounter_line(line)
+
+        self._start = (offset, start_time, boss)
+        self._processor = RawProcessor(
+            self.log_file,
+            normalise_time=get_time_stamp(start_time),
+            use_index=False,
+            use_cache=False,
+            jobs=1,
+            **self.options,
+        )
+
+    def _end_encounter(self, offset, line):
+        start, start_time, boss = self._start
+        end_time, _ = log_index.parse_encounter_line(line)
+
+        encounter = Encounter(boss, start, offset, get_time_stamp(start_time), get_time_stamp(end_time))
+        processor = self._processor
+
+        self._start = None
+        self._processor = None
+
+        return encounter, processor
+
+    def poll(self):
+        """
+        Process the complete lines added to the log since the last poll.
+
+        :returns list of (encounter, processor) of the encounters that ended in the new lines. Each processor holds the
+            events of its encounter, the same as after processing the encounter from the finished log.
+        """
+        size = os.path.getsize(self.log_file)
+
+        if size < self.offset:
+            # the log was cleared or replaced, start over
+            self.offset = 0
+            self._start = None
+            self._processor = None
+
+        end = _complete_end(self.log_file, self.offset, size)
+        if end == self.offset:
+            return []
+
+        finished = []
+        position = self.offset
+
+        for offset, event_type, line in scan_events(self.log_file, log_index.ENCOUNTER_EVENTS, self.offset, end):
+            if event_type == "ENCOUNTER_START":
+                self._start_encounter(offset, line)
+                position = offset
+
+            elif self._start is not None:
+                self._processor.process(position, offset)
+                finished.append(self._end_encounter(offset, line))
+
+        if self._processor is not None:
+            # parse the encounter in progress so far, so it is ready as soon as it ends
+            self._processor.process(position, end)
+
+        self.offset = end
+
+        return finished
+
+    def follow(self, poll_interval=0.5):
+        """
+        Follow the log until interrupted.
+
+        :param poll_interval: seconds to wait between polls of the log
+        :returns generator of (encounter, processor), as each encounter ends
+        """
+        while True:
+            yield from self.poll()
+            time.sleep(poll_interval)
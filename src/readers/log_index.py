@@ -0,0 +1,159 @@
+"""
+Byte offset index of the encounters in a raw combat log.
+
+The index is saved in a small sidecar file next to the log, and is rebuilt whenever the size or modification time of
+the log changes. This lets an encounter be read straight from the log with a `seek()`, without scanning all lines
+before it.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import json
+
+from .scanner import scan_events
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx.json"
+
+ENCOUNTER_EVENTS = ("ENCOUNTER_START", "ENCOUNTER_END")
+
+
+class IndexEntry:
+    """Location of a single encounter in the log."""
+
+    def __init__(self, boss, start, end, start_time, end_time):
+        """
+        :param boss: the boss name
+        :param start: byte offset of the ENCOUNTER_START line
+        :param end: byte offset of the ENCOUNTER_END line
+        :param start_time: raw timestamp text of the ENCOUNTER_START line
+        :param end_time: raw timestamp text of the ENCOUNTER_END line
+        """
+        self.boss = boss
+        self.start = start
+        self.end = end
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def to_dict(self):
+        return dict(boss=self.boss, start=self.start, end=self.end, start_time=self.start_time, end_time=self.end_time)
+
+
+def index_path(log_file):
+    """Path of the index file belonging to a log."""
+    return log_file + INDEX_SUFFIX
+
+
+def _file_key(log_file):
+    stat = os.stat(log_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def parse_encounter_line(line):
+    """Raw timestamp text and boss name of an ENCOUNTER_START or ENCOUNTER_END line."""
+    line_parts = line.split(",")
+    timestamp = line_parts[0].split("  ")[0]
+    boss = line_parts[2].strip('"')
+
+    return timestamp, boss
+
+
+def build_index(log_file):
+    """
+    Scan a log for encounters.
+
+    :param log_file: path to the log file
+    :returns a list of IndexEntry, in log order
+    """
+    return pair_encounters(scan_events(log_file, ENCOUNTER_EVENTS))
+
+
+def pair_encounters(encounter_lines):
+    """
+    Pair up encounter start and end lines into encounters.
+
+    :param encounter_lines: iterable of (offset, event_type, line) of the ENCOUNTER_START and ENCOUNTER_END lines, in
+        log order, e.g. from scanning the log, or from scanning pieces of it one after the other
+    :returns a list of IndexEntry, in log order
+    """
+    entries = []
+    encounter_boss = None
+    start = 0
+    start_time = None
+
+    for offset, event_type, line in encounter_lines:
+        if event_type == "ENCOUNTER_START":
+            start_time, encounter_boss = parse_encounter_line(line)
+            start = offset
+
+        else:
+            end_time, boss = parse_encounter_line(line)
+
+            if boss != encounter_boss:
+                raise ValueError(f"Non-matching encounter end {encounter_boss} != {boss}")
+
+            entries.append(IndexEntry(boss, start, offset, start_time, end_time))
+
+    return entries
+
+
+def save_index(log_file, entries, path=None):
+    """
+    Save an encounter index for a log. Fails silently if the index cannot be written.
+
+    :param log_file: path to the log file
+    :param entries: list of IndexEntry
+    :param path: path of the index file, defaults to a file next to the log
+    """
+    if path is None:
+        path = index_path(log_file)
+
+    size, mtime = _file_key(log_file)
+    data = dict(version=INDEX_VERSION, size=size, mtime=mtime, encounters=[e.to_dict() for e in entries])
+
+    try:
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp)
+    except OSError:
+        pass
+
+
+def load_index(log_file, path=None):
+    """
+    Load the encounter index for a log.
+
+    :param log_file: path to the log file
+    :param path: path of the index file, defaults to a file next to the log
+    :returns a list of IndexEntry, or None if there is no up to date index
+    """
+    if path is None:
+        path = index_path(log_file)
+
+    try:
+        with open(path, encoding="utf-8") as fp:
+            data = json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+    size, mtime = _file_key(log_file)
+    if data.get("version") != INDEX_VERSION or data.get("size") != size or data.get("mtime") != mtime:
+        return None
+
+    return [IndexEntry(**e) for e in data["encounters"]]
+
+
+def get_index(log_file, path=None):
+    """
+    Get the encounter index for a log, building and saving it if needed.
+
+    :param log_file: path to the log file
+    :param path: path of the index file, defaults to a file next to the log
+    :returns a list of IndexEntry, in log order
+    """
+    entries = load_index(log_file, path=path)
+
+    if entries is None:
+        entries = build_index(log_file)
+        save_index(log_file, entries, path=path)
+
+    return entries
@@ -0,0 +1,116 @@
+"""
+Parsing a single raw combat log over several processes.
+
+The log is split into byte ranges starting at line boundaries, and each range is parsed in a worker process into the
+columnar event format, with absolute timestamps. The event tables of the ranges are merged in log order, which is the
+timestamp order of the log, translating the interned names and ids of each range into those of the merged table. This
+gives the same events as parsing the log in one go.
+
+Encounters can start in one range and end in another, so each worker also returns the encounter start and end lines of
+its range, and these are paired up into encounters only after merging.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+
+from ..jobs import run_jobs
+from . import log_index
+from .scanner import scan_events
+
+# ranges per process, so a range dense in events doesn't hold up the others
+CHUNKS_PER_JOB = 4
+
+# smallest range worth parsing in a process of its own, smaller logs are parsed without starting any workers
+MIN_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def chunk_ranges(log_file, n_chunks, start=None, end=None):
+    """
+    Split a byte range of a log into ranges of about the same size, each starting at the start of a line.
+
+    :param log_file: path to the log file
+    :param n_chunks: number of ranges to split into, fewer are returned if lines are longer than the ranges
+    :param start: byte offset of the start of the range to split, should be the start of a line
+    :param end: byte offset of the end of the range to split (exclusive), or None for the end of the log
+    :returns list of (start, end) byte offsets
+    """
+    size = os.path.getsize(log_file)
+    start = 0 if start is None else start
+    end = size if end is None else min(end, size)
+
+    bounds = [start]
+    with open(log_file, "rb") as fh:
+        for i in range(1, n_chunks):
+            offset = start + (end - start) * i // n_chunks
+            if offset <= bounds[-1]:
+                continue
+
+            # move forward to the start of the next line, the offset itself if the previous byte ends a line
+            fh.seek(offset - 1)
+            fh.readline()
+            offset = fh.tell()
+
+            if bounds[-1] < offset < end:
+                bounds.append(offset)
+
+    bounds.append(end)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_chunk(log_file, start, end, include_damage=True):
+    """
+    Parse the events in a byte range of a log.
+
+    :returns (data, values, encounter_lines), the structured array of events, the interned values its codes refer to and
+        the (offset, event_type, line) of the encounter start and end lines in the range
+    """
+    from .read_from_raw import RawProcessor
+
+    processor = RawProcessor(log_file, include_damage=include_damage, use_index=False, use_cache=False, jobs=1)
+    processor.process_lines(start, end)
+
+    encounter_lines = list(scan_events(log_file, log_index.ENCOUNTER_EVENTS, start, end))
+    table = processor.events
+
+    return table.data, table.strings.values, encounter_lines
+
+
+def parse_log(log_file, jobs=0, start=None, end=None, include_damage=True, min_chunk_size=None):
+    """
+    Parse the events of a log over several processes.
+
+    :param log_file: path to the log file
+    :param jobs: number of processes to use, 0 for one per core
+    :param start: byte offset to start parsing from, should be the start of a line
+    :param end: byte offset to stop parsing at (exclusive), or None for the rest of the log
+    :param include_damage: if true, damage taken events are parsed as well as heals, deaths and resurrections
+    :param min_chunk_size: size in bytes of the smallest range to give a process, defaults to `MIN_CHUNK_SIZE`
+    :returns (table, entries), the EventTable of events with absolute timestamps, in log order, and a list of
+        IndexEntry of the encounters in the parsed range
+    """
+    from .event_table import EventTable
+
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+
+    if min_chunk_size is None:
+        min_chunk_size = MIN_CHUNK_SIZE
+
+    size = (os.path.getsize(log_file) if end is None else end) - (start or 0)
+    n_chunks = max(1, min(jobs * CHUNKS_PER_JOB, size // min_chunk_size))
+
+    tasks = [(log_file, s, e, include_damage) for s, e in chunk_ranges(log_file, n_chunks, start, end)]
+    results = run_jobs(parse_chunk, tasks, jobs, initializer=None)
+
+    table = EventTable()
+    encounter_lines = []
+    for data, values, lines in results:
+        table.extend(data, values)
+        encounter_lines.extend(lines)
+
+    # encounters cut off by the start of the range can't be paired up, so are left out, same as those cut off by its end
+    while encounter_lines and encounter_lines[0][1] == "ENCOUNTER_END":
+        del encounter_lines[0]
+
+    return table, log_index.pair_encounters(encounter_lines)
@@ -5,6 +5,8 @@ By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
 from abc import ABC, abstractmethod
 
+from .event_table import EventTable, ALL_KINDS, HEAL_KINDS, DIRECT_HEAL, PERIODIC_HEAL, DAMAGE
+
 
 class Encounter:
     """Class containing encounter data."""
@@ -13,8 +15,8 @@ class Encounter:
         """
         Creates a new encounter object to start and end data in
         :param boss: the boss name
-        :param start: the start marker (line number or timestamp)
-        :param end: the end marker (line number or timestamp)
+        :param start: the start marker (byte offset or timestamp)
+        :param end: the end marker (byte offset or timestamp)
         :param start_t: the timestamp of the start of the encounter
         :param end_t: the timestamp of the end of the encounter
         """
@@ -54,11 +56,7 @@ class AbstractProcessor(ABC):
         self.source = source
         self.character_name = character_name
 
-        self.all_events = []  # heals + damage
-        self.heals = []  # direct heals + periodic heals
-        self.direct_heals = []
-        self.periodic_heals = []
-        self.damage = []
+        self.events = EventTable()
 
         self.resurrections = []
         self.deaths = []
@@ -66,6 +64,28 @@ class AbstractProcessor(ABC):
         self.all_encounter = None
         self._encounters = None
 
+    @property
+    def all_events(self):
+        """Heals + damage"""
+        return self.events.view(ALL_KINDS)
+
+    @property
+    def heals(self):
+        """Direct heals + periodic heals + absorbs"""
+        return self.events.view(HEAL_KINDS)
+
+    @property
+    def direct_heals(self):
+        return self.events.view((DIRECT_HEAL,))
+
+    @property
+    def periodic_heals(self):
+        return self.events.view((PERIODIC_HEAL,))
+
+    @property
+    def damage(self):
+        return self.events.view((DAMAGE,))
+
     @property
     def encounters(self):
         if self._encounters is None:
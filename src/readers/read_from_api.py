@@ -4,53 +4,79 @@ Read data from WCL API.
 By: Filip Gokstorp (Saintis), 2020
 """
 import os
-import requests
-from json.decoder import JSONDecodeError
+import time
+import functools
 from datetime import datetime
 
 from .event_types import HealEvent, DamageTakenEvent
 from .processor import AbstractProcessor, Encounter
+from .event_table import DIRECT_HEAL, PERIODIC_HEAL, ABSORB, DAMAGE
+from .api_paging import fight_ranges, fetch_streams, MAX_CONCURRENCY
+from .api_client import APIClient, APIError
+from .response_cache import ResponseCache
 
 from ..utils import ProgressBar
 
 
-# First try environment key
-API_KEY = os.environ.get("WCL_API_KEY", None)
-if API_KEY is None:
-    # Otherwise try to read from file
+API_ROOT = "https://classic.warcraftlogs.com:443/v1"
+
+# reports ending less than this long ago, in ms, may still be logged or uploaded, so their responses aren't cached
+LIVE_REPORT_MS = 60 * 60 * 1000
+
+
+# clients by cache mode
+_clients = dict()
+
+
+def get_api_key():
+    """
+    Reads the WCL API key, from the WCL_API_KEY environment variable, or otherwise the `apikey.txt` file.
+
+    :raises APIError: if no API key is found
+    """
+    api_key = os.environ.get("WCL_API_KEY", None)
+    if api_key is not None:
+        return api_key
+
     try:
-        API_KEY = open("apikey.txt", "r").read().strip()
+        with open("apikey.txt", "r") as fp:
+            return fp.read().strip()
     except FileNotFoundError:
-        print("API key not found. Please save in a plain text file called `apikey.txt`.")
-        exit(100)
+        message = "API key not found. Please save in a plain text file called `apikey.txt`."
+        raise APIError(message, exit_code=100) from None
 
 
-API_ROOT = "https://classic.warcraftlogs.com:443/v1"
+def _exit_on_api_error(f):
+    """Print the message of an APIError and exit with its code, instead of a traceback."""
 
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        except APIError as ex:
+            print(ex)
+            exit(ex.exit_code)
 
-def _get_api_request(url, **params):
+    return wrapper
+
+
+@_exit_on_api_error
+def get_client(cache_mode="use"):
     """
-    Get an API request and check status code.
+    Client shared by all processors with the same cache mode, so they share connections. Exits if there is no API key.
 
-    :param url: full url with request details to use.
+    :param cache_mode: how the client uses the cache of responses, one of `response_cache.CACHE_MODES`
     """
-    req = requests.get(url, params=dict(api_key=API_KEY, **params))
+    if cache_mode not in _clients:
+        # checked once, up front, rather than on the first request in a paging worker
+        _clients[cache_mode] = APIClient(api_key=get_api_key(), cache=ResponseCache(), cache_mode=cache_mode)
 
-    if not req.status_code == 200:
-        print("Error getting API request:", req.url)
-        print("Status code:", req.status_code)
-        print("Error:", req.text)
-        exit(200)
+    return _clients[cache_mode]
 
-    data = None
-    try:
-        data = req.json()
-    except JSONDecodeError:
-        print("WarcraftLogs did not return proper JSON, it is likely down for maintenance.")
-        print("Request response:", req.text)
-        exit(300)
 
-    return data
+def _is_finished(fight_data):
+    """If a report has finished, from its fight data, so its responses never change and can be cached."""
+    return fight_data["end"] < time.time() * 1000 - LIVE_REPORT_MS
 
 
 def _get_time(t):
@@ -58,13 +84,42 @@ def _get_time(t):
     return datetime.fromtimestamp(t / 1000)
 
 
+def _get_ms(timestamp):
+    """Convert datetime object back into WCL time count"""
+    return round(timestamp.timestamp() * 1000)
+
+
 class APIProcessor(AbstractProcessor):
     """Processes WCL API for data."""
 
-    def __init__(self, source, character_name=None):
+    def __init__(
+        self,
+        source,
+        character_name=None,
+        api_root=API_ROOT,
+        max_concurrency=MAX_CONCURRENCY,
+        client=None,
+        boss_only=True,
+        include_damage=False,
+        cache_mode="use",
+    ):
+        """
+        :param character_name: Character name to filter for, the filter is sent along with the requests to WCL.
+        :param api_root: root url of the WCL API.
+        :param max_concurrency: maximum number of requests to WCL in flight at once.
+        :param client: APIClient to make requests with, defaults to a client shared by all processors.
+        :param boss_only: only fetch events during boss fights, leaving out trash and the time between fights.
+        :param include_damage: if true, damage taken is fetched along with the heals, as for `process(damage_taken=True)`.
+        :param cache_mode: how the shared client uses the cache of responses, one of `response_cache.CACHE_MODES`.
+        """
         super().__init__(source, character_name)
 
         self.code = source
+        self.api_root = api_root
+        self.max_concurrency = max_concurrency
+        self.client = get_client(cache_mode) if client is None else client
+        self.boss_only = boss_only
+        self.include_damage = include_damage
         self._player_names = None
         self._fight_data = None
 
@@ -75,11 +130,12 @@ class APIProcessor(AbstractProcessor):
 
         return self._player_names
 
+    @_exit_on_api_error
     def get_fights(self):
         if self._fight_data is None:
             print(f"Fetching fight data for report {self.code}...", end="\r")
-            url = f"{API_ROOT}/report/fights/{self.code}"
-            self._fight_data = _get_api_request(url)
+            url = f"{self.api_root}/report/fights/{self.code}"
+            self._fight_data = self.client.get(url, cacheable=_is_finished)
             print(f"Fetching fight data for report {self.code}... Done.")
 
         return self._fight_data
@@ -99,203 +155,262 @@ class APIProcessor(AbstractProcessor):
         self._player_names = player_names
         print("Extracting player names... Done.")
 
-    def get_heals(self, start=None, end=None, encounter=None):
-        """Gets all heals for the log"""
-        code = self.source
-        for_player = self.character_name
-        names = self.player_names
+    def get_actor_id(self):
+        """Actor id of the character to filter for, or None if not filtering or the character isn't in the report."""
+        if self.character_name is None:
+            return None
 
-        if start is None:
-            start = 0
+        for player_id, player_name in self.player_names.items():
+            if player_name == self.character_name:
+                return player_id
 
-        if end is None:
-            fight_data = self.get_fights()
-            end = fight_data["end"] - fight_data["start"]
+        return None
 
-        if names is None:
-            names = dict()
+    def get_filters(self, spell_id=None):
+        """
+        Request parameters filtering events on the WCL side, so only the events needed are sent.
 
-        heals = []
-        periodics = []
-        absorbs = []
+        For healing events the character is the source, for damage-taken events WCL matches the same parameter on
+        the target.
 
-        next_start = start
+        :param spell_id: optional spell id to only get events of
+        :returns dict of request parameters
+        """
+        params = dict()
 
-        print("Fetching healing events from WCL...")
-        progress_bar = ProgressBar(end - start, length=70)
+        actor_id = self.get_actor_id()
+        if actor_id is not None:
+            params["sourceid"] = actor_id
 
-        # will have to loop to get results
-        request_more = True
-        while request_more:
-            url = f"{API_ROOT}/report/events/healing/{code}"
+        if spell_id is not None:
+            params["abilityid"] = spell_id
 
-            print(progress_bar.render(next_start - start), end="\r")
+        return params
 
-            data = _get_api_request(url, start=next_start, end=end)
-            events = data["events"]
-            if "nextPageTimestamp" in data:
-                next_start = data["nextPageTimestamp"]
-            else:
-                request_more = False
+    def get_window(self, start=None, end=None):
+        """Time window to get events for, defaulting to the whole report."""
+        if start is None:
+            start = 0
 
-            for e in events:
-                try:
-                    timestamp = _get_time(e["timestamp"])
-                    spell_id = str(e["ability"]["guid"])
+        if end is None:
+            fight_data = self.get_fights()
+            end = fight_data["end"] - fight_data["start"]
 
-                    if "sourceID" not in e:
-                        # heal not from a player, skipping
-                        continue
+        return start, end
 
-                    source_id = e["sourceID"]
-                    source = names.get(source_id, f"[pid {source_id}]")
+    @_exit_on_api_error
+    def fetch_events(self, streams, start, end, stream_params=None):
+        """
+        Fetch all events of the given event streams, with the fights and streams fetched concurrently.
 
-                    if for_player and source != for_player:
-                        continue
+        :param streams: list of WCL event stream names, e.g. ("healing", "damage-taken")
+        :param start: the start time, in milliseconds
+        :param end: the end time, in milliseconds
+        :param stream_params: optional list of dicts of request parameters, one per stream, e.g. from `get_filters`
+        :returns list of WCL event lists, one per stream
+        """
+        urls = [f"{self.api_root}/report/events/{stream}/{self.code}" for stream in streams]
 
-                    target_id = e["targetID"]
-                    target = names.get(target_id, f"[pid {target_id}]")
-                    health_pct = e.get("hitPoints", None)
-                    # event_type = e["type"]
+        fight_data = self.get_fights()
+        finished = _is_finished(fight_data)
 
-                    amount = e["amount"]
+        fights = fight_data["fights"]
+        if self.boss_only:
+            fights = [f for f in fights if f["boss"] != 0]
 
-                    if e["type"] == "absorbed":
-                        # Shield absorb
-                        event = HealEvent(
-                            timestamp, source, source_id, spell_id, target, target_id, health_pct, amount, 0, False
-                        )
-                        absorbs.append(event)
-                        continue
+        ranges = fight_ranges(fights, start, end, gaps=not self.boss_only)
+        duration = sum(e - s for s, e in ranges)
 
-                    overheal = e.get("overheal", 0)
-
-                    if e.get("tick"):
-                        # Periodic tick
-                        event = HealEvent(
-                            timestamp,
-                            source,
-                            source_id,
-                            spell_id,
-                            target,
-                            target_id,
-                            health_pct,
-                            amount + overheal,
-                            overheal,
-                            False,
-                        )
-                        periodics.append(event)
-                        continue
+        progress_bar = ProgressBar(max(1, len(urls) * duration), length=70)
+        progress = 0
 
-                    is_crit = e.get("hitType", 1) == 2
+        def on_page(_, done):
+            nonlocal progress
+            progress += done
+            print(progress_bar.render(progress), end="\r")
 
-                    event = HealEvent(
-                        timestamp,
-                        source,
-                        source_id,
-                        spell_id,
-                        target,
-                        target_id,
-                        health_pct,
-                        amount + overheal,
-                        overheal,
-                        is_crit,
-                    )
-                    heals.append(event)
-                except Exception as ex:
-                    print("Exception while handling line", e)
-                    print(ex)
+        get = functools.partial(self.client.get, cacheable=lambda _: finished)
+        events = fetch_streams(get, urls, ranges, self.max_concurrency, on_page, stream_params)
+        print(progress_bar.render(progress_bar.end))
 
-        print(progress_bar.render(end - start))
+        return events
 
-        return heals, periodics, absorbs
+    def get_heals(self, start=None, end=None, encounter=None, spell_id=None):
+        """Gets all heals for the log"""
+        start, end = self.get_window(start, end)
 
-    def get_damage(self, start=None, end=None):
-        """Gets all heals and damage events for the log"""
+        print("Fetching healing events from WCL...")
+        (events,) = self.fetch_events(("healing",), start, end, [self.get_filters(spell_id)])
 
-        if start is None:
-            start = 0
+        return self.heal_events(events)
 
-        if end is None:
-            end = start + 3 * 60 * 60 * 1000  # look at up to 3h of data
+    def get_damage(self, start=None, end=None):
+        """Gets all damage-taken events for the log"""
+        start, end = self.get_window(start, end)
 
-        names = self.player_names
+        print("Fetching damage-taken events from WCL...")
+        (events,) = self.fetch_events(("damage-taken",), start, end, [self.get_filters()])
 
-        damage = []
+        return self.damage_events(events)
 
-        next_start = start
+    def get_heals_and_damage(self, start=None, end=None, spell_id=None):
+        """Gets all heals and damage-taken events for the log, fetching both at the same time"""
+        start, end = self.get_window(start, end)
 
-        print("Fetching damage-taken events from WCL...")
-        progress_bar = ProgressBar(end - start, length=70)
+        print("Fetching healing and damage-taken events from WCL...")
+        stream_params = [self.get_filters(spell_id), self.get_filters()]
+        heal_events, damage_events = self.fetch_events(("healing", "damage-taken"), start, end, stream_params)
 
-        # will have to loop to get results
-        request_more = True
-        while request_more:
-            url = f"{API_ROOT}/report/events/damage-taken/{self.code}"
+        return self.heal_events(heal_events), self.damage_events(damage_events)
 
-            print(progress_bar.render(next_start - start), end="\r")
+    def heal_events(self, events):
+        """
+        Converts WCL healing events.
 
-            data = _get_api_request(url, start=next_start, end=end)
-            events = data["events"]
-            if "nextPageTimestamp" in data:
-                next_start = data["nextPageTimestamp"]
-            else:
-                request_more = False
+        :returns (heals, periodic_heals, absorbs), lists of heal events
+        """
+        for_player = self.character_name
+        names = self.player_names
 
-            for e in events:
-                try:
-                    timestamp = _get_time(e["timestamp"])
-                    # spell_id = str(e["ability"]["guid"])
+        if names is None:
+            names = dict()
 
-                    # if "sourceID" not in e:
-                    #     # heal not from a player, skipping
-                    #     continue
+        heals = []
+        periodics = []
+        absorbs = []
 
-                    target_id = e["targetID"]
-                    target = names.get(target_id, f"[pid {target_id}]")
+        for e in events:
+            try:
+                timestamp = _get_time(e["timestamp"])
+                spell_id = str(e["ability"]["guid"])
 
-                    if self.character_name and target != self.character_name:
-                        continue
+                if "sourceID" not in e:
+                    # heal not from a player, skipping
+                    continue
 
-                    source_id = e.get("sourceID", None)
+                source_id = e["sourceID"]
+                source = names.get(source_id, f"[pid {source_id}]")
 
-                    if source_id is None:
-                        source = None
-                    else:
-                        source = names.get(source_id, f"[pid {source_id}]")
+                if for_player and source != for_player:
+                    continue
 
-                    # target = names.get(target, f"[pid {target}]")
-                    health_pct = e.get("hitPoints", None)
-                    # event_type = e["type"]
+                target_id = e["targetID"]
+                target = names.get(target_id, f"[pid {target_id}]")
+                health_pct = e.get("hitPoints", None)
+                # event_type = e["type"]
 
-                    amount = e["amount"]
-                    mitigated = e.get("mitigated", 0)
-                    overkill = e.get("overkill", -1)
+                amount = e["amount"]
 
-                    # is_crit = e.get("hitType", 1) == 2
+                if e["type"] == "absorbed":
+                    # Shield absorb
+                    event = HealEvent(
+                        timestamp, source, source_id, spell_id, target, target_id, health_pct, amount, 0, False
+                    )
+                    absorbs.append(event)
+                    continue
 
-                    if amount == 0:
-                        # ignore attacks that do no damage
-                        continue
+                overheal = e.get("overheal", 0)
 
-                    event = DamageTakenEvent(
+                if e.get("tick"):
+                    # Periodic tick
+                    event = HealEvent(
                         timestamp,
                         source,
                         source_id,
-                        0,
+                        spell_id,
                         target,
                         target_id,
                         health_pct,
-                        -(amount + mitigated),
-                        -mitigated,
-                        -overkill,
+                        amount + overheal,
+                        overheal,
+                        False,
                     )
-                    damage.append(event)
-                except Exception as ex:
-                    print("Exception while handling line", e)
-                    print(ex)
+                    periodics.append(event)
+                    continue
+
+                is_crit = e.get("hitType", 1) == 2
+
+                event = HealEvent(
+                    timestamp,
+                    source,
+                    source_id,
+                    spell_id,
+                    target,
+                    target_id,
+                    health_pct,
+                    amount + overheal,
+                    overheal,
+                    is_crit,
+                )
+                heals.append(event)
+            except Exception as ex:
+                print("Exception while handling line", e)
+                print(ex)
 
-        print(progress_bar.render(end - start))
+        return heals, periodics, absorbs
+
+    def damage_events(self, events):
+        """
+        Converts WCL damage-taken events.
+
+        :returns list of damage taken events
+        """
+        names = self.player_names
+
+        damage = []
+
+        for e in events:
+            try:
+                timestamp = _get_time(e["timestamp"])
+                # spell_id = str(e["ability"]["guid"])
+
+                # if "sourceID" not in e:
+                #     # heal not from a player, skipping
+                #     continue
+
+                target_id = e["targetID"]
+                target = names.get(target_id, f"[pid {target_id}]")
+
+                if self.character_name and target != self.character_name:
+                    continue
+
+                source_id = e.get("sourceID", None)
+
+                if source_id is None:
+                    source = None
+                else:
+                    source = names.get(source_id, f"[pid {source_id}]")
+
+                # target = names.get(target, f"[pid {target}]")
+                health_pct = e.get("hitPoints", None)
+                # event_type = e["type"]
+
+                amount = e["amount"]
+                mitigated = e.get("mitigated", 0)
+                overkill = e.get("overkill", -1)
+
+                # is_crit = e.get("hitType", 1) == 2
+
+                if amount == 0:
+                    # ignore attacks that do no damage
+                    continue
+
+                event = DamageTakenEvent(
+                    timestamp,
+                    source,
+                    source_id,
+                    0,
+                    target,
+                    target_id,
+                    health_pct,
+                    -(amount + mitigated),
+                    -mitigated,
+                    -overkill,
+                )
+                damage.append(event)
+            except Exception as ex:
+                print("Exception while handling line", e)
+                print(ex)
 
         return damage
 
@@ -328,20 +443,23 @@ class APIProcessor(AbstractProcessor):
             start = encounter.start if start is None else start
             end = encounter.end if end is None else end
 
-        direct_heals, periodics, absorbs = self.get_heals(start, end)
+        if damage_taken or self.include_damage:
+            (direct_heals, periodics, absorbs), damage = self.get_heals_and_damage(start, end)
+        else:
+            direct_heals, periodics, absorbs = self.get_heals(start, end)
+            damage = []
 
-        heals = sorted(direct_heals + periodics + absorbs, key=lambda e: e[0])
+        events = self.events
+        events.time_view = _get_time
 
-        self.heals = heals
-        self.periodic_heals = periodics
-        self.direct_heals = direct_heals
+        for e in damage:
+            events.append_event(DAMAGE, e, _get_ms(e.timestamp))
 
-        if damage_taken:
-            damage = self.get_damage(start, end)
-            all_events = sorted(damage + heals, key=lambda e: e[0])
+        for kind, heals in ((DIRECT_HEAL, direct_heals), (PERIODIC_HEAL, periodics), (ABSORB, absorbs)):
+            for e in heals:
+                events.append_event(kind, e, _get_ms(e.timestamp))
 
-            self.all_events = all_events
-            self.damage = damage
+        events.sort()
 
     def get_deaths(self):
         pass
@@ -374,7 +492,7 @@ class APIProcessor(AbstractProcessor):
 
             print(progress_bar.render(next_start - start), end="\r")
 
-            data = _get_api_request(url, start=next_start, end=end)
+            data = self.client.get(url, start=next_start, end=end)
             events = data["events"]
             if "nextPageTimestamp" in data:
                 next_start = data["nextPageTimestamp"]
@@ -441,53 +559,55 @@ class APIProcessor(AbstractProcessor):
         return damage
 
 
-def get_heals(code, start=None, end=None, character_name=None, **_):
+def get_heals(code, start=None, end=None, character_name=None, cache_mode="use", **_):
     """
     Gets heal events for specified log code.
 
     :param code: the WarcraftLogs code.
     :param start: the start time, in milliseconds, to get heals for.
-    :param end: the end time, in milliseconds, to get heals for. If None, gets logs for up to 3 hours.
+    :param end: the end time, in milliseconds, to get heals for. If None, gets logs up to the end of the report.
     :param character_name: Optional. Name to filter heal events for.
+    :param cache_mode: how to use the cache of responses, one of `response_cache.CACHE_MODES`.
 
     :returns (heals, periodic_heals, absorbs), lists of heal events
     """
-    processor = APIProcessor(code, character_name=character_name)
+    processor = APIProcessor(code, character_name=character_name, cache_mode=cache_mode)
 
     return processor.get_heals(start=start, end=end)
 
 
-def get_damage(code, start=None, end=None, character_name=None, **_):
+def get_damage(code, start=None, end=None, character_name=None, cache_mode="use", **_):
     """
     Gets damage-taken events for specified log code.
 
     :param code: the WarcraftLogs code.
     :param start: the start time, in milliseconds, to get heals for.
-    :param end: the end time, in milliseconds, to get heals for. If None, gets logs for up to 3 hours.
+    :param end: the end time, in milliseconds, to get heals for. If None, gets logs up to the end of the report.
     :param character_name: Optional. Name to filter heal events for.
+    :param cache_mode: how to use the cache of responses, one of `response_cache.CACHE_MODES`.
 
     :returns (heals, periodic_heals, absorbs), lists of heal events
     """
-    processor = APIProcessor(code, character_name=character_name)
+    processor = APIProcessor(code, character_name=character_name, cache_mode=cache_mode)
 
     return processor.get_damage(start=start, end=end)
 
 
-def get_heals_and_damage(code, start=None, end=None, character_name=None, **_):
+def get_heals_and_damage(code, start=None, end=None, character_name=None, cache_mode="use", **_):
     """
     Gets heal and damage-taken events for specified log code.
 
     :param code: the WarcraftLogs code.
     :param start: the start time, in milliseconds, to get heals for.
-    :param end: the end time, in milliseconds, to get heals for. If None, gets logs for up to 3 hours.
+    :param end: the end time, in milliseconds, to get heals for. If None, gets logs up to the end of the report.
     :param character_name: Optional. Name to filter heal events for.
+    :param cache_mode: how to use the cache of responses, one of `response_cache.CACHE_MODES`.
 
     :returns (heals, periodic_heals, absorbs), lists of heal events
     """
-    processor = APIProcessor(code, character_name=character_name)
+    processor = APIProcessor(code, character_name=character_name, cache_mode=cache_mode)
 
-    damage = processor.get_damage(start, end)
-    heals, periodics, _ = processor.get_heals(start, end)
+    (heals, periodics, _), damage = processor.get_heals_and_damage(start, end)
 
     # join damage, heals, periodics and sort by timestamp
     return sorted(damage + heals + periodics, key=lambda e: e[0])
@@ -5,17 +5,52 @@ By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
 import os
 import io
+import collections
 from datetime import datetime, timedelta
 
-from .event_types import HealEvent, DamageTakenEvent
-from .processor import AbstractProcessor, Encounter
+import numpy as np
 
-from ..utils import get_player_name, get_time_stamp
+from .processor import AbstractProcessor, Encounter
+from . import log_index
+from . import scanner
+from . import log_cache
+from . import parallel_parse
+from .log_follower import LogFollower
+from .decoder import EventDecoder
+from .event_table import HEAL_KINDS, DIRECT_HEAL, PERIODIC_HEAL, DAMAGE, DEATH, RESURRECTION
+from ..utils import get_time_stamp, parse_time_ms, ms_to_datetime, ms_to_timedelta, YEAR_START
 
-ENCOUNTER_START = "ENCOUNTER_START"
-ENCOUNTER_END = "ENCOUNTER_END"
 STR_P_TIME = "%m/%d %H:%M:%S.%f"
 
+PROCESS_EVENTS = ("SPELL_HEAL", "SPELL_PERIODIC_HEAL", "UNIT_DIED", "SPELL_RESURRECT")
+DAMAGE_EVENTS = ("SWING_DAMAGE_LANDED", "SPELL_DAMAGE", "SPELL_PERIODIC_DAMAGE")
+CAST_EVENTS = ("SPELL_CAST_START", "SPELL_CAST_SUCCESS", "SPELL_CAST_FAILED", "SPELL_HEAL", "UNIT_DIED")
+
+# fields of cast, heal and death events needed for matching casts with heals
+CAST_DECODER = EventDecoder(("source_id", "source", "target", "spell_id", "gross_amount", "overheal", "failed_type"))
+
+# a heal can be logged just before the success of its cast
+HEAL_CAST_TOLERANCE = timedelta(seconds=0.1)
+
+# fields of heal, damage, death and resurrection events needed for processing, healing of, damage to, and deaths of
+# creatures are skipped before decoding the rest of the line
+DECODER = EventDecoder(
+    (
+        "source_id",
+        "source",
+        "target_id",
+        "target",
+        "spell_id",
+        "health_pct",
+        "amount",
+        "gross_amount",
+        "overheal",
+        "overkill",
+        "critical",
+    ),
+    skip={"target_id": "Creature"},
+)
+
 
 def get_lines(log_file):
     """
@@ -28,19 +63,85 @@ def get_lines(log_file):
         fh = io.open(log_file, encoding="utf-8")
         lines = fh.readlines()
     except FileNotFoundError:
-        print(f"Could not find `{log_file}`!")
-        print(f"Looking in `{os.getcwd()}`, please double check your log file is there.")
-        exit(1)
+        _file_not_found(log_file)
 
     return lines
 
 
+def iter_lines(log_file, start=None, end=None):
+    """
+    Lazily iterate over lines of a WoW Classic combat log.
+
+    Only a small read buffer is kept in memory, so this can be used on logs of any size.
+
+    :param log_file: path to the log file
+    :param start: byte offset of the first line to yield
+    :param end: byte offset to stop at (exclusive), or None to read to the end of the file
+    """
+    try:
+        fh = io.open(log_file, "rb")
+    except FileNotFoundError:
+        _file_not_found(log_file)
+
+    with fh:
+        yield from read_lines(fh, start, end)
+
+
+def read_lines(fh, start=None, end=None):
+    """
+    Iterate over decoded lines of a binary file object, between two byte offsets.
+
+    :param fh: the file object, opened in binary mode
+    :param start: byte offset of the first line to yield
+    :param end: byte offset to stop at (exclusive), or None to read to the end of the file
+    """
+    if start:
+        fh.seek(start)
+
+    position = fh.tell()
+    for raw_line in fh:
+        if end is not None and position >= end:
+            break
+
+        position += len(raw_line)
+        yield decode_line(raw_line)
+
+
+def decode_line(raw_line):
+    """Decodes a raw line, with the same newline handling as reading the log in text mode."""
+    if raw_line.endswith(b"\r\n"):
+        raw_line = raw_line[:-2] + b"\n"
+
+    return raw_line.decode("utf-8")
+
+
+def _file_not_found(log_file):
+    print(f"Could not find `{log_file}`!")
+    print(f"Looking in `{os.getcwd()}`, please double check your log file is there.")
+    exit(1)
+
+
 class RawProcessor(AbstractProcessor):
     """Helper class for processing heal lines"""
 
-    def __init__(self, source, character_name=None, normalise_time=False, include_damage=False):
+    def __init__(
+        self,
+        source,
+        character_name=None,
+        normalise_time=False,
+        include_damage=False,
+        stream=True,
+        use_index=True,
+        use_cache=False,
+        jobs=1,
+    ):
         """
         :param character_name: Character name to filter for.
+        :param stream: if true, lines are read lazily from the log file on each pass instead of being held in memory.
+        :param use_index: if true, encounters are read from (and saved to) an index file next to the log.
+        :param use_cache: if true, parsed events are read from a cache next to the log, which is saved when the whole
+            log is processed.
+        :param jobs: number of processes to parse the log with, 0 for one per core.
         """
         super(RawProcessor, self).__init__(source, character_name)
 
@@ -52,7 +153,61 @@ class RawProcessor(AbstractProcessor):
         else:
             self.normalise_time = normalise_time
 
-        self.log_lines = get_lines(source)
+        self.stream = stream
+        self.use_index = use_index
+        self.use_cache = use_cache
+        self.jobs = jobs
+        self._log_data = None
+        self._log_lines = None
+
+    @property
+    def log_lines(self):
+        """All lines of the log, loaded into memory on first use."""
+        if self._log_lines is None:
+            self._log_lines = get_lines(self.source)
+
+        return self._log_lines
+
+    @property
+    def log_data(self):
+        """Raw bytes of the log, loaded into memory on first use."""
+        if self._log_data is None:
+            try:
+                with io.open(self.source, "rb") as fh:
+                    self._log_data = fh.read()
+            except FileNotFoundError:
+                _file_not_found(self.source)
+
+        return self._log_data
+
+    def lines(self, start=None, end=None):
+        """
+        Iterate over lines of the log.
+
+        :param start: byte offset of the first line to read
+        :param end: byte offset to stop at (exclusive), or None for the rest of the log
+        """
+        if self.stream:
+            return iter_lines(self.source, start, end)
+
+        return read_lines(io.BytesIO(self.log_data), start, end)
+
+    def scan(self, event_types, start=None, end=None):
+        """
+        Iterate over lines of the given event types only.
+
+        :param event_types: list of event types to look for
+        :param start: byte offset of the first line to read
+        :param end: byte offset to stop at (exclusive), or None for the rest of the log
+        :returns generator of (offset, event_type, line)
+        """
+        if self.stream:
+            if not os.path.exists(self.source):
+                _file_not_found(self.source)
+
+            return scanner.scan_events(self.source, event_types, start, end)
+
+        return scanner.scan_buffer(self.log_data, event_types, start, end)
 
     def get_local_timestamp(self, part):
         """Gets local timestamp relative to start of encounter."""
@@ -67,179 +222,287 @@ class RawProcessor(AbstractProcessor):
 
         return timestamp
 
+    def get_local_time_ms(self, part):
+        """Gets local timestamp in integer milliseconds, relative to start of encounter if normalising time."""
+        ms = parse_time_ms(part)
+
+        if self.ref_time is None and self.normalise_time:
+            self.ref_time = get_time_stamp(part)
+
+        if self.ref_time is not None:
+            ms -= (self.ref_time - YEAR_START) // timedelta(milliseconds=1)
+
+        return ms
+
     def process(self, start=None, end=None, encounter=None):
         """
         Process lines from raw log.
 
-        Use start and end to limit log to specific encounters. Start and end are line numbers.
+        Use start and end to limit log to specific encounters. Start and end are byte offsets.
         """
         if isinstance(encounter, Encounter):
             start = encounter.start if start is None else start
             end = encounter.end if end is None else end
             self.ref_time = encounter.start_t
 
-        if start is None:
-            start = 0
-        if end is None:
-            end = -1
+        if self.use_cache:
+            self.process_cached(start, end)
+        else:
+            self.process_log(start, end)
 
-        lines = self.log_lines[start:end]
+        self.finish_processing()
 
-        for line in lines:
-            if "SPELL_HEAL," in line:
-                self.process_heal(line, False)
+    def process_log(self, start=None, end=None):
+        """Parse the events between byte offsets start and end from the log, over several processes if set."""
+        if self.jobs != 1:
+            self.process_parallel(start, end)
+        else:
+            self.process_lines(start, end)
+
+    def finish_processing(self):
+        """Pack the processed events, ready for analysis."""
+        self.events.time_view = ms_to_datetime if self.ref_time is None else ms_to_timedelta
+        self.events.pack()
+
+    def process_events(self):
+        """Event types to process, heals, deaths and resurrections, and damage taken if including damage."""
+        event_types = PROCESS_EVENTS
+        if self.include_damage:
+            event_types += DAMAGE_EVENTS
+
+        return event_types
+
+    def process_lines(self, start=None, end=None):
+        """Parse the events between byte offsets start and end from the log."""
+        handlers = self.handlers()
+        decode = DECODER.decode
+
+        for offset, event_type, line in self.scan(self.process_events(), start, end):
+            record = decode(line)
+            if record is not None:
+                handlers[event_type](record, offset)
+
+    def handlers(self):
+        """Dict of the functions processing each event type, each called with a decoded record and its offset."""
+        handlers = {
+            "SPELL_HEAL": self.process_heal,
+            "SPELL_PERIODIC_HEAL": self.process_heal,
+            "UNIT_DIED": self.process_death,
+            "SPELL_RESURRECT": self.process_resurrection,
+        }
+        handlers.update((event_type, self.process_damage) for event_type in DAMAGE_EVENTS)
+
+        return handlers
+
+    def subscribe(self, bus, encounter=None):
+        """
+        Process events from the scan of an event bus, instead of reading the log here, see `EventBus`.
+
+        The events are ready for analysis once the bus has run.
 
-            elif "SPELL_PERIODIC_HEAL," in line:
-                self.process_heal(line, True)
+        :param bus: the event bus, which should be run over the encounter
+        :param encounter: the encounter the bus is run over, to make timestamps relative to its start
+        """
+        if isinstance(encounter, Encounter):
+            self.ref_time = encounter.start_t
 
-            elif "UNIT_DIED," in line:
-                self.process_resurrection_or_death(line, self.deaths)
+        handlers = self.handlers()
+        handlers = {event_type: handlers[event_type] for event_type in self.process_events()}
 
-            elif "SPELL_RESURRECT," in line:
-                self.process_resurrection_or_death(line, self.resurrections)
+        bus.subscribe(handlers, DECODER.fields, skip=DECODER.skip, finish=self.finish_processing)
 
-            elif self.include_damage:
-                if "SWING_DAMAGE_LANDED," in line:
-                    self.process_damage(line)
+    def parse_all(self):
+        """Parse all events in the log, with absolute timestamps."""
+        if self.jobs != 1:
+            table, entries = parallel_parse.parse_log(self.source, self.jobs)
 
-                elif "SPELL_DAMAGE," in line:
-                    self.process_damage(line)
+            if self.use_index:
+                # encounters were found while parsing
+                log_index.save_index(self.source, entries)
 
-                elif "SPELL_PERIODIC_DAMAGE," in line:
-                    self.process_damage(line)
+            return table
 
-    def process_heal(self, line, periodic=False):
-        line_parts = line.split(",")
-        target_id = line_parts[5]
+        parser = RawProcessor(
+            self.source, include_damage=True, stream=self.stream, use_index=self.use_index, use_cache=False, jobs=1
+        )
+        parser.process_lines()
 
-        if "Creature" in target_id:
-            # ignore healing done by creatures
-            return
+        return parser.events
 
-        source = get_player_name(line_parts[2])
-        if self.character_name and source != self.character_name:
-            return
+    def follow(self, poll_interval=0.5, from_start=False):
+        """
+        Follow the log while the client is writing it, processing each encounter as it ends. See `LogFollower`.
 
-        timestamp = self.get_local_timestamp(line_parts[0])
+        :param poll_interval: seconds to wait between reading what was added to the log
+        :param from_start: if true, encounters already in the log are given too
+        :returns generator of (encounter, processor), each processor holding the events of its encounter
+        """
+        follower = LogFollower(
+            self.source, from_start, character_name=self.character_name, include_damage=self.include_damage
+        )
 
-        source_id = line_parts[1]
-        source = get_player_name(line_parts[2])
-        target = get_player_name(line_parts[6])
+        return follower.follow(poll_interval)
 
-        spell_id = line_parts[9]
+    def process_parallel(self, start=None, end=None):
+        """Parse the events between byte offsets start and end from the log, over several processes."""
+        if not os.path.exists(self.source):
+            _file_not_found(self.source)
 
-        health_pct = int(line_parts[14])
-        gross_heal = int(line_parts[29])
-        overheal = int(line_parts[30])
+        table, _ = parallel_parse.parse_log(self.source, self.jobs, start, end, self.include_damage)
+        self.select_events(table)
 
-        is_crit = "1" in line_parts[32]
+    def process_cached(self, start=None, end=None):
+        """
+        Select the events between byte offsets start and end from the parsed log cache.
 
-        event = HealEvent(
-            timestamp, source, source_id, spell_id, target, target_id, health_pct, gross_heal, overheal, is_crit
-        )
+        Without a cache, one is only made when processing the whole log, a single encounter is parsed on its own.
+        """
+        if not os.path.exists(self.source):
+            _file_not_found(self.source)
 
-        self.all_events.append(event)
-        self.heals.append(event)
-        if periodic:
-            self.periodic_heals.append(event)
-        else:
-            self.direct_heals.append(event)
+        cached = log_cache.load_cache(self.source)
 
-    def process_damage(self, line):
-        line_parts = line.split(",")
-        target_id = line_parts[5]
+        if cached is None:
+            if start is not None or end is not None:
+                self.process_log(start, end)
+                return
 
-        if "Creature" in target_id:
-            # ignore damage done to creatures
-            return
+            cached = self.parse_all()
+            log_cache.save_cache(self.source, cached)
 
-        timestamp = self.get_local_timestamp(line_parts[0])
-        # source_id = line_parts[1]
+        self.select_events(cached, start, end)
 
-        source_id = line_parts[1]
-        source = get_player_name(line_parts[2])
-        target = get_player_name(line_parts[6])
+    def select_events(self, table, start=None, end=None):
+        """
+        Add the events between byte offsets start and end from a table of parsed events with absolute timestamps.
 
-        if "SPELL" in line_parts[0]:
-            spell_id = line_parts[9]
+        Events are filtered and their timestamps made relative the same way as when processing lines one by one.
+        """
+        data = table.data
+
+        mask = np.ones(len(data), dtype=bool)
+        if start is not None:
+            mask &= data["offset"] >= start
+        if end is not None:
+            mask &= data["offset"] < end
+
+        if not self.include_damage:
+            mask &= data["kind"] != DAMAGE
+
+        if self.character_name:
+            is_heal = np.isin(data["kind"], HEAL_KINDS)
+            mask &= ~is_heal | (data["source"] == table.code(self.character_name))
+
+        data = data[mask]
+        timestamps = data["timestamp"]
+
+        if self.ref_time is None and self.normalise_time and len(data) > 0:
+            self.ref_time = ms_to_datetime(int(timestamps[0]))
+
+        if self.ref_time is not None:
+            data["timestamp"] = timestamps - (self.ref_time - YEAR_START) // timedelta(milliseconds=1)
+            time_view = ms_to_timedelta
         else:
-            spell_id = 0
+            time_view = ms_to_datetime
+
+        values = table.strings.values
+        for kind, the_list in ((DEATH, self.deaths), (RESURRECTION, self.resurrections)):
+            for row in data[data["kind"] == kind]:
+                the_list.append((time_view(int(row["timestamp"])), values[row["target_id"]], values[row["target"]]))
+
+        self.events.extend(data, values)
+
+    def process_heal(self, record, offset=0):
+        source = record.source
+        if self.character_name and source != self.character_name:
+            return
+
+        timestamp = self.get_local_time_ms(record.timestamp)
+
+        kind = PERIODIC_HEAL if record.event_type == "SPELL_PERIODIC_HEAL" else DIRECT_HEAL
+        self.events.append(
+            kind,
+            timestamp,
+            source,
+            record.source_id,
+            record.spell_id,
+            record.target,
+            record.target_id,
+            record.health_pct,
+            record.gross_amount,
+            record.overheal,
+            crit=record.critical,
+            offset=offset,
+        )
 
-        health_pct = int(line_parts[-24])
-        net_damage = int(line_parts[-10])
-        gross_damage = int(line_parts[-9])
-        overkill = int(line_parts[-8])
+    def process_damage(self, record, offset=0):
+        timestamp = self.get_local_time_ms(record.timestamp)
 
-        # school = line_parts[-7]
-        # resisted = int(line_parts[-6])
-        # blocked = int(line_parts[-5])
-        # absorbed = int(line_parts[-4])
-        # critical = line_parts[-3] == "1"
-        # glancing = line_parts[-2] == "1"
-        # crushing = line_parts[-1] == "1\n"
+        # melee swings have no spell
+        spell_id = 0 if record.spell_id is None else record.spell_id
 
+        net_damage = record.amount
+        gross_damage = record.gross_amount
         mitigated = gross_damage - net_damage
 
-        event = DamageTakenEvent(
-            timestamp, source, source_id, spell_id, target, target_id, health_pct, -gross_damage, -mitigated, -overkill
+        self.events.append(
+            DAMAGE,
+            timestamp,
+            record.source,
+            record.source_id,
+            spell_id,
+            record.target,
+            record.target_id,
+            record.health_pct,
+            -gross_damage,
+            -mitigated,
+            overkill=-record.overkill,
+            offset=offset,
         )
-        self.all_events.append(event)
-        self.damage.append(event)
 
-    def process_resurrection_or_death(self, line, the_list):
-        line_parts = line.split(",")
+    def process_death(self, record, offset=0):
+        self.process_resurrection_or_death(record, self.deaths, DEATH, offset)
 
-        unit_id = line_parts[5]
-        if "Creature" in unit_id:
-            # ignore mob and boss deaths
-            return
+    def process_resurrection(self, record, offset=0):
+        self.process_resurrection_or_death(record, self.resurrections, RESURRECTION, offset)
+
+    def process_resurrection_or_death(self, record, the_list, kind=DEATH, offset=0):
+        unit_id = record.target_id
+        timestamp = self.get_local_time_ms(record.timestamp)
+        name = record.target
 
-        timestamp = self.get_local_timestamp(line_parts[0])
-        name = get_player_name(line_parts[6])
+        the_list.append((self.get_local_timestamp(record.timestamp), unit_id, name))
 
-        the_list.append((timestamp, unit_id, name))
+        # also kept in the event table, for the parsed log cache
+        self.events.append(kind, timestamp, None, None, None, name, unit_id, None, 0, 0, offset=offset)
 
     def get_deaths(self):
         """Gets deaths in log."""
-        for line in self.log_lines:
-            line_parts = line.split(",")
-
-            if "UNIT_DIED" not in line_parts[0]:
-                continue
-
-            unit_id = line_parts[5]
-            if "Creature" in line_parts[5]:
+        for _, _, line in self.scan(("UNIT_DIED",)):
+            record = DECODER.decode(line)
+            if record is None:
+                # ignore mob and boss deaths
                 continue
 
-            timestamp = get_time_stamp(line_parts[0])
-            player = get_player_name(line_parts[6])
-
-            self.deaths.append((timestamp, unit_id, player))
+            timestamp = get_time_stamp(record.timestamp)
+            self.deaths.append((timestamp, record.target_id, record.target))
 
         return self.deaths
 
     def get_encounters(self):
-        encounters = []
-        encounter_boss = None
-        start = 0
-        start_t = None
-
-        for i, line in enumerate(self.log_lines):
-            if ENCOUNTER_START in line:
-                line_parts = line.split(",")
-                encounter_boss = line_parts[2].strip('"')
-                start_t = get_time_stamp(line_parts[0])
-                start = i
+        try:
+            if self.use_index:
+                entries = log_index.get_index(self.source)
+            else:
+                entries = log_index.build_index(self.source)
+        except FileNotFoundError:
+            _file_not_found(self.source)
 
-            if ENCOUNTER_END in line:
-                line_parts = line.split(",")
-                boss = line_parts[2].strip('"')
-                end_t = get_time_stamp(line_parts[0])
-
-                if boss != encounter_boss:
-                    raise ValueError(f"Non-matching encounter end {encounter_boss} != {boss}")
-
-                encounters.append(Encounter(encounter_boss, start, i, start_t, end_t))
+        encounters = []
+        for e in entries:
+            start_t = get_time_stamp(e.start_time)
+            end_t = get_time_stamp(e.end_time)
+            encounters.append(Encounter(e.boss, e.start, e.end, start_t, end_t))
 
         # make "all" encounter
         start = encounters[0].start
@@ -251,188 +514,181 @@ class RawProcessor(AbstractProcessor):
         return encounters
 
     def get_casts(self, encounter=None):
-        """Get casts from a raw log"""
+        """
+        Get casts from a raw log, and match them up with their heals, see `CastMatcher`.
+
+        :returns (cast_list, full_heal_data), all casts as (source, start_time, end_time, spell_id, target), with the
+            reason instead of the target for casts that didn't complete, and the heals matched with their casts as
+            (source, start_time, success_time, heal_time, batch_i, spell_id, target, net_heal)
+        """
         if encounter is None:
-            start = 0
-            end = -1
+            start = None
+            end = None
         else:
             start = encounter.start
             end = encounter.end
             self.ref_time = encounter.start_t
 
-        lines = self.log_lines[start:end]
+        matcher = CastMatcher()
+        add = matcher.add
 
-        cast_list = []
-        casts = dict()
-        heals = []
-        casting_dict = dict()
+        for record in CAST_DECODER.decode_all(line for _, _, line in self.scan(CAST_EVENTS, start, end)):
+            add(record)
 
-        batch_time = None
-        batch_i = 0
+        return matcher.finish()
 
-        for i, line in enumerate(lines):
-            line_parts = line.split(",")
 
-            if "Player" not in line_parts[1]:
-                # check for UNIT DIED
-                if "UNIT_DIED" in line_parts[0]:
-                    cancel_time = get_time_stamp(line_parts[0])
-                    target = get_player_name(line_parts[6])
+class CastMatcher:
+    """
+    Follows the casts of all players in a log, and matches them up with their heals.
 
-                    if target not in casting_dict:
-                        continue
+    Records of `CAST_EVENTS`, with the fields of `CAST_DECODER`, are added in log order. Lines are handled a server batch
+    at a time, the lines with the same timestamp, so a cast succeeding in the same batch as the next cast of the player
+    starts is found without looking ahead line by line. Heals are matched with casts through queues of the successful
+    casts of each player and spell, in order of success, so the time taken is linear in the number of lines.
+    """
 
-                    cast = casting_dict.pop(target)
-                    (start_time, spell_id, _) = cast
+    def __init__(self):
+        # all casts as (source, start_time, end_time, spell_id, target)
+        self.cast_list = []
+        # heals matched with their casts, set when finished
+        self.full_heal_data = []
 
-                    cast = (target, start_time, cancel_time, spell_id, f"[Source died]")
-                    cast_list.append(cast)
+        self._heals = []
+        self._casting = dict()
 
-                continue
+        # successful casts of each source and spell, in order of success
+        self._cast_queues = collections.defaultdict(collections.deque)
 
-            if "SPELL_CAST_START" in line_parts[0]:
-                source = get_player_name(line_parts[2])
+        self._batch = []
+        self._timestamp = None
 
-                spell_time = get_time_stamp(line_parts[0])
-                spell_id = line_parts[9]
+    def handlers(self):
+        """Dict of the function adding each event type, for an `EventBus`."""
+        return {event_type: self.add for event_type in CAST_EVENTS}
 
-                if source in casting_dict:
-                    # already casting a spell
-                    cast = casting_dict.pop(source)
-                    (start_time, sid, _) = cast
-
-                    # scan forward to see if cast success got batched
-                    spell_complete = None
-                    j = i
-                    while True:
-                        j += 1
-                        next_line = lines[j]
-                        nlp = next_line.split(",")
-                        n_timestamp = get_time_stamp(nlp[0])
-                        if n_timestamp > spell_time:
-                            break
-
-                        if "SPELL_CAST_SUCCESS" not in nlp[0]:
-                            continue
+    def add(self, record, offset=None):
+        """Add the record of a cast, heal or death line."""
+        if record.timestamp != self._timestamp:
+            self._process_batch()
+            self._timestamp = record.timestamp
 
-                        n_source = get_player_name(nlp[2])
-                        if n_source != source:
-                            continue
+        self._batch.append(record)
 
-                        n_sid = nlp[9]
-                        if sid != n_sid:
-                            continue
+    def _process_batch(self):
+        batch = self._batch
+        if not batch:
+            return
+
+        self._batch = []
+
+        cast_list = self.cast_list
+        casting_dict = self._casting
+        cast_queues = self._cast_queues
+
+        batch_time = get_time_stamp(self._timestamp)
+        batch_i = 0
+
+        # positions of the successful casts in the batch, by source and spell id
+        successes = dict()
+        for i, record in enumerate(batch):
+            if record.event_type == "SPELL_CAST_SUCCESS":
+                successes.setdefault((record.source, record.spell_id), []).append(i)
+
+        for i, record in enumerate(batch):
+            event_type = record.event_type
+            source = record.source
 
-                        # same source and sid, spell was completed
-                        target = get_player_name(nlp[6])
-                        spell_complete = target
-                        break
+            if "Player" not in record.source_id:
+                # check for UNIT DIED
+                if event_type == "UNIT_DIED" and record.target in casting_dict:
+                    start_time, spell_id = casting_dict.pop(record.target)
+                    cast_list.append((record.target, start_time, batch_time, spell_id, "[Source died]"))
+
+                continue
 
-                    if spell_complete is not None:
-                        cast = (source, start_time, spell_time, sid, spell_complete)
-                    else:
-                        cast = (source, start_time, spell_time, sid, f"[Cancelled]")
+            if event_type == "SPELL_CAST_START":
+                if source in casting_dict:
+                    # already casting a spell, check if the cast success got batched after this start
+                    start_time, sid = casting_dict.pop(source)
+                    completed = [j for j in successes.get((source, sid), ()) if j > i]
+                    target = batch[completed[0]].target if completed else "[Cancelled]"
 
-                    cast_list.append(cast)
+                    cast_list.append((source, start_time, batch_time, sid, target))
 
-                casting_dict[source] = (spell_time, spell_id, line)
+                casting_dict[source] = (batch_time, record.spell_id)
 
-            elif "SPELL_CAST_SUCCESS" in line_parts[0]:
-                source = get_player_name(line_parts[2])
-                target = get_player_name(line_parts[6])
-                success_time = get_time_stamp(line_parts[0])
-                spell_id = line_parts[9]
+            elif event_type == "SPELL_CAST_SUCCESS":
+                spell_id = record.spell_id
 
                 if source in casting_dict:
-                    start_time, start_id, start_line = casting_dict.pop(source)
+                    start_time, start_id = casting_dict.pop(source)
 
                     if spell_id != start_id:
-                        if start_time == success_time:
+                        if start_time == batch_time:
                             # start and success batched, ignore this success and add start back
-                            casting_dict[source] = (start_time, start_id, start_line)
+                            casting_dict[source] = (start_time, start_id)
                             continue
 
                         # spell was cancelled with an instant effect
-                        cast = (source, start_time, success_time, start_id, f"[Cancelled]")
-                        cast_list.append(cast)
+                        cast_list.append((source, start_time, batch_time, start_id, "[Cancelled]"))
 
                 else:
                     # instant cast
-                    start_time = success_time
+                    start_time = batch_time
 
-                if source not in casts:
-                    casts[source] = []
-
-                cast = (source, start_time, success_time, spell_id, target)
-                casts[source].append(cast)
+                cast = (source, start_time, batch_time, spell_id, record.target)
+                cast_queues[(source, spell_id)].append(cast)
                 cast_list.append(cast)
 
-            elif "SPELL_CAST_FAILED" in line_parts[0]:
-                source = get_player_name(line_parts[2])
-                cancel_time = get_time_stamp(line_parts[0])
-                spell_id = line_parts[9]
-                reason = line_parts[12].strip('"\n')
+            elif event_type == "SPELL_CAST_FAILED":
+                reason = record.failed_type
 
                 if reason not in ("Interrupted", "Your target is dead"):
                     # spell cast not interrupted, therefore not cancelled.
                     continue
 
                 if source in casting_dict:
-                    cast = casting_dict.pop(source)
-                    (start_time, _, _) = cast
+                    start_time, _ = casting_dict.pop(source)
                 else:
-                    start_time = cancel_time
-
-                cast = (source, start_time, cancel_time, spell_id, f"[{reason}]")
-                cast_list.append(cast)
-
-            elif "SPELL_HEAL" in line_parts[0]:
-                heal_time = get_time_stamp(line_parts[0])
-                source = get_player_name(line_parts[2])
-                target = get_player_name(line_parts[6])
-                spell_id = line_parts[9]
+                    start_time = batch_time
 
-                # align with batch window
-                if not batch_time or heal_time > batch_time:
-                    batch_time = heal_time
-                    batch_i = 0
+                cast_list.append((source, start_time, batch_time, record.spell_id, f"[{reason}]"))
 
-                heal_amount = int(line_parts[29])  # total heal
-                overheal_amount = int(line_parts[30])  # total heal
-                net_heal = heal_amount - overheal_amount
-                heals.append((source, heal_time, batch_i, spell_id, target, net_heal))
+            elif event_type == "SPELL_HEAL":
+                net_heal = record.gross_amount - record.overheal
+                self._heals.append((source, batch_time, batch_i, record.spell_id, record.target, net_heal))
 
                 batch_i += 1
 
-        full_heal_data = []
+    def finish(self):
+        """
+        Handle the last batch, and match up the heals with their casts.
 
-        # match up casts and heals
-        for source, heal_time, batch_i, spell_id, target, net_heal in heals:
-            if source not in casts:
-                continue
+        :returns (cast_list, full_heal_data), see `RawProcessor.get_casts`
+        """
+        self._process_batch()
 
-            for c in casts[source]:
-                start_time = c[1]
-                success_time = c[2]
-                c_id = c[3]
-                # c_target = c[4]
+        # match up heals with the earliest cast of the same spell by the same source not matched yet
+        full_heal_data = []
+        for source, heal_time, batch_i, spell_id, target, net_heal in self._heals:
+            queue = self._cast_queues.get((source, spell_id))
 
-                if (
-                    c_id == spell_id
-                    # and c_target == target
-                    and success_time <= heal_time + timedelta(seconds=0.1)
-                ):
-                    # found a match
-                    full_heal = (source, start_time, success_time, heal_time, batch_i, spell_id, target, net_heal)
-                    full_heal_data.append(full_heal)
+            if queue and queue[0][2] <= heal_time + HEAL_CAST_TOLERANCE:
+                _, start_time, success_time, _, _ = queue.popleft()
+                full_heal = (source, start_time, success_time, heal_time, batch_i, spell_id, target, net_heal)
+                full_heal_data.append(full_heal)
 
-                    casts[source].remove(c)
+        self._heals = []
+        self.full_heal_data.extend(full_heal_data)
 
-        return cast_list, full_heal_data
+        return self.cast_list, self.full_heal_data
 
 
-def get_heals(source, character_name=None, normalise_time=True, **_):
-    line_processor = RawProcessor(source, normalise_time=normalise_time, character_name=character_name)
+def get_heals(source, character_name=None, normalise_time=True, use_cache=False, jobs=1, **_):
+    line_processor = RawProcessor(
+        source, normalise_time=normalise_time, character_name=character_name, use_cache=use_cache, jobs=jobs
+    )
     line_processor.process()
 
     return line_processor.direct_heals, line_processor.periodic_heals
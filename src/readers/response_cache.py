@@ -0,0 +1,167 @@
+"""
+On-disk cache of WarcraftLogs API responses.
+
+Finished reports never change, so every page fetched from the API is kept in a local cache directory, addressed by a
+hash of the request (endpoint, report code, start, end and other parameters). Responses are stored gzip compressed.
+The cache is bounded in size, evicting the least recently used responses first.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import os
+import gzip
+import json
+import hashlib
+import threading
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "overheal", "wcl")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# parameters that don't change the response, e.g. the API key
+IGNORED_PARAMS = ("api_key",)
+
+CACHE_MODES = ("use", "refresh", "bypass")
+
+
+def request_key(url, params):
+    """Hash of a request, from its url and parameters."""
+    params = {k: v for k, v in params.items() if k not in IGNORED_PARAMS}
+    text = json.dumps([url, params], sort_keys=True, default=str)
+
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Size bounded, least recently used cache of JSON responses, as compressed files in a directory."""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param path: cache directory, defaults to the WCL_CACHE_DIR environment variable or ~/.cache/overheal/wcl
+        :param max_bytes: maximum size of the cache, in bytes of compressed responses
+        """
+        if path is None:
+            path = os.environ.get("WCL_CACHE_DIR", DEFAULT_DIR)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + ".json.gz")
+
+    def get(self, url, params):
+        """Cached response of a request, or None if not cached."""
+        file = self._file(request_key(url, params))
+
+        try:
+            with gzip.open(file, "rt", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, EOFError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            # mark as recently used
+            os.utime(file)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, url, params, data):
+        """Cache the response of a request. Fails silently if the cache cannot be written."""
+        file = self._file(request_key(url, params))
+        tmp_file = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        try:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            with gzip.open(tmp_file, "wt", encoding="utf-8") as fp:
+                json.dump(data, fp)
+
+            size = os.path.getsize(tmp_file)
+
+            # a response already cached, e.g. when refreshing, is replaced, only adding the difference in size
+            try:
+                size -= os.path.getsize(file)
+            except OSError:
+                pass
+
+            os.replace(tmp_file, file)
+        except OSError:
+            return
+        finally:
+            try:
+                # only left behind if writing or replacing failed
+                os.remove(tmp_file)
+            except OSError:
+                pass
+
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+
+        if self.size() > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """List of (last used, size, path) of all cached responses."""
+        entries = []
+
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if not name.endswith(".json.gz"):
+                    continue
+
+                file = os.path.join(root, name)
+                try:
+                    stat = os.stat(file)
+                except OSError:
+                    continue
+
+                entries.append((stat.st_mtime_ns, stat.st_size, file))
+
+        return entries
+
+    def size(self):
+        """Total size of the cache, in bytes. Kept as a running total, so the directory is only scanned once."""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self.entries())
+
+            return self._size
+
+    def evict(self):
+        """Remove the least recently used responses until the cache fits in its maximum size."""
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+
+            for _, size, file in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+
+                try:
+                    os.remove(file)
+                except OSError:
+                    pass
+
+                total -= size
+
+            self._size = total
+
+    def clear(self):
+        """Remove all cached responses."""
+        for _, _, file in self.entries():
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+        with self._lock:
+            self._size = 0
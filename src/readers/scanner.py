@@ -0,0 +1,125 @@
+"""
+Fast scanning of raw combat logs for lines of specific event types.
+
+The log is memory mapped and searched for event type tokens directly on the raw bytes. Only the lines with a wanted
+event type are copied out and decoded, everything else in the log is skipped without ever being turned into a string.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import io
+import re
+import mmap
+
+_patterns = dict()
+
+
+def _event_pattern(event_types):
+    """Compiled pattern matching the event type field of any of the given event types."""
+    key = tuple(event_types)
+
+    if key not in _patterns:
+        alternatives = b"|".join(re.escape(e.encode("ascii")) for e in key)
+        # event type follows the two spaces after the timestamp, and is followed by the first comma
+        _patterns[key] = re.compile(b"  (" + alternatives + b"),")
+
+    return _patterns[key]
+
+
+def scan_buffer(buffer, event_types, start=None, end=None):
+    """
+    Scan a buffer containing log data for lines of the given event types.
+
+    :param buffer: bytes-like object, e.g. bytes or an mmap of the log
+    :param event_types: list of event types to look for, e.g. ("SPELL_HEAL", "SPELL_PERIODIC_HEAL")
+    :param start: byte offset to start scanning from, should be the start of a line
+    :param end: byte offset to stop scanning at (exclusive), or None to scan to the end
+    :returns generator of (offset, event_type, line), with the line decoded the same way as in text mode
+    """
+    pattern = _event_pattern(event_types)
+    names = {e.encode("ascii"): e for e in event_types}
+
+    if start is None:
+        start = 0
+    if end is None:
+        end = len(buffer)
+
+    for match in pattern.finditer(buffer, start, end):
+        line_start = buffer.rfind(b"\n", 0, match.start()) + 1
+        line_end = buffer.find(b"\n", match.end())
+
+        if line_end == -1:
+            # last line of the log, without a newline
+            line = buffer[line_start:].decode("utf-8")
+        elif buffer[line_end - 1] == 13:
+            # translate \r\n line ending, same as reading in text mode
+            line = buffer[line_start : line_end - 1].decode("utf-8") + "\n"
+        else:
+            line = buffer[line_start : line_end + 1].decode("utf-8")
+
+        yield line_start, names[match.group(1)], line
+
+
+def scan_events(log_file, event_types, start=None, end=None):
+    """
+    Scan a log file for lines of the given event types.
+
+    :param log_file: path to the log file
+    :param event_types: list of event types to look for
+    :param start: byte offset to start scanning from, should be the start of a line
+    :param end: byte offset to stop scanning at (exclusive), or None to scan to the end
+    :returns generator of (offset, event_type, line)
+    """
+    with io.open(log_file, "rb") as fh:
+        try:
+            buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file, cannot be mapped
+            return
+
+        with buffer:
+            yield from scan_buffer(buffer, event_types, start, end)
+
+
+def scan_blocks(log_file, event_types, block_size=1 << 20):
+    """
+    Scan a log file for lines of the given event types, reading it a block at a time.
+
+    Unlike `scan_events`, which maps the whole log into memory, only a block of the log is held in memory at any time,
+    so this suits a single pass over a log much larger than the memory available.
+
+    :param log_file: path to the log file
+    :param event_types: list of event types to look for
+    :param block_size: number of bytes to read at a time
+    :returns generator of (offset, event_type, line)
+    """
+    with io.open(log_file, "rb") as fh:
+        position = 0
+        rest = b""
+
+        while True:
+            block = fh.read(block_size)
+            if not block:
+                break
+
+            block = rest + block
+            cut = block.rfind(b"\n") + 1
+
+            # lines not ended yet are kept for the next block
+            rest = block[cut:]
+            for offset, event_type, line in scan_buffer(block, event_types, 0, cut):
+                yield position + offset, event_type, line
+
+            position += cut
+
+        for offset, event_type, line in scan_buffer(rest, event_types):
+            yield position + offset, event_type, line
+
+
+def scan_lines(log_file, event_types, start=None, end=None):
+    """
+    Scan a log file for lines of the given event types.
+
+    :returns generator of lines
+    """
+    for _, _, line in scan_events(log_file, event_types, start, end):
+        yield line
@@ -1,34 +1,14 @@
 """Modules and methods for simulating healing."""
 import os
-from random import random
-import matplotlib.pyplot as plt
 
 from collections import namedtuple
 
 import spell_data as sd
-from simulation.casting_strategy import CastingStrategy
+from .casting_strategy import CastingStrategy
+from .engine import HealingSimulation, HealOverTime, PendingHeal  # noqa: F401
 
 
 CharacterData = namedtuple("CharacterData", ("h", "a", "mp5", "mp5ooc", "mana"))
-PendingHeal = namedtuple("PendingHeal", ("target", "heal", "mana"))
-
-
-class HealOverTime:
-    """Class managing a heal over time"""
-
-    def __init__(self, target, heal, start, duration):
-        self.target = target
-        self.heal = heal
-        self.start = start
-        self.duration = duration
-
-
-def pick_heal_target(deficits, applied_heals):
-    """Simple target choosing -- healing target with largest deficit."""
-    # merge in applied healing
-    dd = {k: min(0, deficits.get(k, 0) + applied_heals.get(k, 0)) for k in set(deficits)}
-    d = min(dd, key=dd.get)
-    return d, dd[d]
 
 
 #
@@ -89,7 +69,6 @@ def pick_heal_target(deficits, applied_heals):
 
 def evaluate_casting_strategy(
     character_name,
-    times,
     deficits_time,
     name_dict,
     character_data,
@@ -101,8 +80,16 @@ def evaluate_casting_strategy(
     show=True,
     path=None,
     plot=True,
+    seed=None,
+    policy=None,
 ):
-    """Evaluate a casting strategy."""
+    """
+    Evaluate a casting strategy.
+
+    :param deficits_time: DeficitTimeline of the deficits of the raid, as given by `raid_damage_taken`
+    :param seed: seed of the random crits, for a reproducible result, see `monte_carlo` for the spread over many runs
+    :param policy: target policy, from `targeting`, by default healing the player with the largest deficit
+    """
     if show is True:
         plot = True
 
@@ -126,126 +113,15 @@ def evaluate_casting_strategy(
         print()
         print(f"  Using {sd.spell_name(spell_id)}")
 
-    times = iter(times)
-    deficits_time = iter(deficits_time)
-
-    available_mana = character_data.mana
-    pending_heal = None
-
-    # dictionary of applied heals for characters
-    applied_heals = dict()
-
-    sum_net_healing = 0.0
-    sum_gross_healing = 0.0
-    regen_mana = 0.0
-    casts = 0
-
-    deficits = next(deficits_time)
-    next_deficit_time = next(times)
-    last_finish_time = -5.0
-    finish_time = 0.0
-    next_time = 0.0
-
-    ticks = []
-    heals = []
-    manas = []
-
-    hots = []
-
-    time_step = 0.1
-    time = 0.0
-    while time < encounter_time:
-        if time >= finish_time:
-            # process heal and/or start new heal
-            if pending_heal:
-                # apply heal
-                target_id = pending_heal.target
-                heal = pending_heal.heal
-                mana = pending_heal.mana
-
-                # do crit
-                if random() < character_data.a:
-                    heal *= 1.5
-
-                applied_heal = applied_heals.get(target_id, 0)
-
-                # heals even if target died
-                deficit = min(0, deficits.get(target_id, 0) + applied_heal)
-                net = min(-deficit, heal)
-                applied_heals[target_id] = applied_heal + net
-                pending_heal = None
+    sim = HealingSimulation(
+        deficits_time, character_data, strategy, encounter_time, name_dict, verbose=verbose, seed=seed, policy=policy
+    )
+    sim.run()
 
-                # count cast and add healing and deduct mana
-                casts += 1
-                sum_net_healing += net
-                sum_gross_healing += heal
-                available_mana -= mana
-
-                last_finish_time = finish_time
-
-                if verbose:
-                    print(
-                        f"  {next_time:4.1f} heal {name_dict[target_id]} ({deficit: 5.0f}) for {net:4.0f}; {sum_net_healing:5.0f}"
-                    )
-
-            # min wait time is time_step
-            finish_time = time + time_step
-
-            # able to cast again
-            target_id, deficit = pick_heal_target(deficits, applied_heals)
-
-            # only heal if there is someone with a deficit
-            if deficit < 0:
-                # pick spell by deficit
-                heal, mana, cast_time = strategy.pick_spell(deficit, available_mana, character_data.h)
-
-                # check we have enough mana
-                if mana > available_mana:
-                    continue
-
-                # check we expect to heal anything
-                if heal <= 0:
-                    continue
-
-                if verbose:
-                    print(f"  {next_time:4.1f} tar  {name_dict[target_id]} ({deficit: 5.0f}) for {heal:4.0f}")
-                finish_time = time + cast_time
-                pending_heal = PendingHeal(target_id, heal, mana)
-
-        ticks.append(time)
-        manas.append(available_mana)
-        heals.append(sum_net_healing)
-
-        # get next time
-        next_time = min(time + time_step, finish_time, next_deficit_time, encounter_time)
-        dtime = next_time - time
-        time = next_time
-
-        # add mana for elapsed time
-        if next_time - last_finish_time > 5.0:
-            # ooc regen
-            regen = dtime / 5 * character_data.mp5ooc
-        else:
-            regen = dtime / 5 * character_data.mp5
-
-        missing_mana = character_data.mana - available_mana
-        regen = min(regen, missing_mana)
-
-        # simplify mana regen to be constant, and not in 2s batches
-        available_mana += regen
-        regen_mana += regen
-
-        # update deficits if needed
-        if next_time >= next_deficit_time:
-            try:
-                deficits = next(deficits_time)
-                next_deficit_time = next(times)
-            except StopIteration:
-                next_deficit_time = encounter_time + time_step
-
-    ticks.append(encounter_time)
-    heals.append(sum_net_healing)
-    manas.append(available_mana)
+    sum_net_healing = sim.sum_net_healing
+    casts = sim.casts
+    regen_mana = sim.regen_mana
+    available_mana = sim.mana
 
     print()
     print(f"  Total healing: {sum_net_healing:.0f}")
@@ -256,13 +132,15 @@ def evaluate_casting_strategy(
     print(f"  End mana:      {available_mana:.0f}")
 
     if plot:
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots(figsize=(12, 8), constrained_layout=True)
-        ax.step(ticks, manas, where="post", color="blue")
+        ax.step(sim.ticks, sim.manas, where="post", color="blue")
         # ax.plot(ticks, manas, "+-", color="blue")
         ax.set_ylabel("Available mana")
 
         ax = ax.twinx()
-        ax.step(ticks, heals, where="post", color="green")
+        ax.step(sim.ticks, sim.heals, where="post", color="green")
         # ax.plot(heal_times, heals, "+", color="orange")
         ax.set_ylabel("Net healing")
 
@@ -285,4 +163,4 @@ def evaluate_casting_strategy(
 
         plt.close(fig)
 
-    return sum_net_healing, sum_gross_healing
+    return sum_net_healing, sim.sum_gross_healing
@@ -1,7 +1,32 @@
 """Casting strategy"""
 
+import numpy as np
+
 import spell_data as sd
 
+# spells the basic strategy picks from
+BASIC_SPELLS = {
+    "10917": "Flash Heal (Rank 7)",
+    # "10916": "Flash Heal (Rank 6)",
+    # "10915": "Flash Heal (Rank 5)",
+    "9474": "Flash Heal (Rank 4)",
+    # "9473": "Flash Heal (Rank 3)",
+    # "9472": "Flash Heal (Rank 2)",
+    # "2061": "Flash Heal (Rank 1)",
+
+    # "2053": "Lesser Heal (Rank 3)",
+
+    # "10965": "Greater Heal (Rank 4)",
+    # "10964": "Greater Heal (Rank 3)",
+    # "10963": "Greater Heal (Rank 2)",
+    # "2060": "Greater Heal (Rank 1)",
+
+    # "6064": "Heal (Rank 4)",
+    # "6063": "Heal (Rank 3)",
+    # "2055": "Heal (Rank 2)",
+    # "2054": "Heal (Rank 1)",
+}
+
 
 class CastingStrategy:
     """
@@ -17,27 +42,7 @@ class CastingStrategy:
     def pick_spell(self, deficit, mana, h, **_):
         # pick spell by deficit
 
-        choices = {
-            "10917": "Flash Heal (Rank 7)",
-            # "10916": "Flash Heal (Rank 6)",
-            # "10915": "Flash Heal (Rank 5)",
-            "9474": "Flash Heal (Rank 4)",
-            # "9473": "Flash Heal (Rank 3)",
-            # "9472": "Flash Heal (Rank 2)",
-            # "2061": "Flash Heal (Rank 1)",
-
-            # "2053": "Lesser Heal (Rank 3)",
-
-            # "10965": "Greater Heal (Rank 4)",
-            # "10964": "Greater Heal (Rank 3)",
-            # "10963": "Greater Heal (Rank 2)",
-            # "2060": "Greater Heal (Rank 1)",
-
-            # "6064": "Heal (Rank 4)",
-            # "6063": "Heal (Rank 3)",
-            # "2055": "Heal (Rank 2)",
-            # "2054": "Heal (Rank 1)",
-        }.keys()
+        choices = BASIC_SPELLS.keys()
 
         # filter choices by mana available
         choices = filter(lambda sid: sd.spell_mana(sid, talents=self.talents) < mana, choices)
@@ -58,6 +63,28 @@ class CastingStrategy:
 
         return heal, mana, cast_time
 
+    def pick_spells(self, deficits, manas, h):
+        """Pick spells for arrays of deficits and mana at once, as `pick_spell` does for each, returns arrays."""
+        deficits = np.asarray(deficits, dtype=float)
+        manas = np.asarray(manas, dtype=float)
+
+        heals = np.zeros(len(deficits))
+        spell_manas = np.zeros(len(deficits))
+        cast_times = np.zeros(len(deficits))
+
+        for spell_id in BASIC_SPELLS:
+            heal = sd.spell_heal(spell_id) + sd.spell_coefficient(spell_id) * h
+
+            # castable, with small amount of overhealing, and healing more than any spell before it
+            castable = sd.spell_mana(spell_id, talents=self.talents) < manas
+            picked = castable & (0.80 * heal < -deficits) & (heal > heals)
+
+            heals[picked] = heal
+            spell_manas[picked] = sd.spell_mana(spell_id)
+            cast_times[picked] = 1.5 if "Flash" in sd.spell_name(spell_id) else 2.5
+
+        return heals, spell_manas, cast_times
+
 
 class SingleSpellStrategy(CastingStrategy):
     """
@@ -87,3 +114,15 @@ class SingleSpellStrategy(CastingStrategy):
         cast_time = 1.5 if "Flash" in sd.spell_name(spell_id) else 2.5
 
         return heal, spell_mana, cast_time
+
+    def pick_spells(self, deficits, manas, h):
+        """Pick spells for arrays of deficits and mana at once, as `pick_spell` does for each, returns arrays."""
+        spell_id = self.spell_id
+
+        spell_mana = sd.spell_mana(spell_id, talents=self.talents)
+        castable = ~(np.asarray(manas, dtype=float) < spell_mana)
+
+        heal = sd.spell_heal(spell_id) + h * sd.spell_coefficient(spell_id)
+        cast_time = 1.5 if "Flash" in sd.spell_name(spell_id) else 2.5
+
+        return np.where(castable, heal, 0.0), np.where(castable, spell_mana, 0.0), np.where(castable, cast_time, 0.0)
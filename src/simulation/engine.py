@@ -0,0 +1,307 @@
+"""
+Discrete-event engine for simulating the healing of a raid.
+
+Time jumps from one event to the next, taken from a priority queue of deficit changes, mana regen ticks, HoT ticks and
+cast finishes, rather than stepping through the encounter in small increments. A new cast is only considered when
+something it depends on has changed, so the work scales with the number of events, and the recorded mana and healing
+only hold the points where they change.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import heapq
+import random
+from collections import namedtuple
+
+from .targeting import LargestDeficit
+
+# kinds of queued events, in the order they are handled when at the same time, after any deficit changes
+HOT_TICK = 1
+REGEN = 2
+CAST_FINISH = 3
+
+# time between mana regen ticks, and between ticks of heals over time
+REGEN_INTERVAL = 2.0
+HOT_TICK_INTERVAL = 3.0
+
+# time after a cast before out of combat regen kicks in, and the shortest time between casts
+FIVE_SECOND_RULE = 5.0
+GLOBAL_COOLDOWN = 1.5
+
+PendingHeal = namedtuple("PendingHeal", ("target", "heal", "mana", "duration"), defaults=(0.0,))
+
+
+class HealOverTime:
+    """Class managing a heal over time"""
+
+    def __init__(self, target, heal, start, duration):
+        self.target = target
+        self.heal = heal
+        self.start = start
+        self.duration = duration
+
+    @property
+    def ticks(self):
+        """Number of ticks of the heal."""
+        return max(1, int(self.duration / HOT_TICK_INTERVAL))
+
+    def tick_times(self):
+        """Times of each tick of the heal."""
+        return [self.start + HOT_TICK_INTERVAL * (i + 1) for i in range(self.ticks)]
+
+
+class HealingSimulation:
+    """
+    Simulation of a character healing the raid through an encounter, following a casting strategy.
+
+    Heals are applied to the deficits of the raid as recorded, so a player stays healed up until the deficits recorded
+    after the heal would have been healed anyway.
+    """
+
+    def __init__(
+        self,
+        deficits_time,
+        character_data,
+        strategy,
+        encounter_time,
+        name_dict=None,
+        verbose=False,
+        seed=None,
+        policy=None,
+    ):
+        """
+        :param deficits_time: DeficitTimeline of the deficits of the raid, as given by `raid_damage_taken`
+        :param character_data: CharacterData of the healer
+        :param strategy: casting strategy, picks the spell to cast with `pick_spell(deficit, mana, h)`, which returns
+            (heal, mana, cast_time), or (heal, mana, cast_time, duration) for a heal over time
+        :param encounter_time: length of the encounter, in seconds
+        :param name_dict: names of the players by id, for printing
+        :param verbose: if true, print each cast
+        :param seed: seed of the random crits, for a reproducible run
+        :param policy: target policy, from `targeting`, by default healing the player with the largest deficit
+        """
+        self.deficits_time = deficits_time
+        self.character_data = character_data
+        self.strategy = strategy
+        self.encounter_time = encounter_time
+        self.name_dict = dict() if name_dict is None else name_dict
+        self.verbose = verbose
+        self.random = random.Random(seed).random
+
+        if policy is None:
+            policy = LargestDeficit()
+        self.policy = policy
+        self.selector = policy.selector()
+
+        self.mana = character_data.mana
+        self.deficits = dict()
+
+        # dictionary of applied heals for characters
+        self.applied_heals = dict()
+
+        self.sum_net_healing = 0.0
+        self.sum_gross_healing = 0.0
+        self.regen_mana = 0.0
+        self.casts = 0
+
+        self.pending_heal = None
+        self.last_finish_time = -FIVE_SECOND_RULE
+
+        # target and deficit of the last time no cast was started, only if the target to pick or the mana changes is
+        # another cast considered, as the strategy would pick the same again
+        self._retry = True
+        self._idle_target = (None, 0)
+
+        # mana and net healing at each time either changes
+        self.ticks = []
+        self.manas = []
+        self.heals = []
+
+        self._queue = []
+        self._count = 0
+        self._changes = None
+        self._next_change = None
+
+    def schedule(self, t, kind, data=None):
+        """Add an event to the queue, events after the end of the encounter are never handled."""
+        if t < self.encounter_time:
+            # the count keeps events of the same time and kind in the order they were scheduled
+            heapq.heappush(self._queue, (t, kind, self._count, data))
+            self._count += 1
+
+    def run(self):
+        """Run the simulation through the encounter, returns itself."""
+        self._changes = self.deficits_time.changes()
+        self._next_change = next(self._changes, None)
+
+        if self._next_change is not None:
+            # start from the deficits after the first change
+            self._apply_changes(self._next_change[0])
+
+        self._record(0.0)
+
+        t = REGEN_INTERVAL
+        while t < self.encounter_time:
+            self.schedule(t, REGEN)
+            t += REGEN_INTERVAL
+
+        handlers = {
+            HOT_TICK: self._on_hot_tick,
+            REGEN: self._on_regen,
+            CAST_FINISH: self._on_cast_finish,
+        }
+
+        self._try_cast(0.0)
+
+        queue = self._queue
+        while True:
+            # deficit changes are already in time order, so are merged in rather than queued
+            change = self._next_change
+            if change is not None and change[0] < self.encounter_time and (not queue or change[0] <= queue[0][0]):
+                t = self._apply_changes(queue[0][0] if queue else self.encounter_time)
+            elif queue:
+                t, kind, _, data = heapq.heappop(queue)
+                handlers[kind](t, data)
+            else:
+                break
+
+            if self.pending_heal is None and self._retry:
+                self._try_cast(t)
+
+        self._record(self.encounter_time)
+
+        return self
+
+    def _record(self, t):
+        if self.ticks and self.ticks[-1] == t:
+            self.manas[-1] = self.mana
+            self.heals[-1] = self.sum_net_healing
+            return
+
+        self.ticks.append(t)
+        self.manas.append(self.mana)
+        self.heals.append(self.sum_net_healing)
+
+    def _apply_changes(self, until):
+        """
+        Apply the deficit changes up to and including a time, stopping early if a cast should be considered.
+
+        :param until: time of the next queued event
+        :returns the time of the last change applied
+        """
+        deficits = self.deficits
+        applied_heals = self.applied_heals
+        selector = self.selector
+
+        # while casting, the changes only matter once the cast finishes
+        idle = self.pending_heal is None
+
+        change = self._next_change
+        t = change[0]
+        while change is not None and change[0] <= until:
+            if self._retry and change[0] > t:
+                # consider a cast before the next change
+                break
+
+            t, player_id, deficit = change
+            deficits[player_id] = deficit
+            selector.update(player_id, min(0, deficit + applied_heals.get(player_id, 0)))
+
+            if idle and selector.pick() != self._idle_target:
+                # the target to pick has changed
+                self._retry = True
+
+            change = next(self._changes, None)
+
+        self._next_change = change
+
+        return t
+
+    def _on_regen(self, t, _):
+        if t - self.last_finish_time > FIVE_SECOND_RULE:
+            mp5 = self.character_data.mp5ooc
+        else:
+            mp5 = self.character_data.mp5
+
+        regen = min(REGEN_INTERVAL / 5 * mp5, self.character_data.mana - self.mana)
+        if regen > 0:
+            self.mana += regen
+            self.regen_mana += regen
+            self._retry = True
+            self._record(t)
+
+    def _apply_heal(self, target_id, heal):
+        """Heal a target, returns the deficit before the heal and the net heal."""
+        applied_heal = self.applied_heals.get(target_id, 0)
+
+        # heals even if target died
+        deficit = min(0, self.deficits.get(target_id, 0) + applied_heal)
+        net = min(-deficit, heal)
+        self.applied_heals[target_id] = applied_heal + net
+        self.selector.update(target_id, min(0, deficit + net))
+
+        self.sum_net_healing += net
+        self.sum_gross_healing += heal
+
+        return deficit, net
+
+    def _on_hot_tick(self, t, data):
+        target_id, heal = data
+        self._apply_heal(target_id, heal)
+        if self.pending_heal is None and self.selector.pick() != self._idle_target:
+            self._retry = True
+
+        self._record(t)
+
+    def _on_cast_finish(self, t, _):
+        pending_heal = self.pending_heal
+        self.pending_heal = None
+
+        target_id = pending_heal.target
+        heal = pending_heal.heal
+
+        if pending_heal.duration > 0:
+            hot = HealOverTime(target_id, heal, t, pending_heal.duration)
+            for tick_time in hot.tick_times():
+                self.schedule(tick_time, HOT_TICK, (target_id, heal / hot.ticks))
+        else:
+            # do crit
+            if self.random() < self.character_data.a:
+                heal *= 1.5
+
+            deficit, net = self._apply_heal(target_id, heal)
+
+            if self.verbose:
+                name = self.name_dict.get(target_id, target_id)
+                print(f"  {t:4.1f} heal {name} ({deficit: 5.0f}) for {net:4.0f}; {self.sum_net_healing:5.0f}")
+
+        # count cast and deduct mana
+        self.casts += 1
+        self.mana -= pending_heal.mana
+        self.last_finish_time = t
+        self._retry = True
+
+        self._record(t)
+
+    def _try_cast(self, t):
+        """Start a cast if there is someone to heal, and a spell to heal them with."""
+        self._retry = False
+
+        target_id, deficit = self._idle_target = self.selector.pick()
+
+        # only heal if there is someone with a deficit
+        if target_id is None:
+            return
+
+        # pick spell by deficit
+        heal, mana, cast_time, *duration = self.strategy.pick_spell(deficit, self.mana, self.character_data.h)
+
+        # check we have enough mana and expect to heal anything
+        if mana > self.mana or heal <= 0:
+            return
+
+        if self.verbose:
+            name = self.name_dict.get(target_id, target_id)
+            print(f"  {t:4.1f} tar  {name} ({deficit: 5.0f}) for {heal:4.0f}")
+
+        self.pending_heal = PendingHeal(target_id, heal, mana, *duration)
+        self.schedule(t + max(cast_time, GLOBAL_COOLDOWN), CAST_FINISH)
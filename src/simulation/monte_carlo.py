@@ -0,0 +1,356 @@
+"""
+Monte Carlo evaluation of casting strategies, from many seeded replications of the healing simulation.
+
+The replications are run in lock-step, with the state of each kept in numpy arrays. The deficits of the raid are the
+same for all of them, while the heals applied, the mana and the casts differ with the crits of each. Each event is
+handled for all replications it concerns at once, following the same rules as `engine.HealingSimulation`, so a thousand
+replications take little more time than a handful of single runs.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import heapq
+import math
+from statistics import NormalDist
+from collections import namedtuple
+
+import numpy as np
+
+from .engine import REGEN_INTERVAL, HOT_TICK_INTERVAL, FIVE_SECOND_RULE, GLOBAL_COOLDOWN
+from .targeting import LargestDeficit
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# results of each replication that are summarised
+RESULTS = ("net", "gross", "casts", "mana")
+
+Summary = namedtuple("Summary", ("mean", "std", "ci_low", "ci_high", "percentiles"))
+
+
+def summarise(values, confidence=0.95):
+    """
+    Summarise a result over the replications.
+
+    :param values: the result of each replication
+    :param confidence: confidence level of the interval of the mean
+    :returns Summary of the mean, standard deviation, confidence interval of the mean, and percentiles by PERCENTILES
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+
+    mean = values.mean()
+    std = values.std(ddof=1) if n > 1 else 0.0
+
+    # normal approximation of the distribution of the mean
+    half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * std / math.sqrt(n)
+
+    percentiles = {p: float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+    return Summary(float(mean), float(std), float(mean - half_width), float(mean + half_width), percentiles)
+
+
+def pick_spells(strategy, deficits, manas, h):
+    """
+    Pick spells for several replications at once.
+
+    Uses `pick_spells` of the strategy if it has one, or else calls `pick_spell` for each replication.
+
+    :returns arrays of heal, mana, cast time and duration, which is 0 for direct heals
+    """
+    if hasattr(strategy, "pick_spells"):
+        spells = [np.asarray(a, dtype=float) for a in strategy.pick_spells(deficits, manas, h)]
+    else:
+        picked = [tuple(strategy.pick_spell(d, m, h)) for d, m in zip(deficits, manas)]
+        spells = list(np.array([p + (0.0,) * (4 - len(p)) for p in picked], dtype=float).reshape(-1, 4).T)
+
+    if len(spells) == 3:
+        spells.append(np.zeros(len(deficits)))
+
+    return spells
+
+
+class BatchSimulation:
+    """Replications of the simulation of a character healing the raid through an encounter, run in lock-step."""
+
+    def __init__(
+        self, deficits_time, character_data, strategy, encounter_time, replications=1000, seed=None, policy=None
+    ):
+        """
+        :param deficits_time: DeficitTimeline of the deficits of the raid, as given by `raid_damage_taken`
+        :param character_data: CharacterData of the healer
+        :param strategy: casting strategy, as for `engine.HealingSimulation`, can have a `pick_spells` taking arrays
+        :param encounter_time: length of the encounter, in seconds
+        :param replications: number of replications to run
+        :param seed: seed of the random crits, for reproducible results
+        :param policy: target policy, from `targeting`, by default healing the player with the largest deficit
+        """
+        self.deficits_time = deficits_time
+        self.character_data = character_data
+        self.strategy = strategy
+        self.encounter_time = encounter_time
+        self.replications = replications
+        self.rng = np.random.default_rng(seed)
+
+        if policy is None:
+            policy = LargestDeficit()
+        self.policy = policy
+        self._pick_targets = policy.batch_selector(deficits_time.ids)
+
+        # factors of the deficits of each player for policies picking the lowest of them, else None
+        self._weights = None
+        if hasattr(policy, "weight"):
+            self._weights = np.array([policy.weight(player_id) for player_id in deficits_time.ids])
+
+        n = replications
+        players = len(deficits_time.ids)
+
+        self.deficits = np.zeros(players)
+
+        # heals applied to each player (rows) in each replication (columns)
+        self.applied_heals = np.zeros((players, n))
+
+        self.mana = np.full(n, float(character_data.mana))
+        self.sum_net_healing = np.zeros(n)
+        self.sum_gross_healing = np.zeros(n)
+        self.regen_mana = np.zeros(n)
+        self.casts = np.zeros(n, dtype=int)
+
+        # casts in progress
+        self.casting = np.zeros(n, dtype=bool)
+        self.finish_time = np.full(n, np.inf)
+        self.pending_target = np.zeros(n, dtype=int)
+        self.pending_heal = np.zeros(n)
+        self.pending_mana = np.zeros(n)
+        self.pending_duration = np.zeros(n)
+
+        self.last_finish_time = np.full(n, -FIVE_SECOND_RULE)
+
+        # as for the single simulation, only consider a new cast when what the last one was picked on changes
+        self.retry = np.ones(n, dtype=bool)
+        self.idle_target = np.full(n, -1)
+        self.idle_key = np.zeros(n)
+
+        # times of HoT ticks, and the (replications, targets, heals) ticking at each time
+        self._hot_times = []
+        self._hot_ticks = dict()
+
+    def run(self):
+        """Run all replications through the encounter, returns itself."""
+        codes = {player_id: code for code, player_id in enumerate(self.deficits_time.ids)}
+        changes = [(t, codes[player_id], deficit) for t, player_id, deficit in self.deficits_time.changes()]
+
+        i = 0
+        if changes:
+            # start from the deficits after the first change
+            i = self._apply_changes(changes, i)
+
+        self._try_casts(0.0)
+
+        end = self.encounter_time
+        next_regen = REGEN_INTERVAL
+        while True:
+            t_change = changes[i][0] if i < len(changes) else math.inf
+            t_hot = self._hot_times[0] if self._hot_times else math.inf
+            t_finish = self.finish_time.min()
+
+            t = min(t_change, t_hot, next_regen, t_finish)
+            if t >= end:
+                break
+
+            # events of the same time are handled in the same order as for the single simulation
+            if t_change == t:
+                i = self._apply_changes(changes, i)
+                self._try_casts(t)
+
+            if t_hot == t:
+                self._on_hot_ticks(t)
+                self._try_casts(t)
+
+            if next_regen == t:
+                self._on_regen(t)
+                self._try_casts(t)
+                next_regen += REGEN_INTERVAL
+
+            if t_finish == t:
+                self._on_cast_finish(t)
+                self._try_casts(t)
+
+        return self
+
+    def results(self):
+        """Net and gross healing, casts and end mana of each replication, by the names in RESULTS."""
+        return dict(zip(RESULTS, (self.sum_net_healing, self.sum_gross_healing, self.casts, self.mana)))
+
+    def summarise(self, confidence=0.95):
+        """Summary of each result over the replications, by name."""
+        return {name: summarise(values, confidence) for name, values in self.results().items()}
+
+    def _apply_changes(self, changes, i):
+        """Apply the deficit changes of the same time, starting from the i-th, returns the index after them."""
+        idle = ~self.casting
+        any_idle = idle.any()
+
+        t = changes[i][0]
+        while i < len(changes) and changes[i][0] == t:
+            _, code, deficit = changes[i]
+            self.deficits[code] = deficit
+
+            if any_idle and self._weights is None:
+                # the target to pick may have changed
+                self.retry |= idle
+            elif any_idle:
+                # the target to pick has changed
+                lower = self._weights[code] * np.minimum(0, deficit + self.applied_heals[code]) < self.idle_key
+                self.retry |= idle & ((self.idle_target == code) | lower)
+
+            i += 1
+
+        return i
+
+    def _apply_heals(self, idx, targets, heals):
+        """Heal targets in replications, at most one in each."""
+        applied = self.applied_heals[targets, idx]
+
+        # heals even if target died
+        deficits = np.minimum(0, self.deficits[targets] + applied)
+        net = np.minimum(-deficits, heals)
+        self.applied_heals[targets, idx] = applied + net
+
+        self.sum_net_healing[idx] += net
+        self.sum_gross_healing[idx] += heals
+
+    def _on_hot_ticks(self, t):
+        heapq.heappop(self._hot_times)
+
+        for idx, targets, heals in self._hot_ticks.pop(t):
+            self._apply_heals(idx, targets, heals)
+            if self._weights is None:
+                self.retry[idx] = True
+            else:
+                self.retry[idx] |= self.idle_target[idx] == targets
+
+    def _schedule_hots(self, t, idx, targets, heals, durations):
+        ticks = np.maximum(1, (durations / HOT_TICK_INTERVAL).astype(int))
+
+        for tick in range(ticks.max()):
+            tick_time = t + HOT_TICK_INTERVAL * (tick + 1)
+            if tick_time >= self.encounter_time:
+                break
+
+            ticking = ticks > tick
+            if tick_time not in self._hot_ticks:
+                self._hot_ticks[tick_time] = []
+                heapq.heappush(self._hot_times, tick_time)
+
+            self._hot_ticks[tick_time].append((idx[ticking], targets[ticking], (heals / ticks)[ticking]))
+
+    def _on_regen(self, t):
+        character_data = self.character_data
+        mp5 = np.where(t - self.last_finish_time > FIVE_SECOND_RULE, character_data.mp5ooc, character_data.mp5)
+
+        regen = np.minimum(REGEN_INTERVAL / 5 * mp5, character_data.mana - self.mana)
+        regenerating = regen > 0
+
+        self.mana[regenerating] += regen[regenerating]
+        self.regen_mana[regenerating] += regen[regenerating]
+        self.retry |= regenerating
+
+    def _on_cast_finish(self, t):
+        idx = np.flatnonzero(self.finish_time == t)
+
+        self.casting[idx] = False
+        self.finish_time[idx] = np.inf
+
+        targets = self.pending_target[idx]
+        heals = self.pending_heal[idx]
+        durations = self.pending_duration[idx]
+
+        hot = durations > 0
+        if hot.any():
+            self._schedule_hots(t, idx[hot], targets[hot], heals[hot], durations[hot])
+
+        direct = ~hot
+        idx_direct = idx[direct]
+        heals = heals[direct]
+
+        # do crit
+        crit = self.rng.random(len(idx_direct)) < self.character_data.a
+        heals[crit] *= 1.5
+
+        self._apply_heals(idx_direct, targets[direct], heals)
+
+        # count cast and deduct mana
+        self.casts[idx] += 1
+        self.mana[idx] -= self.pending_mana[idx]
+        self.last_finish_time[idx] = t
+        self.retry[idx] = True
+
+    def _try_casts(self, t):
+        """Start casts in the replications that are to consider one, if there is someone to heal and a spell to heal."""
+        idx = np.flatnonzero(self.retry & ~self.casting)
+        if len(idx) == 0:
+            return
+
+        self.retry[idx] = False
+        self.idle_target[idx] = -1
+        self.idle_key[idx] = 0
+
+        if len(self.deficits) == 0:
+            return
+
+        # deficits with the heals applied in each replication
+        deficits = np.minimum(0, self.deficits[:, None] + self.applied_heals[:, idx])
+        targets, deficits = self._pick_targets(deficits)
+
+        # only heal if there is someone with a deficit
+        has_deficit = deficits < 0
+        idx = idx[has_deficit]
+        targets = targets[has_deficit]
+        deficits = deficits[has_deficit]
+
+        self.idle_target[idx] = targets
+        if self._weights is not None:
+            self.idle_key[idx] = self._weights[targets] * deficits
+
+        if len(idx) == 0:
+            return
+
+        mana = self.mana[idx]
+        heals, manas, cast_times, durations = pick_spells(self.strategy, deficits, mana, self.character_data.h)
+
+        # check we have enough mana and expect to heal anything
+        casting = ~(manas > mana) & (heals > 0)
+        idx = idx[casting]
+
+        self.casting[idx] = True
+        self.finish_time[idx] = t + np.maximum(cast_times[casting], GLOBAL_COOLDOWN)
+        self.pending_target[idx] = targets[casting]
+        self.pending_heal[idx] = heals[casting]
+        self.pending_mana[idx] = manas[casting]
+        self.pending_duration[idx] = durations[casting]
+
+
+def evaluate_replications(
+    deficits_time,
+    character_data,
+    strategy,
+    encounter_time,
+    replications=1000,
+    seed=None,
+    confidence=0.95,
+    policy=None,
+):
+    """
+    Evaluate a casting strategy over many replications of the encounter.
+
+    :param deficits_time: DeficitTimeline of the deficits of the raid, as given by `raid_damage_taken`
+    :param character_data: CharacterData of the healer
+    :param strategy: casting strategy to evaluate
+    :param encounter_time: length of the encounter, in seconds
+    :param replications: number of replications to run
+    :param seed: seed of the random crits, for reproducible results
+    :param confidence: confidence level of the intervals of the means
+    :param policy: target policy, from `targeting`, by default healing the player with the largest deficit
+    :returns dict of Summary of net and gross healing, casts and end mana
+    """
+    sim = BatchSimulation(deficits_time, character_data, strategy, encounter_time, replications, seed, policy)
+    return sim.run().summarise(confidence)
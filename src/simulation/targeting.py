@@ -0,0 +1,270 @@
+"""
+Choosing whom to heal in the healing simulation.
+
+The effective deficit of each player, the recorded deficit with the simulated heals applied, is kept in an indexed
+priority queue, updated in O(log n) as it changes, so picking a target takes the same time whatever the size of the
+raid.
+
+Target policies decide the order of the queue:
+
+- `LargestDeficit`, heal the player with the largest deficit.
+- `TankPriority`, as above, but counting the deficits of the tanks more, with the tanks as listed in `raid.json`.
+- `SmartHealGroups`, heal the most injured player of the group with the largest deficit in total, as smart heals do.
+
+Each policy gives a fresh selector for each simulation with `selector()`, and a function picking targets for many
+replications at once, as for `monte_carlo`, with `batch_selector()`.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import numpy as np
+
+
+class TargetQueue:
+    """
+    Indexed priority queue of items by key, the item with the lowest key first.
+
+    Keys of items already in the queue are updated in place, in O(log n). Items of the same key come in the order they
+    were added.
+    """
+
+    def __init__(self):
+        # heap of [key, order, item], and the position of each item in it
+        self._heap = []
+        self._positions = dict()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def update(self, item, key):
+        """Set the key of an item, adding it if not in the queue."""
+        i = self._positions.get(item)
+        if i is None:
+            i = len(self._heap)
+            self._heap.append([key, i, item])
+            self._positions[item] = i
+            self._sift_up(i)
+            return
+
+        entry = self._heap[i]
+        old_key = entry[0]
+        entry[0] = key
+
+        if key < old_key:
+            self._sift_up(i)
+        elif key > old_key:
+            self._sift_down(i)
+
+    def peek(self):
+        """The item with the lowest key and its key, or (None, None) if empty."""
+        if not self._heap:
+            return None, None
+
+        key, _, item = self._heap[0]
+        return item, key
+
+    def key(self, item):
+        """The key of an item in the queue."""
+        return self._heap[self._positions[item]][0]
+
+    @staticmethod
+    def _before(a, b):
+        return a[0] < b[0] or (a[0] == b[0] and a[1] < b[1])
+
+    def _move(self, entry, i):
+        self._heap[i] = entry
+        self._positions[entry[2]] = i
+
+    def _sift_up(self, i):
+        heap = self._heap
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) // 2
+            if not self._before(entry, heap[parent]):
+                break
+
+            self._move(heap[parent], i)
+            i = parent
+
+        self._move(entry, i)
+
+    def _sift_down(self, i):
+        heap = self._heap
+        entry = heap[i]
+        n = len(heap)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+
+            if child + 1 < n and self._before(heap[child + 1], heap[child]):
+                child += 1
+
+            if not self._before(heap[child], entry):
+                break
+
+            self._move(heap[child], i)
+            i = child
+
+        self._move(entry, i)
+
+
+class KeySelector:
+    """Picks the player of the lowest key, from a queue of keys of the effective deficits."""
+
+    def __init__(self, key):
+        """:param key: function of player id and effective deficit, giving the key to order players by"""
+        self.key = key
+        self.deficits = dict()
+        self.queue = TargetQueue()
+
+    def update(self, player_id, deficit):
+        """Set the effective deficit of a player."""
+        self.deficits[player_id] = deficit
+        self.queue.update(player_id, self.key(player_id, deficit))
+
+    def pick(self):
+        """The player to heal and their effective deficit, or (None, 0) if nobody needs healing."""
+        player_id, key = self.queue.peek()
+        if player_id is None or key >= 0:
+            return None, 0
+
+        return player_id, self.deficits[player_id]
+
+
+class LargestDeficit:
+    """Heal the player with the largest deficit."""
+
+    name = "Largest deficit"
+
+    def weight(self, player_id):
+        """Factor to count the deficit of a player by."""
+        return 1.0
+
+    def selector(self):
+        return KeySelector(lambda player_id, deficit: self.weight(player_id) * deficit)
+
+    def batch_selector(self, ids):
+        """
+        Function picking targets for many replications at once.
+
+        :param ids: player ids of the rows of the deficits to pick from
+        :returns function of the effective deficits of each player (rows) in each replication (columns), giving arrays
+            of the row of the target and their deficit in each replication, with a deficit of 0 if nobody needs healing
+        """
+        weights = np.array([self.weight(player_id) for player_id in ids])[:, None]
+
+        def pick(deficits):
+            keys = weights * deficits
+
+            targets = keys.argmin(axis=0)
+            columns = np.arange(deficits.shape[1])
+
+            return targets, np.where(keys[targets, columns] < 0, deficits[targets, columns], 0.0)
+
+        return pick
+
+
+class TankPriority(LargestDeficit):
+    """Heal the player with the largest deficit, counting the deficits of tanks more than the rest."""
+
+    name = "Tank priority"
+
+    def __init__(self, tanks, name_dict=None, weight=2.0):
+        """
+        :param tanks: names or ids of the tanks, as the list of tanks in `raid.json`
+        :param name_dict: names of the players by id
+        :param weight: factor to count the deficits of the tanks by
+        """
+        self.tanks = set(tanks)
+        self.name_dict = dict() if name_dict is None else name_dict
+        self.tank_weight = weight
+
+    def weight(self, player_id):
+        if player_id in self.tanks or self.name_dict.get(player_id) in self.tanks:
+            return self.tank_weight
+
+        return 1.0
+
+
+class GroupSelector:
+    """Picks the most injured player of the group with the largest deficit in total."""
+
+    def __init__(self, group_of):
+        """:param group_of: function giving the group of a player id"""
+        self.group_of = group_of
+        self.deficits = dict()
+        self.totals = dict()
+
+        self.groups = TargetQueue()
+        self.members = dict()
+
+    def update(self, player_id, deficit):
+        """Set the effective deficit of a player."""
+        group = self.group_of(player_id)
+        if group not in self.members:
+            self.members[group] = TargetQueue()
+            self.totals[group] = 0
+
+        self.totals[group] += deficit - self.deficits.get(player_id, 0)
+        self.deficits[player_id] = deficit
+
+        self.groups.update(group, self.totals[group])
+        self.members[group].update(player_id, deficit)
+
+    def pick(self):
+        """The player to heal and their effective deficit, or (None, 0) if nobody needs healing."""
+        group, total = self.groups.peek()
+        if group is None or total >= 0:
+            return None, 0
+
+        player_id, deficit = self.members[group].peek()
+        return player_id, deficit
+
+
+class SmartHealGroups:
+    """Heal the most injured player of the group with the largest deficit in total, players not in a group alone."""
+
+    name = "Smart heal groups"
+
+    def __init__(self, groups, name_dict=None):
+        """
+        :param groups: lists of names or ids of the players in each group, as the groups in `raid.json`
+        :param name_dict: names of the players by id
+        """
+        self.name_dict = dict() if name_dict is None else name_dict
+        self.groups = {player: i for i, group in enumerate(groups) for player in group}
+
+    def group_of(self, player_id):
+        """The group of a player, the player id itself if not in a group."""
+        group = self.groups.get(player_id)
+        if group is None:
+            group = self.groups.get(self.name_dict.get(player_id), player_id)
+
+        return group
+
+    def selector(self):
+        return GroupSelector(self.group_of)
+
+    def batch_selector(self, ids):
+        """Function picking targets for many replications at once, see `LargestDeficit.batch_selector`."""
+        # groups in order of first appearance, as for the selector
+        codes = dict()
+        groups = [codes.setdefault(self.group_of(player_id), len(codes)) for player_id in ids]
+
+        membership = np.zeros((len(codes), len(ids)), dtype=bool)
+        membership[groups, np.arange(len(ids))] = True
+
+        def pick(deficits):
+            totals = membership @ deficits
+            picked = totals.argmin(axis=0)
+            columns = np.arange(deficits.shape[1])
+
+            # most injured member of the picked group
+            targets = np.where(membership[picked].T, deficits, np.inf).argmin(axis=0)
+
+            return targets, np.where(totals[picked, columns] < 0, deficits[targets, columns], 0.0)
+
+        return pick
@@ -4,7 +4,7 @@ Collection of general functions for managing logs data.
 By: Filip Gökstorp (Saintis-Dreadmist), 2020
 """
 import hashlib
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 STR_P_TIME = "%m/%d %H:%M:%S.%f"
@@ -35,9 +35,79 @@ def get_player_name(text):
     return text.split("-")[0].strip('"')
 
 
+# days before the start of each month, in a non-leap year like the datetime timestamps
+_DAYS_BEFORE_MONTH = (0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)
+YEAR_START = datetime(1900, 1, 1)
+
+# consecutive lines usually share a timestamp, so remember the last one parsed
+_last_ms = (None, 0)
+_last_datetime = (None, None)
+
+
+def _time_text(text):
+    """Strips anything after the timestamp, e.g. the event type from the first part of a split line."""
+    i = text.find("  ")
+    if i >= 0:
+        return text[:i]
+
+    return text
+
+
+def _parse_time_fields(text):
+    date, time = text.split(" ", 1)
+    month, day = date.split("/")
+    hours, minutes, seconds = time.split(":")
+    seconds, millis = seconds.split(".")
+
+    return int(month), int(day), int(hours), int(minutes), int(seconds), int(millis)
+
+
+def parse_time_ms(text):
+    """
+    Converts raw log timestamp, `M/D HH:MM:SS.mmm`, to integer milliseconds since the start of the year.
+
+    :param text: the timestamp, optionally followed by two spaces and the event type
+    """
+    global _last_ms
+
+    text = _time_text(text)
+    if text == _last_ms[0]:
+        return _last_ms[1]
+
+    month, day, hours, minutes, seconds, millis = _parse_time_fields(text)
+
+    days = _DAYS_BEFORE_MONTH[month] + day - 1
+    ms = (((days * 24 + hours) * 60 + minutes) * 60 + seconds) * 1000 + millis
+
+    _last_ms = (text, ms)
+    return ms
+
+
+def ms_to_timedelta(ms):
+    """Converts integer milliseconds to a timedelta."""
+    return timedelta(milliseconds=ms)
+
+
+def ms_to_datetime(ms):
+    """Converts integer milliseconds since the start of the year to the same datetime as `get_time_stamp` gives."""
+    return YEAR_START + timedelta(milliseconds=ms)
+
+
 def get_time_stamp(text):
     """Converts raw log timestamp to datetime object"""
-    return datetime.strptime(text.split("  ")[0], STR_P_TIME)
+    global _last_datetime
+
+    text = _time_text(text)
+    if text == _last_datetime[0]:
+        return _last_datetime[1]
+
+    month, day, hours, minutes, seconds, millis = _parse_time_fields(text)
+
+    # same year as strptime would give, when it is not in the format
+    timestamp = datetime(1900, month, day, hours, minutes, seconds, millis * 1000)
+
+    _last_datetime = (text, timestamp)
+    return timestamp
 
 
 class ProgressBar:
@@ -20,6 +20,200 @@ def test_read_from_api():
     assert len(all_events) == 345
 
 
+def test_read_from_api_stub(monkeypatch):
+    import asyncio
+    from .wcl_stub import StubWCL, CODE
+
+    monkeypatch.setenv("WCL_API_KEY", "stub")
+    from ..src.readers.read_from_api import APIProcessor
+    from ..src.readers.api_client import APIClient
+
+    with StubWCL(latency=0.01, page_size=50) as stub:
+        client = APIClient(api_key="stub")
+
+        concurrent = APIProcessor(CODE, api_root=stub.api_root, max_concurrency=3, client=client)
+        concurrent.process(damage_taken=True)
+        max_in_flight = stub.max_in_flight
+
+        sequential = APIProcessor(CODE, api_root=stub.api_root, max_concurrency=1, client=client)
+        sequential.process(damage_taken=True)
+
+        # also from within a running event loop, as in Jupyter
+        in_loop = APIProcessor(CODE, api_root=stub.api_root, max_concurrency=3, client=client)
+
+        async def process_in_loop():
+            in_loop.process(damage_taken=True)
+
+        asyncio.run(process_in_loop())
+
+    # every event exactly once, in order
+    timestamps = [e.timestamp for e in concurrent.all_events]
+    assert len(concurrent.heals) == len(stub.streams["healing"])
+    assert len(concurrent.damage) == len(stub.streams["damage-taken"])
+    assert timestamps == sorted(timestamps)
+
+    assert concurrent.all_events == sequential.all_events
+    assert concurrent.all_events == in_loop.all_events
+    assert 1 < max_in_flight <= 3
+
+
+def test_api_filters(monkeypatch):
+    from .wcl_stub import StubWCL, CODE
+
+    monkeypatch.setenv("WCL_API_KEY", "stub")
+    from ..src.readers.read_from_api import APIProcessor
+    from ..src.readers.api_client import APIClient
+    from ..src.readers.api_paging import fight_ranges
+
+    fights = [dict(start_time=10, end_time=20), dict(start_time=20, end_time=30), dict(start_time=40, end_time=50)]
+    assert fight_ranges(fights, 0, 60) == [(0, 10), (10, 20), (20, 30), (30, 40), (40, 50), (50, 60)]
+    assert fight_ranges(fights, 15, 45, gaps=False) == [(15, 20), (20, 30), (40, 45)]
+
+    with StubWCL(page_size=50, n_healers=6, trash_events=100) as stub:
+        client = APIClient(api_key="stub")
+
+        everything = APIProcessor(CODE, api_root=stub.api_root, client=client, boss_only=False)
+        everything.process(damage_taken=True)
+        all_requests = stub.requests
+
+        bosses = [(f["start_time"], f["end_time"]) for f in everything.get_fights()["fights"] if f["boss"] != 0]
+
+        filtered = APIProcessor(CODE, "Saintis", api_root=stub.api_root, client=client)
+        filtered.process(damage_taken=True)
+        filtered_requests = stub.requests - all_requests
+
+    def expected(events, name):
+        from ..src.readers.read_from_api import _get_ms
+
+        in_boss = [any(s <= _get_ms(e.timestamp) <= e_ for s, e_ in bosses) for e in events]
+        return [e for e, keep in zip(events, in_boss) if keep and name(e) == "Saintis"]
+
+    assert 0 < len(filtered.heals) < len(everything.heals)
+    assert list(filtered.heals) == expected(everything.heals, lambda e: e.source)
+    assert list(filtered.damage) == expected(everything.damage, lambda e: e.target)
+    assert filtered_requests * 4 < all_requests
+
+
+def test_api_client(capsys):
+    import pytest
+    from .wcl_stub import StubWCL, CODE
+    from ..src.readers.api_client import APIClient, APIError
+    from ..src.readers.read_from_api import APIProcessor
+
+    with StubWCL(errors=(429, 503)) as stub:
+        client = APIClient(api_key="stub", backoff=0.0)
+
+        # transient errors are retried
+        fights = client.get(f"{stub.api_root}/report/fights/{CODE}")
+        assert len(fights["fights"]) == 6
+        assert (client.stats.requests, client.stats.retries) == (3, 2)
+
+        # connections are reused
+        for _ in range(5):
+            client.get(f"{stub.api_root}/report/fights/{CODE}")
+        assert stub.connections < stub.requests
+
+        # other errors are raised
+        with pytest.raises(APIError):
+            client.get(f"{stub.api_root}/report/unknown/{CODE}")
+
+        client.close()
+
+    # processors print the error and exit, from the requests for the fights and for the event pages alike
+    with StubWCL(errors=(500,)) as stub:
+        client = APIClient(api_key="stub", max_retries=0)
+        processor = APIProcessor(CODE, api_root=stub.api_root, client=client)
+
+        with pytest.raises(SystemExit) as ex:
+            processor.get_fights()
+        assert ex.value.code == 200
+
+        processor.get_fights()
+        stub.errors.append(503)
+        with pytest.raises(SystemExit) as ex:
+            processor.process()
+        assert ex.value.code == 200
+
+        client.close()
+
+    assert "Status code: 503" in capsys.readouterr().out
+
+
+def test_api_key(tmpdir, monkeypatch, capsys):
+    import pytest
+    from ..src.readers import read_from_api
+    from ..src.readers.read_from_api import APIProcessor
+
+    monkeypatch.delenv("WCL_API_KEY", raising=False)
+    monkeypatch.setattr(read_from_api, "_clients", dict())
+    monkeypatch.chdir(tmpdir)
+
+    # a missing key is found when the processor is made, before any request
+    with pytest.raises(SystemExit) as ex:
+        APIProcessor("code")
+    assert ex.value.code == 100
+    assert capsys.readouterr().out == "API key not found. Please save in a plain text file called `apikey.txt`.\n"
+
+    tmpdir.join("apikey.txt").write("key\n")
+    assert APIProcessor("code").client.api_key == "key"
+
+
+def test_response_cache(tmpdir, monkeypatch):
+    import os
+    import time
+    from .wcl_stub import StubWCL, CODE
+    from ..src.readers.api_client import APIClient
+    from ..src.readers.response_cache import ResponseCache
+
+    monkeypatch.setenv("WCL_API_KEY", "stub")
+    from ..src.readers.read_from_api import APIProcessor
+
+    cache = ResponseCache(tmpdir.strpath)
+
+    with StubWCL() as stub:
+        for mode, n_requests in (("use", 1), ("use", 1), ("refresh", 2), ("bypass", 3), ("use", 3)):
+            client = APIClient(api_key="stub", cache=cache, cache_mode=mode)
+            client.get(f"{stub.api_root}/report/fights/{CODE}")
+            assert stub.requests == n_requests, mode
+
+        # a second processor for the same report never hits the network
+        client = APIClient(api_key="stub", cache=cache)
+        first = APIProcessor(CODE, api_root=stub.api_root, client=client)
+        first.process(damage_taken=True)
+        n_requests = stub.requests
+
+        second = APIProcessor(CODE, api_root=stub.api_root, client=client)
+        second.process(damage_taken=True)
+        assert stub.requests == n_requests
+        assert second.all_events == first.all_events
+
+        # nothing of a report still being logged is cached, as it may change
+        stub.fights["end"] = round(time.time() * 1000)
+        live_cache = ResponseCache(tmpdir.join("live").strpath)
+        client = APIClient(api_key="stub", cache=live_cache)
+        APIProcessor(CODE, api_root=stub.api_root, client=client).process()
+        assert live_cache.entries() == []
+
+    # replacing a response keeps the running total of the size right
+    cache.put("url", dict(), dict(events=[]))
+    for n in (100, 10, 100):
+        cache.put("url", dict(), dict(events=list(range(n))))
+    assert cache.size() == sum(size for _, size, _ in cache.entries())
+
+    # least recently used responses are evicted first
+    entries = sorted(cache.entries())
+    oldest, newest = entries[0][2], entries[-1][2]
+    os.utime(oldest)
+    time.sleep(0.01)
+
+    cache.max_bytes = cache.size() - entries[1][1]
+    cache.evict()
+
+    assert os.path.exists(oldest) and os.path.exists(newest)
+    assert len(cache.entries()) < len(entries)
+    assert cache.size() <= cache.max_bytes
+
+
 def test_read_from_raw():
     from ..src.readers import read_from_raw as raw
 
@@ -27,3 +221,332 @@ def test_read_from_raw():
 
     # TODO: get better test for this.
     assert len(all_events) == 324
+
+
+def test_read_from_raw_stream():
+    from ..src.readers.read_from_raw import RawProcessor
+
+    streamed = RawProcessor(log_file, character_name=character, include_damage=True, stream=True)
+    in_memory = RawProcessor(log_file, character_name=character, include_damage=True, stream=False)
+
+    encounter = streamed.get_encounters()[0]
+    assert (encounter.start, encounter.end) == (98, 3402537)
+
+    streamed.process(encounter=encounter)
+    in_memory.process(encounter=encounter)
+
+    assert streamed.all_events == in_memory.all_events
+    assert streamed.get_casts(encounter) == in_memory.get_casts(encounter)
+
+
+def test_encounter_index(tmpdir):
+    import shutil
+    from ..src.readers import log_index
+
+    log_copy = tmpdir.join("log.txt").strpath
+    shutil.copy(log_file, log_copy)
+
+    assert log_index.load_index(log_copy) is None
+
+    entries = log_index.get_index(log_copy)
+    assert [(e.boss, e.start, e.end, e.start_time) for e in entries] == [("Onyxia", 98, 3402537, "4/28 18:48:29.036")]
+    assert len(log_index.load_index(log_copy)) == 1
+
+    # index is invalidated when the log changes
+    with open(log_copy, "a") as fh:
+        fh.write('4/28 19:00:00.000  ENCOUNTER_START,1084,"Onyxia",9,40,249\n')
+
+    assert log_index.load_index(log_copy) is None
+
+
+def test_parsed_log_cache(tmpdir):
+    import os
+    import shutil
+    from ..src.readers import log_cache
+    from ..src.readers.read_from_raw import RawProcessor
+
+    log_copy = tmpdir.join("log.txt").strpath
+    shutil.copy(log_file, log_copy)
+
+    assert log_cache.load_cache(log_copy) is None
+
+    def process(first_encounter=False, **kwargs):
+        processor = RawProcessor(log_copy, character_name=character, include_damage=True, **kwargs)
+        processor.process(encounter=processor.get_encounters()[0] if first_encounter else None)
+        return processor
+
+    # a single encounter is parsed on its own, without making the cache
+    parsed = process(first_encounter=True)
+    assert process(first_encounter=True, use_cache=True).all_events == parsed.all_events
+    assert log_cache.load_cache(log_copy) is None
+
+    # the cache is made when processing the whole log, and read from after
+    parsed = process()
+    for _ in range(2):
+        cached = process(use_cache=True)
+
+        assert cached.all_events == parsed.all_events
+        assert cached.deaths == parsed.deaths
+        assert log_cache.load_cache(log_copy) is not None
+
+    # still valid when only the modification time changes
+    os.utime(log_copy, ns=(0, 0))
+    assert log_cache.load_cache(log_copy) is not None
+
+    # invalidated when the log changes
+    with open(log_copy, "a") as fh:
+        fh.write(
+            '4/28 19:00:00.000  UNIT_DIED,0000000000000000,nil,0x80000000,0x80000000,Player-1,"Saintis",0x511,0x0\n'
+        )
+
+    assert log_cache.load_cache(log_copy) is None
+
+
+def test_scan_events():
+    from ..src.readers.scanner import scan_lines, scan_events, scan_blocks
+    from ..src.readers.read_from_raw import get_lines
+
+    event_types = ("SPELL_HEAL", "UNIT_DIED")
+    expected = [l for l in get_lines(log_file) if l.split(",")[0].split("  ")[1] in event_types]
+
+    assert list(scan_lines(log_file, event_types)) == expected
+    assert list(scan_lines(log_file, ("ENCOUNTER_END",), end=3402537)) == []
+
+    # small blocks, so lines are split between blocks
+    assert list(scan_blocks(log_file, event_types, block_size=1000)) == list(scan_events(log_file, event_types))
+
+
+def test_event_table():
+    from ..src.readers.event_table import EventTable, DIRECT_HEAL, PERIODIC_HEAL, DAMAGE, HEAL_KINDS
+    from ..src.readers.event_types import HealEvent, DamageTakenEvent
+
+    table = EventTable(chunk_size=2)
+    table.append(DIRECT_HEAL, 30, "Saintis", "Player-1", "10917", "Tank", "Player-2", 50, 2000, 500, crit=True)
+    table.append(DAMAGE, 20, None, None, 0, "Tank", "Player-2", None, -1000, -200, overkill=-1)
+    table.append(PERIODIC_HEAL, 10, "Saintis", "Player-1", "10929", "Tank", "Player-2", 90, 300, 0)
+
+    assert len(table) == 3
+
+    table.sort()
+    heals = table.view(HEAL_KINDS)
+
+    assert len(heals) == 2
+    assert heals[0] == HealEvent(10, "Saintis", "Player-1", "10929", "Tank", "Player-2", 90, 300, 0, False)
+    assert heals[-1].is_crit
+    assert table.view()[1] == DamageTakenEvent(20, None, None, 0, "Tank", "Player-2", None, -1000, -200, -1)
+
+    # views follow the table as it grows
+    table.append(DIRECT_HEAL, 40, "Saintis", "Player-1", "10917", "Tank", "Player-2", 80, 2000, 0)
+    assert len(heals) == 3
+
+    spells = heals.group_by_spell()
+    assert list(spells) == ["10929", "10917"]
+    assert spells["10917"][1].tolist() == [500, 0]
+
+
+def test_decoder():
+    from ..src.readers.decoder import EventDecoder, split_line
+    from ..src.readers.read_from_raw import get_lines
+
+    heal = (
+        '4/28 19:00:00.000  SPELL_HEAL,Player-1,"Saintis-Dreadmist",0x511,0x0,Player-2,"Vek\'lor, Emperor",0x512,0x0,'
+        '10917,"Flash Heal",0x2,Player-2,0000000000000000,80,100,0,0,0,-1,0,0,0,1.0,2.0,0,0.0,60,1200,1500,300,0,1\n'
+    )
+    timestamp, event_type, fields = split_line(heal)
+    assert (timestamp, event_type) == ("4/28 19:00:00.000", "SPELL_HEAL")
+    assert fields[5] == '"Vek\'lor, Emperor"'
+    assert fields[-1] == "1"
+
+    decoder = EventDecoder(("source", "target", "spell_id", "health_pct", "amount", "overheal", "critical", "overkill"))
+    record = decoder.decode(heal)
+    assert record == decoder.record(
+        "SPELL_HEAL", "4/28 19:00:00.000", "Saintis", "Vek'lor, Emperor", "10917", 80, 1200, 300, True, None
+    )
+
+    # logs without advanced logging have no unit info
+    basic = (
+        '4/28 19:00:00.000  SPELL_HEAL,Player-1,"Saintis",0x511,0x0,Player-2,"Tank",0x512,0x0,10917,"Flash Heal",0x2,'
+        "1200,1500,300,0,nil"
+    )
+    record = decoder.decode(basic)
+    assert (record.target, record.health_pct, record.amount, record.overheal, record.critical) == (
+        "Tank",
+        None,
+        1200,
+        300,
+        False,
+    )
+
+    assert decoder.decode('4/28 19:00:00.000  ENCOUNTER_START,1084,"Onyxia",9,40,249') is None
+
+    skipping = EventDecoder(("amount",), skip={"target_id": "Creature"})
+    damage = [l for l in get_lines(log_file) if "SWING_DAMAGE_LANDED" in l]
+    assert damage
+    assert all(skipping.decode(l) is None for l in damage if "Creature" in l.split(",")[5])
+
+
+def test_parallel_parse(monkeypatch):
+    from ..src.readers import parallel_parse, log_index
+    from ..src.readers.read_from_raw import RawProcessor
+
+    with open(log_file, "rb") as fh:
+        log_data = fh.read()
+
+    ranges = parallel_parse.chunk_ranges(log_file, 7)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(log_data)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(log_data[start - 1 : start] == b"\n" for start, _ in ranges[1:])
+
+    # small chunks, so encounters span several chunks
+    serial = RawProcessor(log_file, jobs=1).parse_all()
+    table, entries = parallel_parse.parse_log(log_file, jobs=2, min_chunk_size=100000)
+
+    assert len(table) == len(serial)
+    assert table.view() == serial.view()
+    assert table.data["offset"].tolist() == serial.data["offset"].tolist()
+    assert [e.to_dict() for e in entries] == [e.to_dict() for e in log_index.build_index(log_file)]
+
+    monkeypatch.setattr(parallel_parse, "MIN_CHUNK_SIZE", 100000)
+    processors = [RawProcessor(log_file, character_name=character, jobs=jobs) for jobs in (1, 2)]
+    for processor in processors:
+        encounter = processor.get_encounters()[0]
+        processor.process(encounter=encounter)
+
+    assert processors[1].heals == processors[0].heals
+    assert processors[1].deaths == processors[0].deaths
+
+
+def test_log_follower(tmpdir):
+    from ..src.readers.log_follower import LogFollower
+    from ..src.readers.read_from_raw import RawProcessor
+
+    with open(log_file, "rb") as fh:
+        log_data = fh.read()
+
+    reference = RawProcessor(log_file, character_name=character)
+    reference_encounter = reference.get_encounters()[0]
+    reference.process(encounter=reference_encounter)
+
+    # write the log in pieces, cutting lines in half, as the client does while writing
+    log_copy = str(tmpdir.join("WoWCombatLog.txt"))
+    with open(log_copy, "wb") as fh:
+        fh.write(log_data[: reference_encounter.start + 10])
+
+    follower = LogFollower(log_copy, character_name=character)
+    assert follower.poll() == []
+
+    cuts = [reference_encounter.start + 10, (reference_encounter.start + reference_encounter.end) // 2 + 7]
+    cuts += [reference_encounter.end + 5, len(log_data)]
+
+    finished = []
+    for cut_start, cut_end in zip(cuts, cuts[1:]):
+        with open(log_copy, "ab") as fh:
+            fh.write(log_data[cut_start:cut_end])
+
+        finished += follower.poll()
+
+    assert len(finished) == 1
+    encounter, processor = finished[0]
+
+    assert (encounter.boss, encounter.start, encounter.end) == (
+        "Onyxia",
+        reference_encounter.start,
+        reference_encounter.end,
+    )
+    assert encounter.start_t == reference_encounter.start_t and encounter.end_t == reference_encounter.end_t
+    assert len(processor.heals) > 0
+    assert processor.heals == reference.heals
+    assert processor.deaths == reference.deaths
+
+    # following from the end of a log misses nothing new, and gives nothing old
+    assert LogFollower(log_copy).poll() == []
+    assert len(LogFollower(log_copy, from_start=True).poll()) == 1
+
+
+def test_get_casts(tmpdir):
+    from datetime import datetime
+    from ..src.readers.read_from_raw import RawProcessor
+
+    source = 'Player-1,"Saintis-Dreadmist",0x511,0x0'
+    target = 'Player-2,"Tank-Dreadmist",0x512,0x0'
+    no_target = "0000000000000000,nil,0x80000000,0x80000000"
+    advanced = "0000000000000000,100,100,0,0,0,-1,0,0,0,0.00,0.00,0,0.0000,60"
+    flash_heal = '10917,"Flash Heal",0x2'
+    heal = '6064,"Heal",0x2'
+
+    lines = [
+        f"19:00:00.000  SPELL_CAST_START,{source},{no_target},{flash_heal}",
+        # the next cast starts in the same batch as the first succeeds, but is logged before it
+        f"19:00:01.500  SPELL_CAST_START,{source},{no_target},{heal}",
+        f"19:00:01.500  SPELL_CAST_SUCCESS,{source},{target},{flash_heal},Player-1,{advanced}",
+        f"19:00:02.000  SPELL_CAST_START,{source},{no_target},{flash_heal}",
+        f'19:00:03.000  SPELL_CAST_FAILED,{source},{no_target},{flash_heal},"Interrupted"',
+        f"19:00:04.000  SPELL_CAST_START,{source},{no_target},{flash_heal}",
+        f"19:00:05.500  SPELL_CAST_SUCCESS,{source},{target},{flash_heal},Player-1,{advanced}",
+        f"19:00:05.500  SPELL_HEAL,{source},{target},{flash_heal},Player-2,{advanced},900,900,0,0,nil",
+    ]
+
+    log_copy = str(tmpdir.join("casts.txt"))
+    with open(log_copy, "w") as fh:
+        fh.write("".join(f"4/28 {line}\n" for line in lines))
+
+    casts, heals = RawProcessor(log_copy, use_index=False).get_casts()
+
+    def t(text):
+        return datetime(1900, 4, 28, 19, 0, int(text.split(".")[0]), int(text.split(".")[1]) * 1000)
+
+    assert casts == [
+        ("Saintis", t("0.000"), t("1.500"), "10917", "Tank"),
+        ("Saintis", t("1.500"), t("2.000"), "6064", "[Cancelled]"),
+        ("Saintis", t("2.000"), t("3.000"), "10917", "[Interrupted]"),
+        ("Saintis", t("4.000"), t("5.500"), "10917", "Tank"),
+    ]
+    assert heals == [("Saintis", t("4.000"), t("5.500"), t("5.500"), 0, "10917", "Tank", 900)]
+
+
+def test_event_bus():
+    from ..src.readers.event_bus import EventBus
+    from ..src.readers.read_from_raw import RawProcessor, CastMatcher, CAST_DECODER
+    from ..src.readers.decoder import EventDecoder
+    from ..src.readers.scanner import scan_lines
+    from .. import count_buffs
+
+    processor = RawProcessor(log_file, character_name=character)
+    encounter = processor.get_encounters()[0]
+
+    bus = EventBus()
+    bus_processor = RawProcessor(log_file, character_name=character, include_damage=True)
+    bus_processor.subscribe(bus, encounter)
+
+    buff_handlers, buff_data = count_buffs.buff_handlers()
+    bus.subscribe(buff_handlers, count_buffs.DECODER.fields)
+
+    matcher = CastMatcher()
+    bus.subscribe(matcher.handlers(), CAST_DECODER.fields, finish=matcher.finish)
+
+    # lines skipped for one subscriber are still given to the others
+    creature_deaths = []
+    bus.subscribe({"UNIT_DIED": lambda record, offset: creature_deaths.append(record.target_id)}, ("target_id",))
+
+    bus.run(log_file, encounter.start, encounter.end)
+
+    assert set(bus.fields) >= set(CAST_DECODER.fields) | set(count_buffs.DECODER.fields)
+
+    processor.include_damage = True
+    processor.process(encounter=encounter)
+    assert bus_processor.all_events == processor.all_events
+    assert bus_processor.deaths == processor.deaths
+
+    encounter_log = scan_lines(log_file, count_buffs.BUFF_EVENTS, encounter.start, encounter.end)
+    handlers, expected = count_buffs.buff_handlers()
+    count_buffs.DECODER.dispatch(encounter_log, handlers)
+    assert buff_data == expected
+
+    assert (matcher.cast_list, matcher.full_heal_data) == RawProcessor(log_file).get_casts(encounter)
+
+    decoder = EventDecoder(("target_id",))
+    died = [
+        decoder.decode(line).target_id for line in scan_lines(log_file, ("UNIT_DIED",), encounter.start, encounter.end)
+    ]
+    assert any("Creature" in unit_id for unit_id in creature_deaths)
+    assert creature_deaths == died
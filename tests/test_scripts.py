@@ -122,6 +122,17 @@ Encounter to analyse: """
     )
 
 
+def test_run_all(script_runner):
+    ret = script_runner.run(python, "run_all.py", log_file, character, "-e", "1")
+    assert ret.success
+    assert ret.stderr == ""
+
+    # the same crit analysis as the script, from the single read of the log
+    assert overheal_crit_output.strip() in ret.stdout
+    assert "Evaluation of 3T1  (Onyxia, 253s)" in ret.stdout
+    assert "Deaths:" in ret.stdout
+
+
 def test_overheal_cdf(script_runner, tmpdir):
     path = tmpdir.strpath
     ret = script_runner.run(python, "overheal_cdf.py", log_file, character, "--path", path)
@@ -216,3 +227,149 @@ Saving fig for Saintis, 10929, None
     expected_files = (f"{character}_heal_{i}.png" for i in expected_ids)
     for f in expected_files:
         assert f in filenames
+
+
+def test_overheal_plot_jobs(script_runner, tmpdir):
+    serial_path = tmpdir.mkdir("serial").strpath
+    parallel_path = tmpdir.mkdir("parallel").strpath
+
+    serial = script_runner.run(python, "overheal_plot.py", log_file, character, "--path", serial_path, "-e", "0")
+    parallel = script_runner.run(
+        python, "overheal_plot.py", log_file, character, "--path", parallel_path, "-e", "0", "--jobs", "3"
+    )
+
+    assert parallel.success
+    assert parallel.stderr == ""
+
+    # same output and figures, with the same names
+    assert parallel.stdout == serial.stdout
+    assert sorted(os.listdir(parallel_path)) == sorted(os.listdir(serial_path))
+
+
+def test_lazy_imports(script_runner):
+    scripts = (
+        "overheal_table",
+        "overheal_plot",
+        "overheal_probability",
+        "overheal_cdf",
+        "track_damage_taken",
+        "optimise_casts",
+    )
+    loaded = "print(sorted(m for m in ('numpy', 'matplotlib', 'requests') if m in sys.modules))"
+
+    # importing the scripts doesn't load heavy modules
+    ret = script_runner.run(python, "-c", f"import sys, {', '.join(scripts)}; {loaded}")
+    assert ret.success
+    assert ret.stdout == "[]\n"
+
+    # nor does the API reader, which also doesn't need an API key until a processor is made
+    env = {k: v for k, v in os.environ.items() if k != "WCL_API_KEY"}
+    ret = script_runner.run(python, "-c", f"import sys, src.readers.read_from_api; {loaded}", env=env)
+    assert ret.success
+    assert ret.stdout == "['numpy']\n"
+
+    ret = script_runner.run(python, "overheal_plot.py", "-h")
+    assert ret.success
+    assert "usage: overheal_plot.py" in ret.stdout
+
+
+def test_split_log(script_runner, tmpdir):
+    import gzip
+    import json
+
+    def encounter(time, boss, event="ENCOUNTER_END", win=1):
+        suffix = f",{win}" if event == "ENCOUNTER_END" else ""
+        return f'5/12 {time}  {event},1,"{boss}",9,40{suffix}\r\n'.encode()
+
+    trash = b"5/12 19:00:00.000  SPELL_HEAL,...\r\n"
+    parts = (
+        # Molten Core cleared, then a few bosses of Blackwing Lair, then Onyxia
+        trash
+        + encounter("19:00:01.000", "Lucifron", "ENCOUNTER_START")
+        + trash
+        + encounter("19:00:02.000", "Lucifron"),
+        trash + encounter("20:00:00.000", "Ragnaros", "ENCOUNTER_START") + encounter("20:00:01.000", "Ragnaros"),
+        trash + encounter("21:00:00.000", "Firemaw", "ENCOUNTER_START") + encounter("21:00:01.000", "Firemaw"),
+        trash + encounter("22:00:00.000", "Onyxia", "ENCOUNTER_START") + encounter("22:00:01.000", "Onyxia"),
+        trash,
+    )
+    log = tmpdir.join("log.txt")
+    log.write_binary(b"".join(parts))
+
+    ret = script_runner.run(python, "split_log.py", str(log), "-y", "2020", "-o", tmpdir.strpath)
+    assert ret.success
+    assert ret.stderr == ""
+
+    names = ("MC-2020-05-12.txt", "BWL-2020-05-12.txt", "Ony-2020-05-12.txt", "rem-2020-05-12.txt")
+    assert [tmpdir.join(name).read_binary() for name in names] == [
+        parts[0] + parts[1],
+        parts[2],
+        parts[3],
+        parts[4],
+    ]
+
+    with open(tmpdir.join("MC-2020-05-12.txt.idx.json")) as fp:
+        index = json.load(fp)["encounters"]
+
+    assert [(e["boss"], e["start"]) for e in index] == [
+        ("Lucifron", len(trash)),
+        ("Ragnaros", len(parts[0]) + len(trash)),
+    ]
+
+    ret = script_runner.run(python, "split_log.py", str(log), "-o", tmpdir.strpath, "--compress", "gzip")
+    assert ret.success
+
+    with gzip.open(tmpdir.join("BWL--05-12.txt.gz")) as fh:
+        assert fh.read() == parts[2]
+
+    # compressed parts have no index
+    assert "without an encounter index" in ret.stdout
+    assert not tmpdir.join("BWL--05-12.txt.gz.idx.json").exists()
+
+
+def test_optimise_casts(script_runner, tmpdir):
+    path = tmpdir.strpath
+    args = (python, "optimise_casts.py", log_file, character, "-e", "1", "--path", path, "-n", "20", "--seed", "1")
+
+    ret = script_runner.run(*args)
+    assert ret.success
+    assert ret.stderr == ""
+
+    # a row for the basic strategy and for casting only each rank, all over the same crit rolls
+    rows = [line.split() for line in ret.stdout.split("\n") if line.startswith("  Only") or "Basic Strategy" in line]
+    assert len(rows) == 17
+    assert "Highest healing: Only Heal (Rank 1)" in ret.stdout
+
+    _, _, filenames = next(os.walk(tmpdir))
+    assert filenames == ["overview.png"]
+
+    # the same seed rolls the same crits, also over several processes
+    assert script_runner.run(*args).stdout == ret.stdout
+    assert script_runner.run(*args, "-j", "2").stdout == ret.stdout
+
+
+def test_optimise_casts_targeting(script_runner, tmpdir):
+    import json
+
+    # the raid setup is read from the working directory
+    script = os.path.abspath("optimise_casts.py")
+    args = (python, script, os.path.abspath(log_file), character, "-e", "1", "--path", tmpdir.strpath, "-n", "5")
+
+    ret = script_runner.run(*args, "--targeting", "tanks", cwd=tmpdir.strpath)
+    assert not ret.success
+    assert "Could not find raid setup file `raid.json`" in ret.stdout
+
+    raid = {"healers": [character], "tanks": ["Bokito", "Kratos"], "groups": [["Bokito", "Kratos", "Owl"]]}
+    tmpdir.join("raid.json").write(json.dumps(raid))
+
+    outputs = dict()
+    for targeting in ("largest", "tanks", "groups"):
+        ret = script_runner.run(*args, "--seed", "1", "--targeting", targeting, cwd=tmpdir.strpath)
+        assert ret.success
+        assert ret.stderr == ""
+        assert "Highest healing:" in ret.stdout
+
+        outputs[targeting] = ret.stdout
+
+    # healing other targets first heals differently
+    assert len(set(outputs.values())) == 3
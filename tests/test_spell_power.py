@@ -0,0 +1,142 @@
+"""
+Tests for the vectorised spell power calculations.
+
+By: Filip Gökstorp (Saintis-Dreadmist), 2020
+"""
+import numpy as np
+
+
+def _random_lines(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    heals = rng.integers(500, 3000, n)
+    overheals = np.minimum(heals, rng.integers(0, 2500, n) * rng.integers(0, 2, n))
+    crits = rng.random(n) < 0.2
+
+    return list(zip(heals.tolist(), overheals.tolist(), crits.tolist()))
+
+
+def _process_lines_for_spell(lines, dh, base_heal=None):
+    """The per-step loop sweep_lines_for_spell replaced, for comparison."""
+    n_h = 0
+    n_oh = 0
+    n_f_oh = 0
+    n_oh_nc = 0
+
+    total_h = 0.0
+    total_oh = 0.0
+
+    total_h_nc = 0.0
+    total_oh_nc = 0.0
+
+    for h, oh, crit in lines:
+        dh_c = dh
+
+        oh_nc = oh
+        h_nc = h
+
+        if base_heal and h < base_heal:
+            # Skip unexpectedly low heals
+            continue
+
+        if crit:
+            # scale spell power differential by 1.5 if spell was a crit
+            dh_c *= 1.5
+
+            # Scale oh down
+            h_nc = h / 1.5
+            oh_nc = oh - (h - h_nc)
+
+        # remove spell power contribution
+        h -= dh_c
+        oh -= dh_c
+        if oh < 0.0:
+            oh = 0.0
+
+        h_nc -= dh
+        oh_nc -= dh
+        if oh_nc < 0.0:
+            oh_nc = 0.0
+
+        n_h += 1
+
+        if oh > 0.0:
+            n_oh += 1
+            if oh >= h:
+                n_f_oh += 1
+
+        if oh_nc > 0.0:
+            n_oh_nc += 1
+
+        total_h += h
+        total_oh += oh
+
+        total_h_nc += h_nc
+        total_oh_nc += oh_nc
+
+    return n_h, n_oh, n_f_oh, n_oh_nc, total_h, total_oh, total_h_nc, total_oh_nc
+
+
+def test_spell_power_sweep():
+    from ..overheal_plot import sweep_lines_for_spell
+
+    lines = _random_lines()
+    dhs = -np.linspace(0, 400, 41) * 0.857
+
+    # small chunks, to check chunking gives the same result
+    swept = sweep_lines_for_spell(lines, dhs, base_heal=800, chunk_size=3000)
+
+    for i, dh in enumerate(dhs):
+        expected = _process_lines_for_spell(lines, dh, base_heal=800)
+
+        assert [int(c[i]) for c in swept[:4]] == list(expected[:4])
+        assert np.allclose([c[i] for c in swept[4:]], expected[4:])
+
+
+def test_spell_power_sweep_no_heals(tmpdir, capsys):
+    import os
+    import warnings
+    from ..overheal_plot import plot_spell
+
+    # all heals below the base heal of Flash Heal (Rank 7) are skipped, leaving nothing to plot
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        plot_spell("Saintis", "10917", [(500, 0, False), (800, 100, True)], np.linspace(0, -400, 401), 0, 200, tmpdir)
+
+    assert capsys.readouterr().out == "No heals of 10917 at or above its base heal, skipping it.\n"
+    assert os.listdir(tmpdir) == []
+
+
+def _loop_overheal_counts(lines, coefficient, spell_powers):
+    """The per-point loop overheal_counts replaced, for comparison."""
+    counts = []
+
+    for sp in spell_powers:
+        n_h = n_oh = n_oh_nc = 0
+
+        for h, oh, crit in lines:
+            dh = coefficient * -sp
+            dh_c = dh * 1.5 if crit else dh
+            oh_nc = oh - (h - h / 1.5) if crit else oh
+
+            if h - dh_c < 0.0:
+                continue
+
+            n_h += 1
+            n_oh += oh - dh_c > 0.0
+            n_oh_nc += oh_nc - dh > 0.0
+
+        counts.append((n_h, n_oh, n_oh_nc))
+
+    return counts
+
+
+def test_overheal_counts():
+    from ..overheal_probability import overheal_counts
+
+    # include some overheals larger than the heal, and heals that go negative
+    lines = _random_lines(seed=1) + [(600, 900, False), (700, 1000, True), (100, 0, False)]
+    spell_powers = np.linspace(0, -1000, 201)
+
+    counts = overheal_counts(lines, 0.857, spell_powers)
+
+    assert list(zip(*(c.tolist() for c in counts))) == _loop_overheal_counts(lines, 0.857, spell_powers)
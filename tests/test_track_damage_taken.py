@@ -68,3 +68,221 @@ def test_track_character_damage(script_runner, tmpdir):
     assert len(filenames) == 2
     assert f"{character}_health_deficit.png" in filenames
     assert f"{character}_damage_taken.png" in filenames
+
+
+def test_deficit_timeline():
+    from ..src.damage.damage_taken import DeficitTimeline
+
+    timeline = DeficitTimeline(checkpoint_interval=2)
+    changes = [(1.0, "a", -100), (1.0, "b", -50), (2.0, "a", -20), (3.5, "c", -300), (4.0, "b", 0)]
+    for change in changes:
+        timeline.append(*change)
+
+    expected = [
+        {"a": -100},
+        {"a": -100, "b": -50},
+        {"a": -20, "b": -50},
+        {"a": -20, "b": -50, "c": -300},
+        {"a": -20, "b": 0, "c": -300},
+    ]
+    assert len(timeline) == len(changes)
+    assert list(timeline) == expected
+    assert [timeline[i] for i in range(len(changes))] == expected
+    assert list(timeline[-1]) == ["a", "b", "c"]
+
+    assert timeline.at(0.5) == {}
+    assert timeline.at(1.0) == expected[1]
+    assert timeline.at(3.9) == expected[3]
+    assert timeline.at(10.0) == expected[4]
+
+    assert timeline.next_time(0.0) == 1.0
+    assert timeline.next_time(1.0) == 2.0
+    assert timeline.next_time(4.0) is None
+
+
+def test_evaluate_casting_strategy(tmpdir):
+    from ..src.readers.read_from_raw import RawProcessor
+    from ..src.damage.damage_taken import raid_damage_taken
+    from ..src.simulation import CharacterData, evaluate_casting_strategy
+
+    processor = RawProcessor(log_file, include_damage=True)
+    encounter = processor.get_encounters()[0]
+    processor.process(encounter=encounter)
+
+    _, _, deficits, name_dict, _ = raid_damage_taken(processor.all_events, character_name=character)
+    assert deficits.at(encounter.duration) == deficits[-1]
+
+    character_data = CharacterData(800.0, 0.0, 40.0, 200.0, 8000.0)
+    net, gross = evaluate_casting_strategy(
+        character, deficits, name_dict, character_data, encounter.duration, plot=False, show=False, path=tmpdir.strpath
+    )
+    assert 0 < net <= gross
+
+
+def test_raid_health_tracker():
+    from datetime import timedelta
+    from ..src.readers.event_types import DamageTakenEvent
+    from ..src.damage.damage_taken import RaidHealthTracker, raid_damage_taken
+
+    def event(t, target, amount, overkill=0, health_pct=50):
+        timestamp = timedelta(seconds=t)
+        return DamageTakenEvent(timestamp, "Boss", None, "0", target, "id-" + target, health_pct, amount, 0, overkill)
+
+    events = [
+        event(1.0, "a", -500),
+        event(2.0, "b", -300),
+        event(3.0, "a", -1000, overkill=-200),
+        event(4.0, "b", 100),
+        event(5.0, "a", 2000, health_pct=100),
+    ]
+
+    tracker = RaidHealthTracker()
+    tracker.add(events[0])
+    tracker.add(events[1])
+    assert (tracker.raid_deficit, tracker.dead_deficit, tracker.alive_deficit) == (-800, 0, -800)
+
+    # a dies, its deficit is counted as dead
+    tracker.add(events[2])
+    assert tracker.death_times == {"id-a": timedelta(seconds=3.0)}
+    assert (tracker.raid_deficit, tracker.dead_deficit, tracker.alive_deficit) == (-1600, -1300, -300)
+    assert tracker.deficits_time[-1] == {"id-a": 0, "id-b": -300}
+
+    tracker.add(events[3])
+    assert tracker.alive_deficit == -200
+
+    # a is resurrected and healed up
+    tracker.add(events[4])
+    assert tracker.death_times == dict()
+    assert (tracker.raid_deficit, tracker.dead_deficit) == (-200, 0)
+
+    times, deficits, deficits_time, name_dict, min_deficits = raid_damage_taken(events)
+    assert (times, deficits, name_dict, min_deficits) == (
+        tracker.times,
+        tracker.deficits,
+        tracker.name_dict,
+        tracker.min_deficits,
+    )
+    assert list(deficits_time) == list(tracker.deficits_time)
+    assert min_deficits == [0, 0, -1300, -1300, 0]
+
+
+def test_healing_simulation():
+    from ..src.damage.damage_taken import DeficitTimeline
+    from ..src.simulation import CharacterData
+    from ..src.simulation.engine import HealingSimulation
+
+    class FixedStrategy:
+        def __init__(self, *spell):
+            self.spell = spell
+
+        def pick_spell(self, deficit, mana, h, **_):
+            return self.spell
+
+    timeline = DeficitTimeline()
+    timeline.append(0.0, "a", -1000)
+    timeline.append(10.0, "b", -500)
+
+    character_data = CharacterData(0.0, 0.0, 0.0, 0.0, 1000.0)
+    sim = HealingSimulation(timeline, character_data, FixedStrategy(400, 100, 2.0), 20.0).run()
+
+    # heals a up, waits for b to take damage, then heals b up
+    assert sim.casts == 5
+    assert sim.sum_net_healing == 1500
+    assert sim.sum_gross_healing == 2000
+    assert sim.ticks == [0.0, 2.0, 4.0, 6.0, 12.0, 14.0, 20.0]
+    assert sim.manas == [1000, 900, 800, 700, 600, 500, 500]
+    assert sim.heals == [0, 400, 800, 1000, 1400, 1500, 1500]
+
+    # heal over time of 3 ticks, only the first tick of the first cast is before the end
+    sim = HealingSimulation(timeline, character_data, FixedStrategy(300, 50, 1.5, 9.0), 5.0).run()
+    assert sim.casts == 3
+    assert sim.sum_net_healing == 100
+    assert sim.mana == 850
+
+
+def test_batch_simulation():
+    import random
+    import itertools
+    from ..src.damage.damage_taken import DeficitTimeline
+    from ..src.simulation import CharacterData
+    from ..src.simulation.engine import HealingSimulation
+    from ..src.simulation.monte_carlo import BatchSimulation, evaluate_replications
+    from ..src.simulation.casting_strategy import CastingStrategy, SingleSpellStrategy
+    from ..src.simulation.targeting import TankPriority, SmartHealGroups
+
+    rng = random.Random(0)
+    timeline = DeficitTimeline()
+    t = 0.0
+    for _ in range(500):
+        t += rng.expovariate(5.0)
+        timeline.append(t, f"player{rng.randrange(10)}", -rng.randint(0, 3000))
+
+    strategies = [CastingStrategy(None), SingleSpellStrategy(None, "2054")]
+    policies = [None, TankPriority(["player0"]), SmartHealGroups([["player0", "player1", "player2"]])]
+
+    # without randomness every replication runs as the single simulation
+    for crit in (0.0, 1.0):
+        character_data = CharacterData(800.0, crit, 40.0, 200.0, 4000.0)
+
+        for strategy, policy in itertools.product(strategies, policies):
+            sim = HealingSimulation(timeline, character_data, strategy, 90.0, policy=policy).run()
+            batch = BatchSimulation(timeline, character_data, strategy, 90.0, replications=4, policy=policy).run()
+
+            assert list(batch.casts) == [sim.casts] * 4
+            assert list(batch.sum_net_healing) == [sim.sum_net_healing] * 4
+            assert list(batch.mana) == [sim.mana] * 4
+
+    character_data = CharacterData(800.0, 0.2, 40.0, 200.0, 4000.0)
+    summaries = evaluate_replications(timeline, character_data, strategies[0], 90.0, replications=200, seed=1)
+    assert summaries == evaluate_replications(timeline, character_data, strategies[0], 90.0, replications=200, seed=1)
+
+    net = summaries["net"]
+    assert net.ci_low < net.mean < net.ci_high
+    assert net.percentiles[5] <= net.percentiles[50] <= net.percentiles[95]
+    assert net.mean <= summaries["gross"].mean
+
+
+def test_targeting():
+    import random
+    import numpy as np
+    from ..src.simulation.targeting import TargetQueue, LargestDeficit, TankPriority, SmartHealGroups
+
+    # the queue gives the lowest key, the first added of equal keys
+    rng = random.Random(0)
+    queue = TargetQueue()
+    keys = dict()
+    for _ in range(2000):
+        item = rng.randrange(50)
+        keys[item] = rng.randint(-20, 5)
+        queue.update(item, keys[item])
+
+        assert queue.peek() == min(keys.items(), key=lambda kv: kv[1])
+        assert len(queue) == len(keys)
+
+    name_dict = {"id-a": "a", "id-b": "b", "id-c": "c", "id-d": "d"}
+    ids = list(name_dict)
+    policies = [LargestDeficit(), TankPriority(["d"], name_dict), SmartHealGroups([["a", "b"], ["c", "d"]], name_dict)]
+    selectors = [policy.selector() for policy in policies]
+
+    assert [selector.pick() for selector in selectors] == [(None, 0)] * 3
+
+    for player_id, deficit in zip(ids, (-500, -600, -800, -450)):
+        for selector in selectors:
+            selector.update(player_id, deficit)
+
+    # largest deficit, tank deficit counted double, most injured of the group with the largest deficit
+    assert [selector.pick() for selector in selectors] == [("id-c", -800), ("id-d", -450), ("id-c", -800)]
+
+    for selector in selectors:
+        selector.update("id-a", -1000)
+
+    assert [selector.pick() for selector in selectors] == [("id-a", -1000), ("id-a", -1000), ("id-a", -1000)]
+
+    # picking for many replications at once, the columns, gives the same
+    deficits = np.array([[-500, -1000, 0], [-600, -600, 0], [-800, -800, 0], [-450, -450, 0]], dtype=float)
+    expected = [([2, 0], [-800, -1000]), ([3, 0], [-450, -1000]), ([2, 0], [-800, -1000])]
+    for policy, (expected_targets, expected_deficits) in zip(policies, expected):
+        targets, target_deficits = policy.batch_selector(ids)(deficits)
+
+        assert list(targets[:2]) == expected_targets
+        assert list(target_deficits) == expected_deficits + [0]
@@ -0,0 +1,19 @@
+"""
+Tests for the general utility functions.
+
+By: Filip Gökstorp (Saintis-Dreadmist), 2020
+"""
+from datetime import datetime
+
+
+def test_time_stamp():
+    from ..src.utils import get_time_stamp, parse_time_ms, ms_to_timedelta, STR_P_TIME
+
+    for text in ("1/1 00:00:00.000", "3/1 00:00:00.001", "4/28 18:48:29.036  SPELL_HEAL", "12/31 23:59:59.999"):
+        expected = datetime.strptime(text.split("  ")[0], STR_P_TIME)
+
+        assert get_time_stamp(text) == expected
+        assert ms_to_timedelta(parse_time_ms(text)) == expected - datetime(1900, 1, 1)
+
+    # repeated timestamps come from the cache
+    assert parse_time_ms("4/28 18:48:29.036  SPELL_HEAL") == parse_time_ms("4/28 18:48:29.036  SPELL_CAST_START")
@@ -0,0 +1,194 @@
+"""
+Local stub of the WarcraftLogs v1 API, serving a synthetic report for tests and benchmarks.
+
+Serves the fights endpoint and the healing and damage-taken event streams, paged and filtered on source and ability the
+same way as WCL, with an optional delay per request to stand in for network latency, and optional error responses to
+stand in for a flaky server. Responses are gzip compressed if asked for, and connections kept alive. Keeps count of
+requests, connections, bytes sent and the most requests seen in flight.
+
+By: Filip Gokstorp (Saintis-Dreadmist), 2020
+"""
+import gzip
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CODE = "stubReport"
+
+PLAYERS = ({"id": 1, "name": "Saintis"}, {"id": 2, "name": "Tank"}, {"id": 3, "name": "Other"})
+
+
+def make_report(n_fights=6, fight_length=60000, gap=20000, events_per_fight=200, n_healers=2, trash_events=0):
+    """
+    Synthetic report, with evenly spaced heal and damage-taken events in each fight.
+
+    Heals are cast in turn by the healers, Saintis, Other and any extra healers, all on the Tank. With trash events
+    a trash fight is added in the gap before each boss, with that many events.
+    """
+    players = list(PLAYERS) + [dict(id=i + 4, name=f"Healer{i + 4}") for i in range(n_healers - 2)]
+    healer_ids = [1, 3] + [p["id"] for p in players[3:]]
+
+    fights = []
+    healing = []
+    damage = []
+
+    def add_events(start, length, n_events):
+        step = length // n_events
+        for j in range(n_events):
+            timestamp = start + j * step
+            source = healer_ids[j % n_healers]
+            healing.append(
+                dict(
+                    timestamp=timestamp,
+                    type="heal",
+                    sourceID=source,
+                    targetID=2,
+                    ability=dict(guid=10917),
+                    hitPoints=50,
+                    amount=1500,
+                    overheal=j % 3 * 200,
+                    hitType=2 if j % 10 == 0 else 1,
+                )
+            )
+            damage.append(
+                dict(timestamp=timestamp, type="damage", targetID=2, hitPoints=60, amount=1000, mitigated=100)
+            )
+
+    t = 0
+    for i in range(n_fights):
+        if trash_events:
+            trash_start, trash_end = t + gap // 4, t + gap * 3 // 4
+            fights.append(dict(id=len(fights) + 1, boss=0, name="Trash", start_time=trash_start, end_time=trash_end))
+            add_events(trash_start, trash_end - trash_start, trash_events)
+
+        start, end = t + gap, t + gap + fight_length
+        fights.append(dict(id=len(fights) + 1, boss=1000 + i, name=f"Boss {i + 1}", start_time=start, end_time=end))
+        add_events(start, fight_length, events_per_fight)
+
+        t = end
+
+    report = dict(fights=fights, friendlies=players, start=0, end=t + gap)
+    return report, {"healing": healing, "damage-taken": damage}
+
+
+class StubWCL:
+    """Stub WCL server, running in a background thread."""
+
+    def __init__(self, latency=0.0, page_size=50, errors=(), **report_kwargs):
+        """
+        :param latency: seconds to wait before answering each request
+        :param page_size: number of events per page
+        :param errors: status codes to answer the first requests with, e.g. (429, 503)
+        """
+        self.latency = latency
+        self.page_size = page_size
+        self.errors = list(errors)
+        self.fights, self.streams = make_report(**report_kwargs)
+
+        self.requests = 0
+        self.connections = 0
+        self.bytes = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def api_root(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def respond(self, path, query):
+        """JSON response for a request path, or None if not found."""
+        parts = path.strip("/").split("/")
+
+        if parts[:2] == ["report", "fights"]:
+            return self.fights
+
+        if parts[:2] != ["report", "events"] or parts[2] not in self.streams:
+            return None
+
+        start = int(query.get("start", [0])[0])
+        end = int(query.get("end", [self.fights["end"]])[0])
+        events = [e for e in self.streams[parts[2]] if start <= e["timestamp"] <= end]
+
+        if "sourceid" in query:
+            # like WCL, damage-taken is filtered on the target
+            key = "targetID" if parts[2] == "damage-taken" else "sourceID"
+            actor_id = int(query["sourceid"][0])
+            events = [e for e in events if e.get(key) == actor_id]
+
+        if "abilityid" in query:
+            ability_id = int(query["abilityid"][0])
+            events = [e for e in events if e.get("ability", {}).get("guid") == ability_id]
+
+        data = dict(events=events[: self.page_size])
+        if len(events) > self.page_size:
+            data["nextPageTimestamp"] = events[self.page_size]["timestamp"]
+
+        return data
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep connections alive, without waiting on delayed acks between the headers and the body
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    error = stub.errors.pop(0) if stub.errors else None
+
+                try:
+                    time.sleep(stub.latency)
+                    url = urlparse(self.path)
+                    data = stub.respond(url.path, parse_qs(url.query))
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+                if error is not None:
+                    status, data = error, dict(error="Stub error")
+                else:
+                    status = 404 if data is None else 200
+
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+
+                with stub._lock:
+                    stub.bytes += len(body)
+
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                pass
+
+        return Handler
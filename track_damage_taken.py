@@ -4,8 +4,6 @@ Track damage taken
 By: Filip Gokstorp (Saintis-Dreadmist), 2020
 """
 import os
-import numpy as np
-import matplotlib.pyplot as plt
 
 from src.readers import get_processor
 from src.damage.damage_taken import raid_damage_taken, character_damage_taken
@@ -25,6 +23,9 @@ def health_bar_chart(ax, times, deficits, health_start=0):
 def plot_character_damage(
     times, health_pcts, deficits, nets, health_ests, encounter_time, encounter=None, character_name=None, path=None
 ):
+    import numpy as np
+    import matplotlib.pyplot as plt
+
     if path is None:
         path = "figs/damage"
 
@@ -97,6 +98,9 @@ def plot_raid_damage(
     encounter=None,
     path=None,
 ):
+    import numpy as np
+    import matplotlib.pyplot as plt
+
     if path is None:
         path = "figs/damage"
 
@@ -162,8 +166,8 @@ def plot_raid_damage(
     plt.close()
 
 
-def track_damage_taken(source, character_name=None, encounter=None, raid=False, verbose=False, path=None):
-    processor = get_processor(source)
+def track_damage_taken(source, character_name=None, encounter=None, raid=False, verbose=False, path=None, **kwargs):
+    processor = get_processor(source, **kwargs)
     encounter = processor.select_encounter(encounter)
     processor.process(encounter=encounter)
 
@@ -214,7 +218,7 @@ def track_damage_taken(source, character_name=None, encounter=None, raid=False,
 
 
 def main(argv=None):
-    from src.parser import OverhealParser
+    from src.parser import OverhealParser, reader_options
 
     parser = OverhealParser(accept_character=True, accept_encounter=True)
     parser.add_argument("--raid", action="store_true")
@@ -230,6 +234,7 @@ def main(argv=None):
         raid=args.raid,
         verbose=args.verbose,
         path=args.path,
+        **reader_options(args),
     )
 
 